@@ -0,0 +1,61 @@
+from collections import Counter, defaultdict
+from itertools import combinations
+from typing import Any, Dict, Iterable, List
+
+TIERS = ['A', 'B', 'C', 'D']
+
+# Location and founding year of companies whose description didn't mention them (see ingest.py)
+UNKNOWN = 'Unknown'
+
+# Most frequent tag pairs returned
+TAG_PAIR_LIMIT = 100
+
+
+def country(location: str) -> str:
+    """Last part of a "City, Region, Country" location ("USA" for "San Francisco, CA, USA")"""
+    return location.rsplit(',', 1)[-1].strip() or UNKNOWN
+
+
+def ranked(counts: Counter, key: str) -> List[Dict[str, Any]]:
+    """Counter as [{key: value, count}], most common first (ties by value)"""
+    return [{key: value, "count": n} for value, n in sorted(counts.items(), key=lambda item: (-item[1], str(item[0])))]
+
+
+def batch_analytics(companies: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Aggregates of one batch's cached company dicts for the analytics dashboard
+
+    Locations and founding years are the strings ingest.py extracted from the
+    descriptions ("Unknown" where none was found); tiers are the shared ones.
+    """
+    total = 0
+    locations, countries, years, founder_counts, tag_pairs = Counter(), Counter(), Counter(), Counter(), Counter()
+    tier_locations: Dict[str, Counter] = defaultdict(Counter)
+
+    for company in companies:
+        total += 1
+        location = company.get('location') or UNKNOWN
+        locations[location] += 1
+        countries[country(location) if location != UNKNOWN else UNKNOWN] += 1
+        years[company.get('founded_year') or UNKNOWN] += 1
+        founder_counts[len(company.get('founders') or [])] += 1
+        tier_locations[location][company.get('tier') or 'C'] += 1
+        for pair in combinations(sorted(set(company.get('tags') or [])), 2):
+            tag_pairs[pair] += 1
+
+    by_location = ranked(locations, "location")
+    return {
+        "companies": total,
+        "locations": by_location,
+        "countries": ranked(countries, "country"),
+        # Rows follow the locations order; every tier is present in each row
+        "tier_location": [
+            {"location": entry["location"], "tiers": {tier: tier_locations[entry["location"]][tier] for tier in TIERS}}
+            for entry in by_location
+        ],
+        "founded_years": [{"year": year, "count": n} for year, n in sorted(years.items())],
+        "founder_counts": [{"founders": n, "count": count} for n, count in sorted(founder_counts.items())],
+        "tag_pairs": [
+            {"tags": list(pair), "count": n}
+            for pair, n in sorted(tag_pairs.items(), key=lambda item: (-item[1], item[0]))[:TAG_PAIR_LIMIT]
+        ],
+    }
@@ -0,0 +1,89 @@
+import asyncio
+import hashlib
+import os
+import re
+from typing import Awaitable, Callable, Dict, Set
+
+# Batch keys are short alphanumeric codes (X25, S25, W26, ...)
+BATCH_KEY_RE = re.compile(r'^[A-Za-z0-9]+$')
+
+# Batch served when a request doesn't name one; it was the only batch before batches existed
+DEFAULT_BATCH = os.environ.get("DEFAULT_BATCH", "X25")
+if not BATCH_KEY_RE.match(DEFAULT_BATCH):
+    raise ValueError(f"Invalid DEFAULT_BATCH: {DEFAULT_BATCH!r}")
+
+# CSV export of the default batch
+ORIGINAL_CSV = "attached_assets/yc_companies_S25.csv"
+
+# Other batches are found by file name: <BATCH_DIR>/yc_companies_<BATCH>.csv
+BATCH_DIR = os.environ.get("BATCH_DIR", "attached_assets")
+BATCH_FILE_RE = re.compile(r'^yc_companies_([A-Za-z0-9]+)\.csv$')
+
+
+def discover_batches(batch_dir: str = BATCH_DIR) -> Dict[str, str]:
+    """Map batch key -> CSV path
+
+    BATCH_CSVS ("W26=path/to/w26.csv,S25=...") adds or overrides entries;
+    files matching BATCH_FILE_RE are picked up unless already listed.
+    """
+    batches = {DEFAULT_BATCH: ORIGINAL_CSV}
+    for entry in os.environ.get("BATCH_CSVS", "").split(','):
+        if '=' in entry:
+            batch, path = (part.strip() for part in entry.split('=', 1))
+            if BATCH_KEY_RE.match(batch):
+                batches[batch] = path
+
+    if os.path.isdir(batch_dir):
+        listed = {os.path.normpath(path) for path in batches.values()}
+        for filename in sorted(os.listdir(batch_dir)):
+            match = BATCH_FILE_RE.match(filename)
+            path = os.path.join(batch_dir, filename)
+            if match and os.path.normpath(path) not in listed:
+                batches.setdefault(match.group(1), path)
+    return batches
+
+
+def file_sha256(path: str) -> str:
+    """Hex SHA-256 of a file's contents (read in 1 MiB blocks)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class BatchRegistry:
+    """Known batches and which of them are up to date in the database
+
+    A batch's CSV is parsed the first time the batch is requested (unless the
+    database already has its companies from the same file); concurrent first
+    requests wait for a single load.
+    """
+
+    def __init__(self, paths: Dict[str, str],
+                 is_current: Callable[[str], Awaitable[bool]],
+                 load: Callable[[str, str], Awaitable[None]]):
+        self.paths = paths
+        self._is_current = is_current
+        self._load = load
+        self.loaded: Set[str] = set()
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def ensure_loaded(self, batch: str) -> bool:
+        """Make sure a batch's companies are in the database and match its CSV; False if the batch is unknown"""
+        if batch in self.loaded:
+            return True
+        if not BATCH_KEY_RE.match(batch):
+            return False
+
+        lock = self._locks.setdefault(batch, asyncio.Lock())
+        async with lock:
+            if batch in self.loaded:
+                return True
+            if not await self._is_current(batch):
+                path = self.paths.get(batch)
+                if path is None or not os.path.exists(path):
+                    return False
+                await self._load(batch, path)
+            self.loaded.add(batch)
+            return True
@@ -0,0 +1,489 @@
+# Benchmark harness for CSV ingestion and the hot HTTP paths.
+#
+#   python benchmark.py --database-url sqlite:///bench.db \
+#                       --database-url postgresql://localhost/ycx25_bench \
+#                       --output bench.json --baseline previous.json
+#
+# Every database URL must point at a throwaway database: its tables are dropped.
+# Results are written as JSON (latency percentiles in milliseconds); with
+# --baseline, the run exits with status 1 if anything got slower than the
+# tolerance allows.
+#
+#   python benchmark.py --concurrency-check 500 --workers 4 \
+#                       --database-url postgresql://localhost/ycx25_bench
+#
+# fires that many concurrent upvotes at one company instead, and exits with
+# status 1 unless its stored votes went up by exactly that much.
+import argparse
+import csv
+import http.client
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Batch key the synthetic companies are served under during the HTTP runs
+BENCH_BATCH = "BENCH"
+
+# Default sizes are data rows (a company takes ~4.5 rows: description, founders, LinkedIn)
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+
+CSV_HEADER = [
+    'Company URL', 'Company Name', 'Company Description', 'Company Website',
+    'Founder Name', 'Founder LinkedIn', 'Founder Title'
+]
+
+TAGLINE_WORDS = [
+    "AI", "agents", "healthcare", "billing", "robotics", "security", "compliance", "developer",
+    "tools", "infrastructure", "fintech", "payments", "logistics", "voice", "analytics", "data",
+    "legal", "insurance", "energy", "climate", "biotech", "hardware", "education", "hiring",
+]
+FIRST_NAMES = ["Aarav", "Maya", "Chen", "Sofia", "Liam", "Priya", "Noah", "Amara", "Kenji", "Lena", "Omar", "Zoe"]
+LAST_NAMES = ["Shah", "Garcia", "Kim", "Müller", "Okafor", "Rossi", "Singh", "Nguyen", "Cohen", "Silva"]
+CITIES = ["San Francisco, CA, USA", "New York, NY, USA", "London, United Kingdom", "Bengaluru, India", "Toronto, Canada"]
+FOUNDER_TITLES = ["Founder", "Co-Founder & CEO", "CTO & Co-founder", "Co-Founder & COO"]
+
+# Word that occurs in roughly 1 in 8 synthetic taglines, used as the search query
+SEARCH_QUERY = "billing"
+
+PERCENTILES = [50, 90, 95, 99]
+
+
+def generate_csv(path: str, rows: int, seed: int = 25) -> int:
+    """Write a synthetic export shaped like yc_companies_S25.csv; returns the number of companies"""
+    rng = random.Random(seed)
+    written = companies = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADER)
+        while written < rows:
+            companies += 1
+            name = f"Benchco {companies:06d}"
+            slug = name.lower().replace(' ', '-')
+            tagline = ' '.join(rng.sample(TAGLINE_WORDS, 3)).capitalize() + f" platform {companies}"
+            founders = [
+                (f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", rng.choice(FOUNDER_TITLES))
+                for _ in range(rng.randint(1, 4))
+            ]
+            description = (
+                f"{tagline}. Founded in 2025 by {', '.join(founder for founder, _ in founders)}, "
+                f"{name} has {rng.randint(2, 30)} employees based in {rng.choice(CITIES)}."
+            )
+            base = [f"https://www.ycombinator.com/companies/{slug}", name, description, f"https://{slug}.example.com/"]
+
+            # First row repeats the description in the founder column (as in the real export)
+            company_rows = [base + [tagline, "", ""]]
+            for founder, title in founders:
+                company_rows.append(base + [founder, f"https://www.linkedin.com/in/{founder.lower().replace(' ', '-')}/", title])
+            company_rows.append(base + [name, f"https://www.linkedin.com/company/{slug}/", ""])
+
+            company_rows = company_rows[:rows - written]
+            writer.writerows(company_rows)
+            written += len(company_rows)
+    return companies
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """count, mean, min, max and nearest-rank percentiles of samples"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    summary = {
+        "count": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "min": ordered[0],
+        "max": ordered[-1],
+    }
+    for p in PERCENTILES:
+        summary[f"p{p}"] = ordered[min(len(ordered) - 1, max(0, -(-p * len(ordered) // 100) - 1))]
+    return summary
+
+
+def timed(fn: Callable[[], Any]) -> Tuple[float, Any]:
+    """Seconds taken by fn() and its result"""
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def run_ingest(csv_paths: List[str], repeat: int) -> List[Dict[str, Any]]:
+    """Time parsing, the initial insert and an unchanged delta reload for each CSV
+
+    Runs in a subprocess with DATABASE_URL set, since the database module binds it on import.
+    """
+    from database import Base, engine, create_tables, initialize_db, reload_companies
+    from ingest import process_csv_data
+
+    results = []
+    for path in csv_paths:
+        with open(path, encoding='utf-8') as f:
+            rows = sum(1 for _ in f) - 1
+
+        parse, insert, reload = [], [], []
+        for _ in range(repeat):
+            seconds, companies_data = timed(lambda: process_csv_data(path))
+            parse.append(seconds)
+
+            Base.metadata.drop_all(bind=engine)
+            create_tables()
+            insert.append(timed(lambda: initialize_db(companies_data, batch=BENCH_BATCH))[0])
+            reload.append(timed(lambda: reload_companies(companies_data, batch=BENCH_BATCH))[0])
+
+        results.append({
+            "rows": rows,
+            "companies": len(companies_data),
+            "parse_s": summarize(parse),
+            "parse_rows_per_s": rows / statistics.median(parse),
+            "initial_insert_s": summarize(insert),
+            "insert_companies_per_s": len(companies_data) / statistics.median(insert),
+            "reload_unchanged_s": summarize(reload),
+        })
+    Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+    return results
+
+
+def free_port() -> int:
+    """An unused local TCP port"""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def request(conn: http.client.HTTPConnection, method: str, path: str,
+            body: Optional[Dict[str, str]] = None) -> Tuple[int, bytes]:
+    """Send one request on a keep-alive connection and read the whole response"""
+    headers = {}
+    data = None
+    if body is not None:
+        data = urlencode(body)
+        headers["Content-Type"] = "application/x-www-form-urlencoded"
+    conn.request(method, path, body=data, headers=headers)
+    response = conn.getresponse()
+    return response.status, response.read()
+
+
+def load_test(port: int, clients: int, requests: int,
+              make_request: Callable[[int, int], Tuple[str, str, Optional[Dict[str, str]]]]) -> Dict[str, Any]:
+    """Run `requests` requests from `clients` concurrent keep-alive connections
+
+    make_request(client, n) returns (method, path, form body) for a client's n-th request.
+    """
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+    remaining = [requests]
+
+    def client(index: int):
+        nonlocal errors
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        n = 0
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    break
+                remaining[0] -= 1
+            method, path, body = make_request(index, n)
+            n += 1
+            start = time.perf_counter()
+            try:
+                status, _ = request(conn, method, path, body)
+                ok = status < 400
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+                ok = False
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+                errors += not ok
+        conn.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        for future in [pool.submit(client, index) for index in range(clients)]:
+            future.result()
+    wall = time.perf_counter() - start
+
+    return {
+        "clients": clients,
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_s": len(latencies) / wall if wall else 0.0,
+        "latency_ms": summarize(latencies),
+    }
+
+
+def start_server(database_url: str, csv_path: str, port: int, workers: int) -> subprocess.Popen:
+    """Start uvicorn serving the app, with the synthetic CSV as batch BENCH_BATCH"""
+    env = dict(os.environ, DATABASE_URL=database_url, BATCH_CSVS=f"{BENCH_BATCH}={csv_path}")
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1', '--port', str(port),
+         '--workers', str(workers), '--log-level', 'warning'],
+        cwd=REPO_DIR, env=env, stdout=subprocess.DEVNULL
+    )
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with status {server.returncode}")
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            status, _ = request(conn, 'GET', '/api/batches')
+            conn.close()
+            if status == 200:
+                return server
+        except OSError:
+            pass
+        time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("Server did not start within 120 s")
+
+
+def run_http(database_url: str, csv_path: str, clients: int, requests: int, workers: int) -> Dict[str, Any]:
+    """Load-test the read and mutation endpoints against a fresh server"""
+    port = free_port()
+    server = start_server(database_url, csv_path, port, workers)
+    try:
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=300)
+        # First request for the batch loads its CSV; not part of the measurements
+        load_s, (status, body) = timed(lambda: request(conn, 'GET', f'/api/companies?batch={BENCH_BATCH}'))
+        if status != 200:
+            raise RuntimeError(f"Loading batch {BENCH_BATCH} failed with status {status}")
+        ids = [company['id'] for company in json.loads(body)]
+        conn.close()
+
+        batch = f"batch={BENCH_BATCH}"
+        scenarios: Dict[str, Callable[[int, int], Tuple[str, str, Optional[Dict[str, str]]]]] = {
+            "home": lambda c, n: ('GET', f'/?{batch}', None),
+            "api_companies_all": lambda c, n: ('GET', f'/api/companies?{batch}', None),
+            "api_companies_page": lambda c, n: ('GET', f'/api/companies?{batch}&limit=50', None),
+            "api_search": lambda c, n: ('GET', f'/api/search?{batch}&query={SEARCH_QUERY}', None),
+            "upvote": lambda c, n: ('POST', f'/upvote/{ids[(c * 7919 + n) % len(ids)]}', None),
+            # Each client adds and removes a tag on its own company, so tag lists stay short
+            "tag_add_remove": lambda c, n: (
+                ('POST', f'/api/tags/{ids[c % len(ids)]}', {"tag": f"bench{c}"}) if n % 2 == 0
+                else ('DELETE', f'/api/tags/{ids[c % len(ids)]}/0', None)
+            ),
+        }
+
+        results = {"batch_load_s": load_s, "companies": len(ids), "scenarios": {}}
+        for name, make_request in scenarios.items():
+            load_test(port, clients, max(clients, requests // 10), make_request)  # Warm-up
+            results["scenarios"][name] = load_test(port, clients, requests, make_request)
+        return results
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def read_votes(conn: http.client.HTTPConnection, company_id: int) -> int:
+    """A company's votes as stored, read through the (uncached) JSON Lines export"""
+    status, body = request(conn, 'GET', f'/api/export?batch={BENCH_BATCH}&format=jsonl')
+    if status != 200:
+        raise RuntimeError(f"Export failed with status {status}")
+    for line in body.splitlines():
+        row = json.loads(line)
+        if row['id'] == company_id:
+            return row['votes']
+    raise RuntimeError(f"Company {company_id} missing from the export")
+
+
+def run_concurrency_check(database_url: str, csv_path: str, upvotes: int, clients: int,
+                          workers: int) -> Dict[str, Any]:
+    """Upvote one company `upvotes` times from concurrent clients and check that no update was lost"""
+    port = free_port()
+    server = start_server(database_url, csv_path, port, workers)
+    try:
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=300)
+        status, body = request(conn, 'GET', f'/api/companies?batch={BENCH_BATCH}')
+        if status != 200:
+            raise RuntimeError(f"Loading batch {BENCH_BATCH} failed with status {status}")
+        company_id = json.loads(body)[0]['id']
+        # An unranked company jumps to rank 2 on its first upvote; after that each adds exactly one
+        request(conn, 'POST', f'/upvote/{company_id}')
+        start = read_votes(conn, company_id)
+        result = load_test(port, clients, upvotes, lambda c, n: ('POST', f'/upvote/{company_id}', None))
+        final = read_votes(conn, company_id)
+        conn.close()
+        return {
+            "database": backend_name(database_url),
+            "company_id": company_id,
+            "upvotes": upvotes,
+            "clients": clients,
+            "workers": workers,
+            "errors": result["errors"],
+            "start_votes": start,
+            "final_votes": final,
+            "ok": result["errors"] == 0 and final == start + upvotes,
+        }
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def backend_name(database_url: str) -> str:
+    """Short backend label for a database URL"""
+    return database_url.split(':', 1)[0].split('+', 1)[0]
+
+
+def run_database(database_url: str, csv_paths: List[str], http_csv: Optional[str], args) -> Dict[str, Any]:
+    """Ingestion (in a subprocess) and HTTP results for one database"""
+    result: Dict[str, Any] = {"database": backend_name(database_url)}
+    if csv_paths:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--ingest-worker', '--repeat', str(args.repeat), *csv_paths],
+            cwd=REPO_DIR, env=dict(os.environ, DATABASE_URL=database_url),
+            check=True, stdout=subprocess.PIPE, text=True
+        ).stdout
+        result["ingest"] = json.loads(output)
+    if http_csv:
+        result["http"] = run_http(database_url, http_csv, args.clients, args.requests, args.workers)
+    return result
+
+
+def regressions(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Describe every metric that got more than `tolerance` worse than the baseline"""
+    found = []
+
+    def check(label: str, new: Optional[float], old: Optional[float], higher_is_better: bool = False):
+        if not new or not old:
+            return
+        ratio = old / new if higher_is_better else new / old
+        if ratio > 1 + tolerance:
+            found.append(f"{label}: {old:.4g} -> {new:.4g} ({(ratio - 1) * 100:+.0f}%)")
+
+    old_runs = {run["database"]: run for run in baseline.get("runs", [])}
+    for run in current["runs"]:
+        old = old_runs.get(run["database"])
+        if old is None:
+            continue
+        old_ingest = {entry["rows"]: entry for entry in old.get("ingest", [])}
+        for entry in run.get("ingest", []):
+            before = old_ingest.get(entry["rows"])
+            if before:
+                for metric in ("parse_s", "initial_insert_s", "reload_unchanged_s"):
+                    check(f"{run['database']} ingest {entry['rows']} rows {metric} p50",
+                          entry[metric].get("p50"), before[metric].get("p50"))
+        old_scenarios = old.get("http", {}).get("scenarios", {})
+        for name, scenario in run.get("http", {}).get("scenarios", {}).items():
+            before = old_scenarios.get(name)
+            if before:
+                check(f"{run['database']} {name} p95 ms", scenario["latency_ms"].get("p95"), before["latency_ms"].get("p95"))
+                check(f"{run['database']} {name} req/s", scenario["requests_per_s"], before["requests_per_s"], True)
+    return found
+
+
+def git_commit() -> Optional[str]:
+    """HEAD commit of the checkout, if available"""
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR, check=True,
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark CSV ingestion and HTTP endpoints")
+    parser.add_argument('--database-url', action='append', dest='database_urls',
+                        help="Throwaway database to benchmark against (repeatable; its tables are dropped). "
+                             "Default: a temporary SQLite file")
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help="Comma-separated synthetic CSV sizes in rows for the ingestion benchmark")
+    parser.add_argument('--http-rows', type=int, default=10_000, help="Rows of the CSV served during HTTP load tests")
+    parser.add_argument('--repeat', type=int, default=3, help="Ingestion runs per size")
+    parser.add_argument('--clients', type=int, default=8, help="Concurrent HTTP clients")
+    parser.add_argument('--requests', type=int, default=400, help="Requests per HTTP scenario")
+    parser.add_argument('--workers', type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument('--skip-ingest', action='store_true')
+    parser.add_argument('--skip-http', action='store_true')
+    parser.add_argument('--workdir', help="Where synthetic CSVs are written (default: a temporary directory)")
+    parser.add_argument('--output', help="Write results JSON here (default: stdout)")
+    parser.add_argument('--baseline', help="Earlier results JSON to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="Allowed slowdown against the baseline before failing (0.2 = 20%%)")
+    parser.add_argument('--concurrency-check', type=int, metavar='N',
+                        help="Instead of benchmarking, fire N concurrent upvotes at one company on each "
+                             "database and fail unless its votes went up by exactly N")
+    parser.add_argument('--ingest-worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('csv_paths', nargs='*', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.ingest_worker:
+        json.dump(run_ingest(args.csv_paths, args.repeat), sys.stdout)
+        return 0
+
+    with tempfile.TemporaryDirectory(prefix="ycx25-bench-") as tmp:
+        workdir = args.workdir or tmp
+        os.makedirs(workdir, exist_ok=True)
+        database_urls = args.database_urls or [f"sqlite:///{os.path.join(tmp, 'bench.db')}"]
+
+        if args.concurrency_check:
+            csv_path = os.path.join(workdir, "bench_concurrency.csv")
+            generate_csv(csv_path, 1_000)
+            checks = [
+                run_concurrency_check(url, csv_path, args.concurrency_check, args.clients, args.workers)
+                for url in database_urls
+            ]
+            print(json.dumps(checks, indent=2))
+            for check in checks:
+                if not check["ok"]:
+                    print(f"LOST UPDATES {check['database']}: {check['start_votes']} + {check['upvotes']} upvotes "
+                          f"-> {check['final_votes']} ({check['errors']} errors)", file=sys.stderr)
+            return 0 if all(check["ok"] for check in checks) else 1
+
+        csv_paths = []
+        if not args.skip_ingest:
+            for rows in (int(size) for size in args.sizes.split(',') if size.strip()):
+                path = os.path.join(workdir, f"bench_{rows}.csv")
+                generate_csv(path, rows)
+                csv_paths.append(path)
+        http_csv = None
+        if not args.skip_http:
+            http_csv = os.path.join(workdir, f"bench_http_{args.http_rows}.csv")
+            generate_csv(http_csv, args.http_rows)
+
+        results = {
+            "meta": {
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "clients": args.clients,
+                "requests": args.requests,
+                "workers": args.workers,
+            },
+            "runs": [run_database(url, csv_paths, http_csv, args) for url in database_urls],
+        }
+
+    encoded = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(encoded + '\n')
+    else:
+        print(encoded)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,247 @@
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# Seconds a snapshot is served before it is brought up to date from the change log.
+# Each worker keeps its own snapshot, so this bounds how stale another
+# worker's view can get after a write. 0 disables expiry.
+CACHE_TTL = float(os.environ.get("COMPANY_CACHE_TTL", "5"))
+
+# Change log reads per refresh before falling back to a full reload (see CompanyCache.arecords)
+REFRESH_ATTEMPTS = 3
+
+# Change log reader for CompanyCache.arecords: changes after a version, or None to reload
+Refresher = Callable[[int], Awaitable[Optional[Tuple[int, List[Tuple[int, Dict[str, Any]]]]]]]
+
+
+class CompanyCache:
+    """Versioned in-memory snapshot of the serialized company list
+
+    The snapshot holds one dict per company (as produced by Company.to_dict)
+    plus any number of derived views (sorted/filtered lists) built on demand.
+    Writes either patch a single company in place or invalidate the snapshot;
+    both bump ``version`` and drop the derived views. ``generation`` only
+    changes when the snapshot is reloaded from the database.
+
+    ``dataset_version`` is the change log version the snapshot reflects: the
+    loader returns it along with the companies, and patches advance it when
+    they directly follow it (after a gap, the snapshot is refreshed on the
+    next read instead, so the version never claims changes it doesn't have).
+
+    When the TTL runs out, ``arecords`` asks an optional refresher for the
+    change log entries since ``dataset_version`` and applies them like
+    patches; only when the refresher can't give them (a reload entry, or too
+    many) is the whole snapshot loaded again. ``on_patch`` is called with
+    each patched record and the fields that changed.
+
+    ``fragments`` keeps each company's encoded JSON per output form; a patch
+    drops only the patched company's fragments.
+
+    ``records``/``view`` take a plain loader; ``arecords``/``aview`` take a
+    coroutine loader and let only one request per worker reload at a time.
+    """
+
+    def __init__(self, ttl: float = CACHE_TTL):
+        self.ttl = ttl
+        self.version = 0
+        self.generation = 0
+        self.dataset_version = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+        self._records: Optional[Dict[int, Dict[str, Any]]] = None
+        self._views: Dict[str, Any] = {}
+        self._fragments: Dict[str, Dict[int, bytes]] = {}
+        self._loaded_at = 0.0
+        self._stale = False
+        self._load_lock = asyncio.Lock()
+        self.on_patch: Optional[Callable[[Dict[str, Any], Dict[str, Any]], None]] = None
+
+    def _expired(self) -> bool:
+        if self._records is None or self._stale:
+            return True
+        return bool(self.ttl) and time.monotonic() - self._loaded_at > self.ttl
+
+    def _install(self, dataset_version: int, companies: List[Dict[str, Any]]) -> None:
+        self.dataset_version = dataset_version
+        self._records = {company['id']: company for company in companies}
+        self._views = {}
+        self._fragments = {}
+        self._loaded_at = time.monotonic()
+        self._stale = False
+        self.version += 1
+        self.generation += 1
+
+    def _replace(self, company_id: int, fields: Dict[str, Any]) -> bool:
+        """Replace one record with a patched copy (caller holds the lock); False if it isn't cached"""
+        record = self._records.get(company_id)
+        if record is None:
+            return False
+        # Replace rather than mutate so views handed out earlier stay consistent
+        record = self._records[company_id] = {**record, **fields}
+        for encoded in self._fragments.values():
+            encoded.pop(company_id, None)
+        if self.on_patch is not None:
+            self.on_patch(record, fields)
+        return True
+
+    def _apply_changes(self, records: Dict[int, Dict[str, Any]], version: int, dataset_version: int,
+                       changes: List[Tuple[int, Dict[str, Any]]]) -> bool:
+        """Apply refresher changes if nothing touched the snapshot meanwhile (caller holds the lock)"""
+        if self._records is not records or self.version != version:
+            return False
+        if any(fields and company_id not in records for company_id, fields in changes):
+            return False
+        changed = False
+        for company_id, fields in changes:
+            if fields:
+                changed = self._replace(company_id, fields) or changed
+        if changed:
+            self._views = {}
+            self.version += 1
+        self.dataset_version = dataset_version
+        self._loaded_at = time.monotonic()
+        self._stale = False
+        return True
+
+    def records(self, loader: Callable[[], Tuple[int, List[Dict[str, Any]]]]) -> Dict[int, Dict[str, Any]]:
+        """Return the company snapshot keyed by id, calling loader on a miss
+
+        The loader returns ``(dataset_version, companies)``.
+        """
+        with self._lock:
+            if self._expired():
+                self.misses += 1
+                self._install(*loader())
+            else:
+                self.hits += 1
+            return self._records
+
+    async def arecords(self, loader: Callable[[], Awaitable[Tuple[int, List[Dict[str, Any]]]]],
+                       refresher: Optional[Refresher] = None) -> Dict[int, Dict[str, Any]]:
+        """Async ``records``: concurrent misses wait for a single refresh or reload
+
+        ``refresher(since)`` returns ``(dataset_version, [(company_id, fields)])``
+        for the changes after ``since``, or None if the snapshot must be reloaded.
+        """
+        with self._lock:
+            if not self._expired():
+                self.hits += 1
+                return self._records
+        async with self._load_lock:
+            with self._lock:
+                if not self._expired():
+                    self.hits += 1
+                    return self._records
+            # Query outside the thread lock so the event loop keeps serving; a patch
+            # landing meanwhile may be newer than the entries read, so read again
+            for _ in range(REFRESH_ATTEMPTS if refresher is not None else 0):
+                with self._lock:
+                    records, version, since = self._records, self.version, self.dataset_version
+                if records is None:
+                    break
+                refreshed = await refresher(since)
+                if refreshed is None:
+                    break
+                with self._lock:
+                    if self._apply_changes(records, version, *refreshed):
+                        self.hits += 1
+                        return self._records
+            dataset_version, companies = await loader()
+            with self._lock:
+                self.misses += 1
+                self._install(dataset_version, companies)
+                return self._records
+
+    def view(self, name: str, loader: Callable[[], Tuple[int, List[Dict[str, Any]]]],
+             builder: Callable[[List[Dict[str, Any]]], Any]) -> Any:
+        """Return a view derived from the snapshot, building it once per version
+
+        Views are shared between requests and must be treated as read-only.
+        """
+        with self._lock:
+            records = self.records(loader)
+            if name not in self._views:
+                self._views[name] = builder(list(records.values()))
+            return self._views[name]
+
+    async def aview(self, name: str, loader: Callable[[], Awaitable[Tuple[int, List[Dict[str, Any]]]]],
+                    builder: Callable[[List[Dict[str, Any]]], Any], refresher: Optional[Refresher] = None) -> Any:
+        """Async ``view``"""
+        records = await self.arecords(loader, refresher)
+        with self._lock:
+            if self._records is not records:
+                # Reloaded or invalidated meanwhile; build from what we loaded without caching
+                return builder(list(records.values()))
+            if name not in self._views:
+                self._views[name] = builder(list(records.values()))
+            return self._views[name]
+
+    def fragments(self, form: str, companies: List[Dict[str, Any]],
+                  encode: Callable[[Dict[str, Any]], bytes]) -> List[bytes]:
+        """Encoded JSON of each company in ``form``, encoding only the ones not cached yet"""
+        with self._lock:
+            encoded = self._fragments.setdefault(form, {})
+            result = []
+            for company in companies:
+                fragment = encoded.get(company['id'])
+                if fragment is None:
+                    fragment = encoded[company['id']] = encode(company)
+                result.append(fragment)
+            return result
+
+    def get(self, company_id: int) -> Optional[Dict[str, Any]]:
+        """Return one cached company (None if not cached), without loading"""
+        with self._lock:
+            if self._records is None:
+                return None
+            return self._records.get(company_id)
+
+    def patch(self, company_id: int, dataset_version: Optional[int] = None, **fields: Any) -> bool:
+        """Update fields of one cached company in place
+
+        Returns False (and invalidates) when the company is not in the snapshot.
+        """
+        with self._lock:
+            if self._records is None:
+                return False
+            if not self._replace(company_id, fields):
+                self.invalidate()
+                return False
+            if dataset_version is not None and dataset_version > self.dataset_version:
+                if dataset_version == self.dataset_version + 1:
+                    self.dataset_version = dataset_version
+                else:
+                    # Changes in between (other workers') haven't been applied yet
+                    self._stale = True
+            self._views = {}
+            self.version += 1
+            return True
+
+    def invalidate(self) -> None:
+        """Drop the snapshot so the next read reloads from the database"""
+        with self._lock:
+            self._records = None
+            self._views = {}
+            self._fragments = {}
+            self.version += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and snapshot state"""
+        with self._lock:
+            return {
+                "version": self.version,
+                "generation": self.generation,
+                "dataset_version": self.dataset_version,
+                "hits": self.hits,
+                "misses": self.misses,
+                "ttl": self.ttl,
+                "size": len(self._records) if self._records is not None else 0,
+                "age": time.monotonic() - self._loaded_at if self._records is not None else None
+            }
+
+
+# Shared cache instance for this worker
+company_cache = CompanyCache()
@@ -0,0 +1,359 @@
+# Command-line maintenance: ingestion, bulk ranking import/export and database housekeeping,
+# run outside the web workers so none of it holds up live traffic.
+#
+#   python cli.py ingest                        # every discovered batch whose CSV changed
+#   python cli.py ingest X25 W26=exports/w26.csv downloads/yc_companies_F25.csv --jobs 4
+#   python cli.py rankings export --batch X25 -o rankings.csv
+#   python cli.py rankings import rankings.csv
+#   python cli.py enrich --batch X25 --concurrency 8 --rate 1
+#   python cli.py vacuum
+#   python cli.py rebuild
+#
+# DATABASE_URL (or --database-url) selects the database, as for the web server. Changes
+# are recorded in the change log, so running workers and their clients pick them up; with
+# SKIP_CSV_CHECK=1 the web server then serves ingested batches without hashing their CSVs.
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
+
+import bleach
+
+from batches import BATCH_FILE_RE, BATCH_KEY_RE, DEFAULT_BATCH, discover_batches
+from enrich import (
+    DEFAULT_CONCURRENCY, DEFAULT_RATE, DEFAULT_RETRIES, ENRICH_CACHE_DIR, ENRICH_TTL, FetchCache, enrich_companies
+)
+from ingest import process_csv_data, source_hash
+
+TIERS = ['A', 'B', 'C', 'D']
+
+# Formats rankings can be exported in (see export.py) and imported from
+EXPORT_CHOICES = ['csv', 'jsonl', 'parquet']
+IMPORT_CHOICES = ['csv', 'jsonl']
+
+QUIET = False
+
+
+def progress(message: str):
+    """Progress line on stderr (stdout may be carrying an export)"""
+    if not QUIET:
+        print(message, file=sys.stderr, flush=True)
+
+
+def resolve_sources(sources: List[str]) -> List[Tuple[str, str]]:
+    """(batch, CSV path) pairs from BATCH=PATH, batch keys or CSV paths
+
+    A path discover_batches() already knows is ingested as its registered batch
+    (attached_assets/yc_companies_S25.csv is X25); other paths must be named
+    yc_companies_<BATCH>.csv. With no sources, every discovered batch whose CSV exists.
+    """
+    known = discover_batches()
+    if not sources:
+        return [(batch, path) for batch, path in known.items() if os.path.exists(path)]
+    registered = {os.path.realpath(path): batch for batch, path in known.items()}
+
+    resolved = []
+    for source in sources:
+        if '=' in source:
+            batch, path = source.split('=', 1)
+        elif source in known:
+            batch, path = source, known[source]
+        elif os.path.realpath(source) in registered:
+            batch, path = registered[os.path.realpath(source)], source
+        else:
+            match = BATCH_FILE_RE.match(os.path.basename(source))
+            if match is None:
+                raise ValueError(f"{source}: name a batch (BATCH=PATH) or use a yc_companies_<BATCH>.csv file")
+            batch, path = match.group(1), source
+        if not BATCH_KEY_RE.match(batch):
+            raise ValueError(f"Invalid batch key: {batch!r}")
+        if not os.path.exists(path):
+            raise ValueError(f"{path}: no such file")
+        resolved.append((batch, path))
+    return resolved
+
+
+def parse_source(batch: str, path: str, stored_hash: Optional[str]) -> Tuple[str, Optional[List[Dict[str, Any]]], float]:
+    """Hash and parse one CSV (in a worker process); companies is None if the hash matches stored_hash"""
+    start = time.perf_counter()
+    sha256 = source_hash(path)
+    if sha256 == stored_hash:
+        return sha256, None, time.perf_counter() - start
+    return sha256, process_csv_data(path, batch=batch), time.perf_counter() - start
+
+
+def run_ingest(sources: List[Tuple[str, str]], jobs: int, force: bool) -> Dict[str, Dict[str, int]]:
+    """Parse the CSVs in parallel and delta-load each batch as soon as its parse finishes
+
+    Database writes stay in this process, one batch at a time. Returns the
+    reload counts per batch (unchanged files are skipped and left out).
+    """
+    from database import create_tables, get_source_hashes, reload_companies
+
+    create_tables()
+    stored = {} if force else get_source_hashes()
+    results = {}
+    done = 0
+
+    def load(batch: str, path: str, sha256: str, companies_data, seconds: float):
+        nonlocal done
+        done += 1
+        if companies_data is None:
+            progress(f"[{done}/{len(sources)}] {batch}: {path} unchanged, skipped")
+            return
+        progress(f"[{done}/{len(sources)}] {batch}: parsed {len(companies_data)} companies from {path} in {seconds:.1f}s")
+        start = time.perf_counter()
+        counts = reload_companies(companies_data, batch=batch, csv_path=path, sha256=sha256)
+        progress(f"    {counts['inserted']} inserted, {counts['updated']} updated, {counts['deleted']} deleted, "
+                 f"{counts['unchanged']} unchanged in {time.perf_counter() - start:.1f}s")
+        results[batch] = counts
+
+    if jobs > 1 and len(sources) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(sources))) as pool:
+            futures = {
+                pool.submit(parse_source, batch, path, stored.get(batch)): (batch, path) for batch, path in sources
+            }
+            for future in as_completed(futures):
+                load(*futures[future], *future.result())
+    else:
+        for batch, path in sources:
+            load(batch, path, *parse_source(batch, path, stored.get(batch)))
+    return results
+
+
+async def export_rankings(batch: str, export_format: str, output) -> int:
+    """Write a batch's companies in export order to a binary file; returns the number of companies"""
+    from database import AsyncSessionLocal, async_engine, stream_companies
+    from export import export_stream
+
+    count = 0
+
+    async def counted(chunks):
+        nonlocal count
+        async for chunk in chunks:
+            count += len(chunk)
+            progress(f"{batch}: {count} companies exported")
+            yield chunk
+
+    try:
+        async with AsyncSessionLocal() as db:
+            async for data in export_stream(export_format, counted(stream_companies(db, batch))):
+                output.write(data)
+    finally:
+        await async_engine.dispose()
+    return count
+
+
+def ranking_fields(record: Dict[str, Any], batch: str, where: str) -> Dict[str, Any]:
+    """Validated ranking dict for import_rankings from an exported record (CSV row or JSON object)"""
+    ranking = {'batch': record.get('batch') or batch}
+    name = record.get('name')
+    if name:
+        ranking['name'] = name
+    elif record.get('id') not in (None, ''):
+        ranking['id'] = int(record['id'])
+    else:
+        raise ValueError(f"{where}: needs a name or an id")
+
+    if record.get('votes') not in (None, ''):
+        votes = int(record['votes'])
+        if votes < 0:
+            raise ValueError(f"{where}: votes must be 0 (unranked) or a rank")
+        ranking['votes'] = votes
+    if record.get('tier') not in (None, ''):
+        if record['tier'] not in TIERS:
+            raise ValueError(f"{where}: invalid tier {record['tier']!r}")
+        ranking['tier'] = record['tier']
+    if 'tags' in record:
+        tags = record['tags']
+        if isinstance(tags, str):
+            tags = tags.split(';')
+        if not isinstance(tags, list):
+            raise ValueError(f"{where}: tags must be a list")
+        # Same sanitizing as tags added through the API
+        tags = (bleach.clean(str(tag), tags=[], strip=True)[:30].strip() for tag in tags)
+        ranking['tags'] = [tag for tag in tags if tag]
+    return ranking
+
+
+def read_rankings(path: str, import_format: str, batch: str) -> List[Dict[str, Any]]:
+    """Ranking dicts from an export file (CSV columns as written by export.py, or JSON Lines)"""
+    rankings = []
+    with open(path, newline='', encoding='utf-8') as f:
+        if import_format == 'csv':
+            reader = csv.DictReader(f)
+            if not {'name', 'id'} & set(reader.fieldnames or []):
+                raise ValueError(f"{path}: needs a name or an id column")
+            # Line 1 is the header
+            for line, row in enumerate(reader, start=2):
+                rankings.append(ranking_fields(row, batch, f"{path}:{line}"))
+        else:
+            for line, text in enumerate(f, start=1):
+                if text.strip():
+                    try:
+                        record = json.loads(text)
+                    except ValueError as e:
+                        raise ValueError(f"{path}:{line}: {e}")
+                    rankings.append(ranking_fields(record, batch, f"{path}:{line}"))
+    return rankings
+
+
+def file_format(path: Optional[str], choices: List[str], default: str) -> str:
+    """Format named by a file's extension (.ndjson counts as jsonl), else the default"""
+    extension = os.path.splitext(path or '')[1].lstrip('.').lower()
+    extension = 'jsonl' if extension == 'ndjson' else extension
+    return extension if extension in choices else default
+
+
+def command_ingest(args) -> int:
+    sources = resolve_sources(args.sources)
+    if not sources:
+        progress("No batch CSVs found")
+        return 0
+    start = time.perf_counter()
+    results = run_ingest(sources, args.jobs, args.force)
+    progress(f"Loaded {len(results)} of {len(sources)} batches in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+def command_rankings_export(args) -> int:
+    export_format = args.format or file_format(args.output, EXPORT_CHOICES, 'csv')
+    if export_format == 'parquet':
+        from export import pyarrow
+        if pyarrow is None:
+            raise ValueError("Parquet export needs pyarrow")
+    if args.output:
+        with open(args.output, 'wb') as output:
+            count = asyncio.run(export_rankings(args.batch, export_format, output))
+    else:
+        count = asyncio.run(export_rankings(args.batch, export_format, sys.stdout.buffer))
+        sys.stdout.buffer.flush()
+    progress(f"Exported {count} companies of {args.batch} as {export_format}")
+    return 0
+
+
+def command_rankings_import(args) -> int:
+    from database import import_rankings
+
+    import_format = args.format or file_format(args.path, IMPORT_CHOICES, 'csv')
+    rankings = read_rankings(args.path, import_format, args.batch)
+    progress(f"Read {len(rankings)} rankings from {args.path}")
+    counts = import_rankings(rankings)
+    progress(f"{counts['updated']} companies updated, {counts['unknown']} not found")
+    return 0
+
+
+def command_enrich(args) -> int:
+    from database import create_tables, get_enrichment_targets, set_enrichment
+
+    create_tables()
+    cache = FetchCache(args.cache_dir, args.ttl_days * 86400)
+    if args.evict:
+        entries, objects = cache.evict()
+        progress(f"Evicted {entries} expired cache entries and {objects} unreferenced objects")
+
+    start = time.perf_counter()
+    companies = get_enrichment_targets(args.batch)
+    results = enrich_companies(
+        companies, cache, concurrency=args.concurrency, rate=args.rate, retries=args.retries,
+        check_links=not args.skip_linkedin, force=args.force, progress=progress
+    )
+    updated = set_enrichment(results)
+    progress(f"Enriched {len(companies)} companies ({updated} changed) in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+def command_vacuum(args) -> int:
+    from database import maintain_database
+
+    start = time.perf_counter()
+    statements = maintain_database(vacuum=True, analyze=not args.skip_analyze)
+    progress(f"Ran {', '.join(statements)} in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+def command_rebuild(args) -> int:
+    from database import create_tables, rebuild_consensus, maintain_database
+
+    create_tables()
+    start = time.perf_counter()
+    rows = rebuild_consensus()
+    progress(f"Consensus rebuilt for {rows} companies in {time.perf_counter() - start:.1f}s")
+    if not args.skip_reindex:
+        start = time.perf_counter()
+        statements = maintain_database(vacuum=False, analyze=True, reindex=True)
+        progress(f"Ran {', '.join(statements)} in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    global QUIET
+
+    parser = argparse.ArgumentParser(description="Ingest CSVs, move rankings in bulk and maintain the database")
+    parser.add_argument('--database-url', help="Database to work on (default: DATABASE_URL)")
+    parser.add_argument('--quiet', action='store_true', help="No progress output")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    ingest = commands.add_parser('ingest', help="Load batches from their CSVs (votes, tiers and tags are kept)")
+    ingest.add_argument('sources', nargs='*',
+                        help="BATCH=PATH, a known batch key or a yc_companies_<BATCH>.csv path "
+                             "(default: every discovered batch)")
+    ingest.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help="CSVs parsed in parallel")
+    ingest.add_argument('--force', action='store_true', help="Parse CSVs even if they didn't change")
+    ingest.set_defaults(handler=command_ingest)
+
+    rankings = commands.add_parser('rankings', help="Export or import shared votes, tiers and tags")
+    ranking_commands = rankings.add_subparsers(dest='action', required=True)
+    export = ranking_commands.add_parser('export', help="Write a batch's rankings (same formats as /api/export)")
+    export.add_argument('--batch', default=DEFAULT_BATCH)
+    export.add_argument('--format', choices=EXPORT_CHOICES, help="Default: from the output's extension, else csv")
+    export.add_argument('-o', '--output', help="Default: stdout")
+    export.set_defaults(handler=command_rankings_export)
+    imports = ranking_commands.add_parser('import', help="Apply rankings from an export, matching companies by name")
+    imports.add_argument('path')
+    imports.add_argument('--batch', default=DEFAULT_BATCH, help="Batch of records without a batch field")
+    imports.add_argument('--format', choices=IMPORT_CHOICES, help="Default: from the file's extension, else csv")
+    imports.set_defaults(handler=command_rankings_import)
+
+    enrich = commands.add_parser('enrich', help="Fetch website text and check LinkedIn URLs (cached on disk)")
+    enrich.add_argument('--batch', action='append', help="Only this batch (repeatable; default: all)")
+    enrich.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help="Requests in flight")
+    enrich.add_argument('--rate', type=float, default=DEFAULT_RATE, help="Requests per second to any one host")
+    enrich.add_argument('--retries', type=int, default=DEFAULT_RETRIES)
+    enrich.add_argument('--cache-dir', default=ENRICH_CACHE_DIR)
+    enrich.add_argument('--ttl-days', type=float, default=ENRICH_TTL / 86400, help="Refetch URLs older than this")
+    enrich.add_argument('--force', action='store_true', help="Refetch every URL")
+    enrich.add_argument('--evict', action='store_true', help="Drop expired cache entries first")
+    enrich.add_argument('--skip-linkedin', action='store_true', help="Don't check LinkedIn URLs")
+    enrich.set_defaults(handler=command_enrich)
+
+    vacuum = commands.add_parser('vacuum', help="VACUUM and ANALYZE the database")
+    vacuum.add_argument('--skip-analyze', action='store_true')
+    vacuum.set_defaults(handler=command_vacuum)
+
+    rebuild = commands.add_parser('rebuild', help="Recompute the consensus table and rebuild indexes")
+    rebuild.add_argument('--skip-reindex', action='store_true')
+    rebuild.set_defaults(handler=command_rebuild)
+
+    args = parser.parse_args(argv)
+    QUIET = args.quiet
+    # The database module reads DATABASE_URL when it is first imported (by the handlers)
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    if 'DATABASE_URL' not in os.environ:
+        parser.error("set DATABASE_URL or pass --database-url")
+
+    try:
+        return args.handler(args)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,22 +1,79 @@
 import os
-from sqlalchemy import create_engine, Column, Integer, String, Text, MetaData, Table
+from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, MetaData, Table, ForeignKey, Index, UniqueConstraint, func
+from sqlalchemy import select, insert, update, delete, case, literal, literal_column, tuple_, inspect, text, bindparam, false
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+import hashlib
 import json
+from collections import defaultdict
+
+from serialization import loads
+from batches import DEFAULT_BATCH
 
 DATABASE_URL = os.environ["DATABASE_URL"]
 
-# Create SQLAlchemy engine
+# Async connection pool settings (per worker process)
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "20"))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))  # Seconds before a connection is replaced
+# Prepared statements cached per asyncpg connection; set to 0 behind pgbouncer in transaction mode
+DB_STATEMENT_CACHE_SIZE = int(os.environ.get("DB_STATEMENT_CACHE_SIZE", "500"))
+
+# Create SQLAlchemy engine (used at startup and for bulk loads)
 engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Async driver URL and engine options for DATABASE_URL
+def async_engine_args(database_url):
+    """Map DATABASE_URL onto asyncpg (PostgreSQL) or aiosqlite (SQLite)"""
+    url = make_url(database_url)
+    if url.get_backend_name() == 'postgresql':
+        query = dict(url.query)
+        connect_args = {'statement_cache_size': DB_STATEMENT_CACHE_SIZE}
+        # asyncpg takes ssl=<mode> instead of libpq's sslmode
+        sslmode = query.pop('sslmode', None)
+        if sslmode:
+            connect_args['ssl'] = sslmode
+        query['prepared_statement_cache_size'] = str(DB_STATEMENT_CACHE_SIZE)
+        return url.set(drivername='postgresql+asyncpg', query=query), {
+            'connect_args': connect_args,
+            'pool_size': DB_POOL_SIZE,
+            'max_overflow': DB_MAX_OVERFLOW,
+            'pool_pre_ping': True,
+            'pool_recycle': DB_POOL_RECYCLE,
+        }
+    if url.get_backend_name() == 'sqlite':
+        # Local development only; needs the aiosqlite package
+        return url.set(drivername='sqlite+aiosqlite'), {'pool_pre_ping': True}
+    return url, {'pool_pre_ping': True}
+
+# Create async engine (used by the request handlers)
+ASYNC_DATABASE_URL, ASYNC_ENGINE_OPTIONS = async_engine_args(DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **ASYNC_ENGINE_OPTIONS)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Founders column (JSON list of {name, linkedin}) as a list; anything malformed reads as no founders
+def parse_founders(value):
+    """Founder dicts stored in a founders column value"""
+    try:
+        if value and value.startswith('[') and value.endswith(']'):
+            return loads(value)
+    except ValueError:
+        pass
+    return []
+
 # Define Company model
 class Company(Base):
     __tablename__ = "companies"
 
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, unique=True, index=True)
+    batch = Column(String, nullable=False, default=DEFAULT_BATCH)  # YC batch key (X25, S25, ...)
+    name = Column(String, index=True)  # Unique within a batch
     url = Column(String)
     description = Column(Text)
     website = Column(String)
@@ -27,22 +84,28 @@ class Company(Base):
     founded_year = Column(String)
     location = Column(String)
     short_description = Column(Text, nullable=True)
-    tags = Column(Text, default='[]')  # Store as JSON string array of tags
+    tags = Column(Text, default='[]')  # Legacy JSON tags, migrated into company_tags by migrate_tags()
+    content_hash = Column(String(64), nullable=True)  # Hash of the CSV-derived columns (see company_row)
+    site_text = Column(Text, nullable=True)  # Text extracted from the website by enrich.py (searched)
+    linkedin_status = Column(Text, nullable=True)  # JSON: LinkedIn URL -> ok/broken/unknown, from enrich.py
+
+    __table_args__ = (
+        Index('uq_companies_batch_name', 'batch', 'name', unique=True),
+    )
+
+    # Tags in display order (loaded with one extra SELECT ... IN query per list)
+    tag_rows = relationship(
+        "CompanyTag", order_by="CompanyTag.position", lazy="selectin",
+        cascade="all, delete-orphan", passive_deletes=True
+    )
 
     def to_dict(self):
         """Convert company to dictionary for API responses"""
-        try:
-            # Fixed to avoid SQLAlchemy boolean evaluation error
-            founders_str = str(self.founders) if self.founders is not None else None
-            if founders_str and founders_str.startswith('[') and founders_str.endswith(']'):
-                founders = json.loads(founders_str)
-            else:
-                founders = []
-        except:
-            founders = []
+        founders = parse_founders(self.founders)
             
         return {
             "id": self.id,  # Add ID field for API calls
+            "batch": self.batch,
             "name": self.name,
             "url": self.url,
             "description": self.description,
@@ -55,53 +118,889 @@ class Company(Base):
             "founded_year": self.founded_year,
             "location": self.location,
             "short_description": self.short_description,
-            "tags": json.loads(self.tags) if self.tags and isinstance(self.tags, str) else []
+            "tags": [row.tag for row in self.tag_rows],
+            "site_text": self.site_text or "",
+            "linkedin_status": loads(self.linkedin_status) if self.linkedin_status else {}
         }
 
+# Sort value for unranked companies (votes 0), so they follow every ranked company of their tier
+UNRANKED_SORT = 2147483647
+
+# Rank as used for ordering; literal SQL so queries match the index expression exactly
+RANK_SORT = case(
+    (Company.votes > literal_column('0'), Company.votes),
+    else_=literal_column(str(UNRANKED_SORT))
+)
+
+# Display order within a batch: tier (A first), then rank (1 first, unranked last), then id
+COMPANY_ORDER = (Company.tier, RANK_SORT, Company.id)
+COMPANY_ORDER_INDEX = Index('ix_companies_batch_tier_rank', Company.batch, *COMPANY_ORDER)
+
+# Define company tag association (one row per tag)
+class CompanyTag(Base):
+    __tablename__ = "company_tags"
+
+    id = Column(Integer, primary_key=True)
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), nullable=False)
+    tag = Column(String, nullable=False, index=True)
+    position = Column(Integer, nullable=False, default=0)  # Display order within the company
+
+    __table_args__ = (
+        UniqueConstraint('company_id', 'tag', name='uq_company_tags_company_tag'),
+        Index('ix_company_tags_company_position', 'company_id', 'position'),
+    )
+
+# Define change log; the id of the latest entry is the dataset version
+class CompanyChange(Base):
+    __tablename__ = "company_changes"
+
+    id = Column(Integer, primary_key=True)
+    company_id = Column(Integer, nullable=True, index=True)  # None for whole-dataset changes (reloads)
+    changes = Column(Text)  # JSON object of changed fields
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+# Define source file state per batch, so unchanged CSVs aren't parsed again at startup
+class BatchSource(Base):
+    __tablename__ = "batch_sources"
+
+    batch = Column(String, primary_key=True)
+    csv_path = Column(String)
+    sha256 = Column(String(64))  # Hex digest of the CSV the batch was last loaded from
+    loaded_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+# Define per-user rankings: one row per user and company they ranked or tiered
+class UserRanking(Base):
+    __tablename__ = "user_rankings"
+
+    user_id = Column(String, primary_key=True)
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), primary_key=True)
+    votes = Column(Integer, nullable=False, default=0)  # Same scale as Company.votes: 1 is best, 0 unranked
+    tier = Column(String, nullable=True)  # None until the user picks one
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index('ix_user_rankings_company', 'company_id'),
+    )
+
+# Define the consensus summary of a company's user rankings, kept up to date
+# incrementally in the same transaction as every UserRanking change
+class CompanyConsensus(Base):
+    __tablename__ = "company_consensus"
+
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"), primary_key=True)
+    rankers = Column(Integer, nullable=False, default=0)  # Users with a ranking row
+    ranked = Column(Integer, nullable=False, default=0)  # Users who gave it a rank (votes > 0)
+    rank_sum = Column(Integer, nullable=False, default=0)  # Sum of those ranks
+    tier_a = Column(Integer, nullable=False, default=0)  # Users who put it in each tier
+    tier_b = Column(Integer, nullable=False, default=0)
+    tier_c = Column(Integer, nullable=False, default=0)
+    tier_d = Column(Integer, nullable=False, default=0)
+
+# Define background reload jobs (stored so any worker can report their status)
+class ReloadJob(Base):
+    __tablename__ = "reload_jobs"
+
+    id = Column(Integer, primary_key=True)
+    batches = Column(String)  # Comma-separated batch keys
+    status = Column(String, nullable=False, default='pending')  # pending, running, done, failed
+    results = Column(Text, default='{}')  # JSON: batch -> {inserted, updated, deleted, unchanged}
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
 # Create tables
 def create_tables():
     Base.metadata.create_all(bind=engine)
+    migrate_batches()
+    migrate_content_hash()
+    migrate_enrichment()
+    # create_all skips indexes of tables that already exist
+    with engine.begin() as conn:
+        for index in Company.__table__.indexes:
+            conn.execute(CreateIndex(index, if_not_exists=True))
+    migrate_tags()
+
+# Add the batch column to a companies table from before batches existed
+def migrate_batches():
+    """Existing rows become DEFAULT_BATCH; name uniqueness moves to (batch, name)"""
+    columns = {column['name'] for column in inspect(engine).get_columns('companies')}
+    if 'batch' in columns:
+        return
+    with engine.begin() as conn:
+        # DEFAULT_BATCH is checked against BATCH_KEY_RE, so it is safe to inline
+        conn.execute(text(f"ALTER TABLE companies ADD COLUMN batch VARCHAR NOT NULL DEFAULT '{DEFAULT_BATCH}'"))
+        # Recreated by create_tables(): non-unique name index, batch-leading order index
+        conn.execute(text("DROP INDEX IF EXISTS ix_companies_name"))
+        conn.execute(text("DROP INDEX IF EXISTS ix_companies_tier_rank"))
+
+# Add the content_hash column to a companies table from before delta reloads
+def migrate_content_hash():
+    """Existing rows get NULL, so the next reload rewrites them once and fills it in"""
+    columns = {column['name'] for column in inspect(engine).get_columns('companies')}
+    if 'content_hash' not in columns:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE companies ADD COLUMN content_hash VARCHAR(64)"))
+
+# Add the enrichment columns (filled in by enrich.py, never by CSV loads)
+def migrate_enrichment():
+    """Existing rows get NULL until the next enrichment run"""
+    columns = {column['name'] for column in inspect(engine).get_columns('companies')}
+    with engine.begin() as conn:
+        for column in ('site_text', 'linkedin_status'):
+            if column not in columns:
+                conn.execute(text(f"ALTER TABLE companies ADD COLUMN {column} TEXT"))
+
+# Move tags from the legacy JSON column into company_tags
+def migrate_tags():
+    """Copy JSON tags into company_tags rows and clear the JSON column (idempotent)"""
+    db = SessionLocal()
+    try:
+        legacy = db.query(Company.id, Company.tags).filter(
+            Company.tags.isnot(None), Company.tags != '', Company.tags != '[]'
+        ).all()
+        if not legacy:
+            return
+
+        rows = []
+        for company_id, tags_json in legacy:
+            try:
+                tags = json.loads(tags_json)
+            except json.JSONDecodeError:
+                tags = []
+            seen = set()
+            for tag in tags:
+                if isinstance(tag, str) and tag and tag not in seen:
+                    seen.add(tag)
+                    rows.append({'company_id': company_id, 'tag': tag, 'position': len(seen) - 1})
+
+        if rows:
+            db.execute(insert_for_dialect(CompanyTag.__table__).on_conflict_do_nothing(), rows)
+        db.query(Company).filter(Company.id.in_([company_id for company_id, _ in legacy])).update(
+            {"tags": '[]'}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+# Atomic mutations: each builds one statement that changes the row in SQL and
+# returns the new value, so concurrent clicks can't overwrite each other and a
+# missing company simply returns no row.
+
+# Set the rank of a company
+def set_votes_statement(company_id, votes):
+    """UPDATE votes RETURNING votes"""
+    return (
+        update(Company).where(Company.id == company_id)
+        .values(votes=votes)
+        .returning(Company.votes)
+        .execution_options(synchronize_session=False)
+    )
+
+# Demote a company (higher rank number); unranked companies start at rank 2
+def increment_votes_statement(company_id):
+    """UPDATE votes = votes + 1 RETURNING votes"""
+    current = func.coalesce(Company.votes, 0)
+    return (
+        update(Company).where(Company.id == company_id)
+        .values(votes=case((current == 0, 2), else_=current + 1))
+        .returning(Company.votes)
+        .execution_options(synchronize_session=False)
+    )
+
+# Promote a company (lower rank number); never below rank 1
+def decrement_votes_statement(company_id):
+    """UPDATE votes = votes - 1 RETURNING votes"""
+    current = func.coalesce(Company.votes, 0)
+    return (
+        update(Company).where(Company.id == company_id)
+        .values(votes=case((current <= 1, 1), else_=current - 1))
+        .returning(Company.votes)
+        .execution_options(synchronize_session=False)
+    )
+
+# Set the tier of a company
+def set_tier_statement(company_id, tier):
+    """UPDATE tier RETURNING tier"""
+    return (
+        update(Company).where(Company.id == company_id)
+        .values(tier=tier)
+        .returning(Company.tier)
+        .execution_options(synchronize_session=False)
+    )
+
+# Append a tag after the company's existing tags (no-op if already present)
+def add_tag_statement(company_id, tag):
+    """INSERT ... SELECT next position ... ON CONFLICT DO NOTHING RETURNING position"""
+    next_position = (
+        select(func.coalesce(func.max(CompanyTag.position), -1) + 1)
+        .where(CompanyTag.company_id == company_id)
+        .scalar_subquery()
+    )
+    source = select(Company.id, literal(tag), next_position).where(Company.id == company_id)
+    return (
+        insert_for_dialect(CompanyTag.__table__)
+        .from_select(['company_id', 'tag', 'position'], source)
+        .on_conflict_do_nothing(index_elements=['company_id', 'tag'])
+        .returning(CompanyTag.__table__.c.position)
+    )
+
+# Remove a tag by value, or the tag at a display index
+def remove_tag_statement(company_id, tag_index=None, tag=None):
+    """DELETE the tag (or the tag_index-th tag by position) RETURNING tag"""
+    table = CompanyTag.__table__
+    if tag is not None:
+        return delete(table).where(table.c.company_id == company_id, table.c.tag == tag).returning(table.c.tag)
+    target = (
+        select(CompanyTag.id)
+        .where(CompanyTag.company_id == company_id)
+        .order_by(CompanyTag.position)
+        .limit(1).offset(tag_index)
+        .scalar_subquery()
+    )
+    return delete(table).where(table.c.id == target).returning(table.c.tag)
+
+# Lock a company's row until the transaction ends, so edits of its tags are serialized
+async def lock_company(db, company_id):
+    """Id of the company, locked FOR UPDATE where supported (None if it doesn't exist)"""
+    stmt = select(Company.id).where(Company.id == company_id).with_for_update()
+    return (await db.execute(stmt)).scalar_one_or_none()
+
+# Record changes in the change log and return the new dataset version
+async def record_changes(db, changes):
+    """Insert one change log row per (company_id, fields) pair; returns the latest version"""
+    rows = [{'company_id': company_id, 'changes': json.dumps(fields)} for company_id, fields in changes]
+    if not rows:
+        return await get_dataset_version(db)
+    table = CompanyChange.__table__
+    versions = (await db.execute(insert(table).returning(table.c.id), rows)).scalars().all()
+    return max(versions)
+
+# Record a single change
+async def record_change(db, company_id, **fields):
+    """Log a change to one company (or the whole dataset if company_id is None)"""
+    return await record_changes(db, [(company_id, fields)])
+
+# Current dataset version
+async def get_dataset_version(db):
+    """Id of the latest change log entry (0 if nothing changed yet)"""
+    return (await db.execute(select(func.coalesce(func.max(CompanyChange.id), 0)))).scalar()
+
+# When a version was recorded
+async def get_version_timestamp(db, version):
+    """created_at of the change log entry with this id (None for version 0 or unknown ids)"""
+    return (await db.execute(select(CompanyChange.created_at).where(CompanyChange.id == version))).scalar()
+
+# Change log entries after a version (oldest first)
+async def get_changes_since(db, since, limit):
+    """List changes with id > since as {version, company_id, changes}"""
+    rows = await db.execute(
+        select(CompanyChange.id, CompanyChange.company_id, CompanyChange.changes)
+        .where(CompanyChange.id > since)
+        .order_by(CompanyChange.id)
+        .limit(limit)
+    )
+    return [
+        {"version": version, "company_id": company_id, "changes": json.loads(changes) if changes else {}}
+        for version, company_id, changes in rows
+    ]
+
+# Get all companies (tags are eager-loaded in the same call)
+async def get_companies(db):
+    """List all Company rows"""
+    return (await db.execute(select(Company))).scalars().all()
+
+# Get some companies of a batch
+async def get_companies_by_ids(db, company_ids, batch=DEFAULT_BATCH):
+    """List the Company rows of a batch with these ids (unknown ids are skipped)"""
+    if not company_ids:
+        return []
+    stmt = select(Company).where(Company.batch == batch, Company.id.in_(company_ids))
+    return (await db.execute(stmt)).scalars().all()
+
+# One page of companies in display order (keyset pagination)
+def companies_page_statement(limit, after=None, tier=None, batch=DEFAULT_BATCH):
+    """SELECT companies of a batch after the (tier, rank sort, id) key ``after``, optionally in one tier"""
+    stmt = select(Company).where(Company.batch == batch).order_by(*COMPANY_ORDER).limit(limit)
+    if tier is not None:
+        stmt = stmt.where(Company.tier == tier)
+    if after is not None:
+        stmt = stmt.where(tuple_(*COMPANY_ORDER) > tuple_(*after))
+    return stmt
+
+# Get a page of companies
+async def get_companies_page(db, limit, after=None, tier=None, batch=DEFAULT_BATCH):
+    """List up to limit Company rows following the key ``after``"""
+    return (await db.execute(companies_page_statement(limit, after, tier, batch))).scalars().all()
+
+# Companies per chunk when streaming a batch (rows fetched from the cursor at a time)
+EXPORT_CHUNK_SIZE = 500
+
+# Columns of streamed (exported) companies; tags and parsed founders are added per row
+EXPORT_COLUMNS = [
+    Company.id, Company.batch, Company.name, Company.tier, Company.votes, Company.founders,
+    Company.website, Company.url, Company.company_linkedin, Company.short_description,
+    Company.founded_year, Company.location
+]
+
+# Stream a batch in display order without loading it into memory
+async def stream_companies(db, batch=DEFAULT_BATCH, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield lists of up to chunk_size company dicts (founders parsed, tags in order)
+
+    Rows come from a server-side cursor (yield_per) in index order, and each
+    chunk's tags are read with one extra SELECT ... IN query, so memory use
+    depends on the chunk size rather than the batch size.
+    """
+    stmt = (
+        select(*EXPORT_COLUMNS).where(Company.batch == batch).order_by(*COMPANY_ORDER)
+        .execution_options(yield_per=chunk_size)
+    )
+    result = await db.stream(stmt)
+    async for rows in result.partitions():
+        tags = defaultdict(list)
+        tag_rows = await db.execute(
+            select(CompanyTag.company_id, CompanyTag.tag)
+            .where(CompanyTag.company_id.in_([row.id for row in rows]))
+            .order_by(CompanyTag.company_id, CompanyTag.position)
+        )
+        for company_id, tag in tag_rows:
+            tags[company_id].append(tag)
+        yield [
+            dict(row._mapping, founders=parse_founders(row.founders), tags=tags[row.id])
+            for row in rows
+        ]
+
+# Count companies of a batch (optionally in one tier)
+async def count_companies(db, tier=None, batch=DEFAULT_BATCH):
+    """Number of companies"""
+    stmt = select(func.count(Company.id)).where(Company.batch == batch)
+    if tier is not None:
+        stmt = stmt.where(Company.tier == tier)
+    return (await db.execute(stmt)).scalar()
+
+# Check whether a batch has been loaded
+async def batch_exists(db, batch):
+    """True if any company belongs to the batch"""
+    return (await db.execute(select(Company.id).where(Company.batch == batch).limit(1))).first() is not None
+
+# Per-user vote changes, from the user's current votes (0 = unranked); same rules as the
+# shared increment/decrement statements
+def next_user_votes(op, current, rank=None):
+    """New votes after a rank/upvote/downvote operation"""
+    if op == "rank":
+        return max(rank, 1)
+    if op == "upvote":
+        return 2 if current == 0 else current + 1
+    return 1 if current <= 1 else current - 1
+
+CONSENSUS_COUNTS = ['rankers', 'ranked', 'rank_sum', 'tier_a', 'tier_b', 'tier_c', 'tier_d']
+TIER_COUNTS = {'A': 'tier_a', 'B': 'tier_b', 'C': 'tier_c', 'D': 'tier_d'}
+
+# What one user's ranking row adds to a company's consensus counts
+def consensus_contribution(votes, tier):
+    """Counts for a ranking row; votes None means no row"""
+    counts = dict.fromkeys(CONSENSUS_COUNTS, 0)
+    if votes is None:
+        return counts
+    counts['rankers'] = 1
+    if votes > 0:
+        counts['ranked'] = 1
+        counts['rank_sum'] = votes
+    if tier in TIER_COUNTS:
+        counts[TIER_COUNTS[tier]] = 1
+    return counts
+
+# Consensus counts as exposed by the API
+def consensus_summary(counts):
+    """{rankers, ranked, rank_sum, tiers} from a CompanyConsensus row (or None)"""
+    get = (lambda key: getattr(counts, key)) if counts is not None else (lambda key: 0)
+    return {
+        "rankers": get('rankers'),
+        "ranked": get('ranked'),
+        "rank_sum": get('rank_sum'),
+        "tiers": {tier: get(column) for tier, column in TIER_COUNTS.items()},
+    }
+
+# Change one user's ranking of a company and fold the difference into its consensus row
+async def set_user_ranking(db, user_id, company_id, op, value=None):
+    """Apply rank/upvote/downvote/tier for a user; returns {votes, tier, consensus} or None if no such company
+
+    The user's row is created (or locked, on PostgreSQL) before it is read,
+    so concurrent changes by the same user can't double count.
+    """
+    if (await db.execute(select(Company.id).where(Company.id == company_id))).first() is None:
+        return None
+
+    table = UserRanking.__table__
+    created = (await db.execute(
+        insert_for_dialect(table).values(user_id=user_id, company_id=company_id, votes=0)
+        .on_conflict_do_nothing().returning(table.c.company_id)
+    )).first() is not None
+    old = (await db.execute(
+        select(table.c.votes, table.c.tier)
+        .where(table.c.user_id == user_id, table.c.company_id == company_id).with_for_update()
+    )).first()
+
+    votes, tier = old.votes, old.tier
+    if op == "tier":
+        tier = value
+    else:
+        votes = next_user_votes(op, votes, value)
+    await db.execute(
+        update(table).where(table.c.user_id == user_id, table.c.company_id == company_id)
+        .values(votes=votes, tier=tier, updated_at=func.now())
+    )
+
+    before = consensus_contribution(None, None) if created else consensus_contribution(old.votes, old.tier)
+    after = consensus_contribution(votes, tier)
+    delta = {key: after[key] - before[key] for key in CONSENSUS_COUNTS}
+
+    summary_table = CompanyConsensus.__table__
+    stmt = insert_for_dialect(summary_table).values(company_id=company_id, **delta)
+    counts = (await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[summary_table.c.company_id],
+            set_={key: summary_table.c[key] + stmt.excluded[key] for key in CONSENSUS_COUNTS}
+        ).returning(*[summary_table.c[key] for key in CONSENSUS_COUNTS])
+    )).first()
+    return {"votes": votes, "tier": tier, "consensus": consensus_summary(counts)}
+
+# A user's rankings within a batch
+async def get_user_rankings(db, user_id, batch):
+    """Map company id -> (votes, tier) for the user's rows in the batch"""
+    rows = await db.execute(
+        select(UserRanking.company_id, UserRanking.votes, UserRanking.tier)
+        .join(Company, Company.id == UserRanking.company_id)
+        .where(UserRanking.user_id == user_id, Company.batch == batch)
+    )
+    return {company_id: (votes, tier) for company_id, votes, tier in rows}
+
+# Consensus rows of a batch (read from the summary table, never recomputed)
+async def get_consensus(db, batch):
+    """Map company id -> CompanyConsensus row for companies someone ranked"""
+    rows = await db.execute(
+        select(CompanyConsensus).join(Company, Company.id == CompanyConsensus.company_id)
+        .where(Company.batch == batch)
+    )
+    return {row.company_id: row for row in rows.scalars()}
+
+# Hash of the CSV a batch was last loaded from
+async def get_source_hash(db, batch):
+    """SHA-256 hex digest stored for the batch, or None if it was never recorded"""
+    return (await db.execute(select(BatchSource.sha256).where(BatchSource.batch == batch))).scalar()
+
+# Start a reload job record
+async def create_reload_job(db, batches):
+    """Insert a pending ReloadJob for the given batch keys and return its id"""
+    job = ReloadJob(batches=','.join(batches), status='pending', results='{}')
+    db.add(job)
+    await db.flush()
+    return job.id
+
+# Update a reload job's status and results
+async def update_reload_job(db, job_id, status, results=None, error=None):
+    """Set status (and results/error); finished_at is set for done and failed jobs"""
+    values = {'status': status, 'error': error}
+    if results is not None:
+        values['results'] = json.dumps(results)
+    if status in ('done', 'failed'):
+        values['finished_at'] = func.now()
+    await db.execute(update(ReloadJob).where(ReloadJob.id == job_id).values(**values))
+
+# Get a reload job (the latest one if no id is given)
+async def get_reload_job(db, job_id=None):
+    """ReloadJob as a dict, or None"""
+    stmt = select(ReloadJob)
+    stmt = stmt.where(ReloadJob.id == job_id) if job_id is not None else stmt.order_by(ReloadJob.id.desc()).limit(1)
+    job = (await db.execute(stmt)).scalars().first()
+    if job is None:
+        return None
+    return {
+        "id": job.id,
+        "batches": job.batches.split(',') if job.batches else [],
+        "status": job.status,
+        "results": json.loads(job.results) if job.results else {},
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+# Count companies per batch
+async def get_batch_counts(db):
+    """Map batch key -> number of companies in the database"""
+    rows = await db.execute(select(Company.batch, func.count(Company.id)).group_by(Company.batch))
+    return {batch: n for batch, n in rows}
+
+# Get a company by ID
+async def get_company(db, company_id):
+    """Company row or None"""
+    return await db.get(Company, company_id)
+
+# Get tags of a company in display order
+async def get_company_tags(db, company_id):
+    """List a company's tags ordered by position"""
+    rows = await db.execute(
+        select(CompanyTag.tag).where(CompanyTag.company_id == company_id).order_by(CompanyTag.position)
+    )
+    return rows.scalars().all()
+
+# Count companies per tag (for the tag filter dropdown)
+async def get_tag_counts(db, batch=None):
+    """Tag facet counts (optionally within one batch), most used first"""
+    count = func.count(CompanyTag.id)
+    stmt = select(CompanyTag.tag, count).group_by(CompanyTag.tag).order_by(count.desc(), CompanyTag.tag)
+    if batch is not None:
+        stmt = stmt.join(Company, Company.id == CompanyTag.company_id).where(Company.batch == batch)
+    rows = await db.execute(stmt)
+    return [{"tag": tag, "count": n} for tag, n in rows]
+
+# Columns refreshed from the CSV on reload; votes, tier and tags are left untouched
+RELOADED_COLUMNS = [
+    'url', 'description', 'website', 'company_linkedin', 'founders',
+    'founded_year', 'location', 'short_description'
+]
+
+# Dialect-specific INSERT (both support ON CONFLICT ... DO UPDATE)
+def insert_for_dialect(table):
+    """Return an INSERT construct for the current database dialect"""
+    if engine.dialect.name == 'postgresql':
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+# Convert a parsed company dict into a row for the companies table
+def company_row(company_data, batch=DEFAULT_BATCH):
+    """Build the column values for one company (per-company fixes are applied by ingest rules)"""
+    row = {
+        'batch': batch,
+        'name': company_data['name'],
+        'url': company_data['url'],
+        'description': company_data['description'],
+        'website': company_data['website'],
+        'company_linkedin': company_data.get('company_linkedin'),
+        # Convert founders list to JSON string
+        'founders': json.dumps(company_data.get('founders', [])),
+        'votes': company_data.get('rank', 0),  # Use 'rank' for backward compatibility
+        'founded_year': company_data.get('founded_year', 'Unknown'),
+        'location': company_data.get('location', 'Unknown'),
+        'short_description': company_data.get('short_description')
+    }
+    row['content_hash'] = content_hash(row)
+    return row
+
+# Hash of the columns a reload would write, to tell which companies actually changed
+def content_hash(row):
+    """SHA-256 hex digest of a row's RELOADED_COLUMNS"""
+    values = json.dumps([row[column] for column in RELOADED_COLUMNS], default=str)
+    return hashlib.sha256(values.encode('utf-8')).hexdigest()
+
+# Bulk insert or update companies keyed on (batch, name)
+def upsert_companies(db, companies_data, batch=DEFAULT_BATCH):
+    """Insert new companies and refresh CSV fields of existing ones in a single executemany"""
+    rows = [company_row(company_data, batch) for company_data in companies_data]
+    if not rows:
+        return 0
+
+    stmt = insert_for_dialect(Company.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Company.batch, Company.name],
+        set_={column: stmt.excluded[column] for column in RELOADED_COLUMNS + ['content_hash']}
+    )
+    db.execute(stmt, rows)
+    return len(rows)
+
+# Remember which file a batch was loaded from
+def set_source_hash(db, batch, csv_path, sha256):
+    """Insert or update the batch's BatchSource row (not committed)"""
+    stmt = insert_for_dialect(BatchSource.__table__).values(batch=batch, csv_path=csv_path, sha256=sha256)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[BatchSource.batch],
+        set_={'csv_path': csv_path, 'sha256': sha256, 'loaded_at': func.now()}
+    ))
+
+# Serialize writers of a batch's company rows across workers and processes
+def lock_batch(db, batch):
+    """Wait for and take a lock on the batch, held until the transaction ends
+
+    Postgres gets a transaction-scoped advisory lock per batch. SQLite has one
+    writer at a time, so starting the transaction with a (no-op) write makes
+    other writers wait for it, and reads that follow see their commits.
+    """
+    if engine.dialect.name == 'postgresql':
+        key = int.from_bytes(hashlib.sha256(f"batch:{batch}".encode('utf-8')).digest()[:8], 'big', signed=True)
+        db.execute(select(func.pg_advisory_xact_lock(key)))
+    else:
+        db.execute(delete(BatchSource.__table__).where(false()))
+
+# Log whole-dataset changes from a sync session (bulk loads and maintenance)
+def log_reloads(db, batches):
+    """Insert a reload change log entry per batch (None: every batch); not committed"""
+    rows = [
+        {'company_id': None, 'changes': json.dumps({'reload': True} if batch is None else {'reload': True, 'batch': batch})}
+        for batch in batches
+    ]
+    db.execute(insert(CompanyChange.__table__), rows)
+
+# Stored source hashes, to skip CSVs that are already loaded
+def get_source_hashes():
+    """Map batch key -> SHA-256 the batch was last loaded from"""
+    with SessionLocal() as db:
+        return dict(db.execute(select(BatchSource.batch, BatchSource.sha256)).all())
 
 # Initialize database with companies
-def initialize_db(companies_data):
-    """Initialize database with company data if it doesn't exist already"""
+def initialize_db(companies_data, upsert=False, batch=DEFAULT_BATCH):
+    """Initialize database with a batch's company data if it doesn't exist already
+
+    With upsert=True the data is merged into an already populated batch:
+    CSV fields are updated in place and votes, tier and tags are kept.
+    """
     db = SessionLocal()
-    
-    # Check if database is already populated
-    if db.query(Company).count() > 0:
+    try:
+        # Check if the batch is already populated
+        if not upsert and db.query(Company.id).filter(Company.batch == batch).first() is not None:
+            return
+
+        upsert_companies(db, companies_data, batch)
+        db.commit()
+    finally:
         db.close()
-        return
-    
-    # Add companies to database
+
+# Rows per IN (...) list when deleting; stays under SQLite's bound parameter limit
+DELETE_CHUNK_SIZE = 500
+
+# Make a batch match freshly parsed CSV data, writing only what changed
+def reload_companies(companies_data, batch=DEFAULT_BATCH, csv_path=None, sha256=None):
+    """Diff parsed companies against the batch's rows by name and content hash
+
+    New companies are inserted, changed ones get their CSV fields updated
+    (votes, tier and tags are kept) and companies missing from the CSV are
+    deleted with their tags. The CSV's sha256, if given, is stored in the same
+    transaction, as is a change log entry telling clients to reload the batch
+    if anything changed. Concurrent reloads of a batch (from other workers or
+    the CLI) wait for each other, so each diffs against committed rows.
+    Returns {inserted, updated, deleted, unchanged} counts.
+    """
+    rows = {}
     for company_data in companies_data:
-        # Special handling for GroundControl to fix founder display issue
-        if company_data['name'] == 'GroundControl' and not company_data.get('founders'):
-            # Manually add founders for GroundControl if missing
-            company_data['founders'] = [
-                {'name': 'Matthew Noseworthy', 'linkedin': 'https://www.linkedin.com/in/matthew-noseworthy-218167106/'},
-                {'name': 'Mehul Shah', 'linkedin': 'https://www.linkedin.com/in/mehulmshah22'},
-                {'name': 'Nick Warren', 'linkedin': 'https://www.linkedin.com/in/nickcw/'}
-            ]
-        
-        # Convert founders list to JSON string
-        founders_json = json.dumps(company_data.get('founders', []))
-        
-        company = Company(
-            name=company_data['name'],
-            url=company_data['url'],
-            description=company_data['description'],
-            website=company_data['website'],
-            company_linkedin=company_data.get('company_linkedin'),
-            founders=founders_json,
-            votes=company_data.get('rank', 0),  # Use 'rank' for backward compatibility
-            founded_year=company_data.get('founded_year', 'Unknown'),
-            location=company_data.get('location', 'Unknown'),
-            short_description=company_data.get('short_description')
-        )
-        db.add(company)
-    
-    db.commit()
-    db.close()
+        row = company_row(company_data, batch)
+        rows[row['name']] = row
+
+    table = Company.__table__
+    db = SessionLocal()
+    try:
+        lock_batch(db, batch)
+        stored = {
+            name: (company_id, stored_hash)
+            for company_id, name, stored_hash in db.execute(
+                select(table.c.id, table.c.name, table.c.content_hash).where(table.c.batch == batch)
+            )
+        }
+
+        inserts = [row for name, row in rows.items() if name not in stored]
+        updates = [
+            {'company_id': stored[name][0], **{column: row[column] for column in RELOADED_COLUMNS + ['content_hash']}}
+            for name, row in rows.items()
+            if name in stored and stored[name][1] != row['content_hash']
+        ]
+        deletes = [company_id for name, (company_id, _) in stored.items() if name not in rows]
+
+        if inserts:
+            db.execute(insert(table), inserts)
+        if updates:
+            db.execute(
+                update(table).where(table.c.id == bindparam('company_id')).values(
+                    {column: bindparam(column) for column in RELOADED_COLUMNS + ['content_hash']}
+                ),
+                updates
+            )
+        for start in range(0, len(deletes), DELETE_CHUNK_SIZE):
+            chunk = deletes[start:start + DELETE_CHUNK_SIZE]
+            # SQLite doesn't enforce ON DELETE CASCADE unless foreign keys are switched on
+            for dependent in (CompanyTag.__table__, UserRanking.__table__, CompanyConsensus.__table__):
+                db.execute(delete(dependent).where(dependent.c.company_id.in_(chunk)))
+            db.execute(delete(table).where(table.c.id.in_(chunk)))
+        if sha256 is not None:
+            set_source_hash(db, batch, csv_path, sha256)
+        if inserts or updates or deletes:
+            log_reloads(db, [batch])
+        db.commit()
+    finally:
+        db.close()
+
+    return {
+        'inserted': len(inserts),
+        'updated': len(updates),
+        'deleted': len(deletes),
+        'unchanged': len(rows) - len(inserts) - len(updates),
+    }
+
+# Set shared votes, tiers and tags in bulk (rankings exported from this or another database)
+def import_rankings(rankings):
+    """Apply ranking dicts matched by (batch, name), or by id where there is no name
+
+    Each dict has batch and name or id, plus any of votes, tier and tags (a
+    list that replaces the company's tags); fields it doesn't have are left
+    alone. Everything is written in one transaction with a reload change log
+    entry per affected batch. Returns {updated, unknown} counts.
+    """
+    table = Company.__table__
+    tag_table = CompanyTag.__table__
+    db = SessionLocal()
+    try:
+        batches = {ranking['batch'] for ranking in rankings}
+        by_name, by_id = {}, {}
+        for company_id, batch, name in db.execute(
+            select(table.c.id, table.c.batch, table.c.name).where(table.c.batch.in_(batches))
+        ):
+            by_name[(batch, name)] = company_id
+            by_id[company_id] = batch
+
+        votes, tiers, tags = {}, {}, {}
+        updated_batches = set()
+        unknown = 0
+        for ranking in rankings:
+            if ranking.get('name'):
+                company_id = by_name.get((ranking['batch'], ranking['name']))
+            else:
+                company_id = ranking.get('id') if by_id.get(ranking.get('id')) == ranking['batch'] else None
+            if company_id is None:
+                unknown += 1
+                continue
+            if 'votes' in ranking:
+                votes[company_id] = ranking['votes']
+            if 'tier' in ranking:
+                tiers[company_id] = ranking['tier']
+            if 'tags' in ranking:
+                tags[company_id] = list(dict.fromkeys(ranking['tags']))
+            updated_batches.add(ranking['batch'])
+
+        if votes:
+            db.execute(
+                update(table).where(table.c.id == bindparam('company_id')).values(votes=bindparam('new_votes')),
+                [{'company_id': company_id, 'new_votes': value} for company_id, value in votes.items()]
+            )
+        if tiers:
+            db.execute(
+                update(table).where(table.c.id == bindparam('company_id')).values(tier=bindparam('new_tier')),
+                [{'company_id': company_id, 'new_tier': value} for company_id, value in tiers.items()]
+            )
+        tagged = list(tags)
+        for start in range(0, len(tagged), DELETE_CHUNK_SIZE):
+            db.execute(delete(tag_table).where(tag_table.c.company_id.in_(tagged[start:start + DELETE_CHUNK_SIZE])))
+        tag_rows = [
+            {'company_id': company_id, 'tag': tag, 'position': position}
+            for company_id, company_tags in tags.items() for position, tag in enumerate(company_tags)
+        ]
+        if tag_rows:
+            db.execute(insert(tag_table), tag_rows)
+        if updated_batches:
+            log_reloads(db, sorted(updated_batches))
+        db.commit()
+    finally:
+        db.close()
+
+    return {'updated': len(rankings) - unknown, 'unknown': unknown}
+
+# Companies to enrich, as plain dicts
+def get_enrichment_targets(batches=None):
+    """{id, batch, website, company_linkedin, founders} of every company (or those of some batches)"""
+    table = Company.__table__
+    stmt = select(table.c.id, table.c.batch, table.c.website, table.c.company_linkedin, table.c.founders)
+    if batches:
+        stmt = stmt.where(table.c.batch.in_(batches))
+    with SessionLocal() as db:
+        return [dict(row._mapping, founders=parse_founders(row.founders)) for row in db.execute(stmt.order_by(table.c.id))]
+
+# Store enrichment results, writing only companies whose values changed
+def set_enrichment(results):
+    """Apply {company id: {site_text, linkedin_status}} (None values are left alone); returns the companies updated
+
+    Changed companies are written in one transaction with a reload change log
+    entry per affected batch.
+    """
+    table = Company.__table__
+    db = SessionLocal()
+    try:
+        stored = {}
+        ids = list(results)
+        for start in range(0, len(ids), DELETE_CHUNK_SIZE):
+            rows = db.execute(
+                select(table.c.id, table.c.batch, table.c.site_text, table.c.linkedin_status)
+                .where(table.c.id.in_(ids[start:start + DELETE_CHUNK_SIZE]))
+            )
+            stored.update((row.id, row) for row in rows)
+
+        updates, batches = [], set()
+        for company_id, values in results.items():
+            row = stored.get(company_id)
+            if row is None:
+                continue
+            site_text = row.site_text if values['site_text'] is None else values['site_text']
+            linkedin_status = row.linkedin_status if values['linkedin_status'] is None else json.dumps(values['linkedin_status'])
+            if (site_text, linkedin_status) != (row.site_text, row.linkedin_status):
+                updates.append({'company_id': company_id, 'new_site_text': site_text, 'new_linkedin_status': linkedin_status})
+                batches.add(row.batch)
+
+        if updates:
+            db.execute(
+                update(table).where(table.c.id == bindparam('company_id')).values(
+                    site_text=bindparam('new_site_text'), linkedin_status=bindparam('new_linkedin_status')
+                ),
+                updates
+            )
+            log_reloads(db, sorted(batches))
+        db.commit()
+    finally:
+        db.close()
+    return len(updates)
+
+# Recompute the consensus summary table from user_rankings (repairs drift in the incremental counts)
+def rebuild_consensus():
+    """Replace every CompanyConsensus row with counts aggregated from UserRanking; returns the rows written
+
+    A change log entry for every batch is recorded only if any count changed.
+    """
+    rankings = UserRanking.__table__
+    summary = CompanyConsensus.__table__
+    ranked = rankings.c.votes > 0
+    counts = {
+        'rankers': func.count(),
+        'ranked': func.sum(case((ranked, 1), else_=0)),
+        'rank_sum': func.sum(case((ranked, rankings.c.votes), else_=0)),
+        **{column: func.sum(case((rankings.c.tier == tier, 1), else_=0)) for tier, column in TIER_COUNTS.items()},
+    }
+    columns = [summary.c.company_id] + [summary.c[key] for key in CONSENSUS_COUNTS]
+
+    db = SessionLocal()
+    try:
+        before = set(db.execute(select(*columns)).all())
+        db.execute(delete(summary))
+        db.execute(insert(summary).from_select(
+            ['company_id'] + CONSENSUS_COUNTS,
+            select(rankings.c.company_id, *[counts[key] for key in CONSENSUS_COUNTS]).group_by(rankings.c.company_id)
+        ))
+        after = set(db.execute(select(*columns)).all())
+        if after != before:
+            log_reloads(db, [None])
+        db.commit()
+    finally:
+        db.close()
+    return len(after)
+
+# Housekeeping statements per dialect; they can't run inside a transaction
+def maintain_database(vacuum=True, analyze=True, reindex=False):
+    """Run REINDEX, VACUUM and/or ANALYZE on the whole database; returns the statements run"""
+    statements = []
+    if engine.dialect.name == 'postgresql':
+        if reindex:
+            statements += [f'REINDEX TABLE {table.name}' for table in Base.metadata.sorted_tables]
+        if vacuum or analyze:
+            statements.append(' '.join(word for word, wanted in (('VACUUM', vacuum), ('ANALYZE', analyze)) if wanted))
+    else:
+        statements += [word for word, wanted in (('REINDEX', reindex), ('VACUUM', vacuum), ('ANALYZE', analyze)) if wanted]
+
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        for statement in statements:
+            conn.execute(text(statement))
+    return statements
 
 # Get a database session
 def get_db():
@@ -109,4 +1008,9 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Get an async database session (request handlers)
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
\ No newline at end of file
@@ -0,0 +1,276 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Fetched pages and extracted text live here between runs (see FetchCache)
+ENRICH_CACHE_DIR = os.environ.get("ENRICH_CACHE_DIR", os.path.join("data", "enrich_cache"))
+
+# Seconds a fetched URL stays fresh; re-runs only fetch URLs older than this (or that failed)
+ENRICH_TTL = float(os.environ.get("ENRICH_TTL_DAYS", "7")) * 86400
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RATE = 1.0  # Requests per second to any one host
+DEFAULT_RETRIES = 3
+FETCH_TIMEOUT = 15
+RETRY_BACKOFF = 1.0  # Seconds before the first retry; doubles after each attempt
+MAX_RETRY_AFTER = 60  # Longest Retry-After we honour, in seconds
+MAX_BODY_BYTES = 2 << 20
+USER_AGENT = "yc-explorer-enrich/1.0"
+
+# Responses worth another attempt; other statuses are final
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Characters of extracted site text stored per company (only searched on the server, never sent to clients)
+SITE_TEXT_LIMIT = 1000
+
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+class FetchCache:
+    """On-disk cache of fetched URLs
+
+    Each URL has a small JSON entry (status, fetch time, error) under urls/;
+    response bodies and the text extracted from them are stored under objects/
+    by the SHA-256 of the body, so pages served at several URLs, or unchanged
+    between fetches, are stored and extracted once. ``evict`` deletes entries
+    past the TTL and objects no entry refers to any more.
+    """
+
+    def __init__(self, root: str = ENRICH_CACHE_DIR, ttl: float = ENRICH_TTL):
+        self.root = root
+        self.ttl = ttl
+
+    def _path(self, kind: str, digest: str, suffix: str) -> str:
+        return os.path.join(self.root, kind, digest[:2], digest + suffix)
+
+    def _entry_path(self, url: str) -> str:
+        return self._path('urls', hashlib.sha256(url.encode('utf-8')).hexdigest(), '.json')
+
+    def _write(self, path: str, data: bytes):
+        """Write via a temporary file and rename, so readers never see half a file"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp, 'wb') as f:
+            f.write(data)
+        os.replace(temp, path)
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """Cache entry for a URL, or None"""
+        try:
+            with open(self._entry_path(url), 'rb') as f:
+                return json.loads(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def is_fresh(self, entry: Optional[Dict[str, Any]], now: Optional[float] = None) -> bool:
+        """True if the entry is younger than the TTL and its fetch got a final answer"""
+        if entry is None or entry.get('error') or entry.get('status') in RETRY_STATUSES:
+            return False
+        return (now if now is not None else time.time()) - entry['fetched_at'] < self.ttl
+
+    def put(self, url: str, status: Optional[int], body: Optional[bytes] = None,
+            error: Optional[str] = None) -> Dict[str, Any]:
+        """Store a fetch result (the body, if given, goes into the object store)"""
+        digest = None
+        if body is not None:
+            digest = hashlib.sha256(body).hexdigest()
+            path = self._path('objects', digest, '.body')
+            if not os.path.exists(path):
+                self._write(path, body)
+        entry = {'url': url, 'status': status, 'error': error, 'content': digest, 'fetched_at': time.time()}
+        self._write(self._entry_path(url), json.dumps(entry).encode('utf-8'))
+        return entry
+
+    def text(self, entry: Dict[str, Any], extract: Callable[[bytes, str], str]) -> str:
+        """Text extracted from an entry's body ('' without one), memoized per body"""
+        digest = entry.get('content')
+        if not digest:
+            return ''
+        path = self._path('objects', digest, '.txt')
+        try:
+            with open(path, 'rb') as f:
+                return f.read().decode('utf-8')
+        except OSError:
+            pass
+        try:
+            with open(self._path('objects', digest, '.body'), 'rb') as f:
+                body = f.read()
+        except OSError:
+            return ''
+        text = extract(body, entry['url'])
+        self._write(path, text.encode('utf-8'))
+        return text
+
+    def evict(self, now: Optional[float] = None) -> Tuple[int, int]:
+        """Delete entries older than the TTL, then unreferenced objects; returns (entries, objects) removed"""
+        now = now if now is not None else time.time()
+        entries = objects = 0
+        referenced = set()
+        for path in self._files('urls'):
+            try:
+                with open(path, 'rb') as f:
+                    entry = json.loads(f.read())
+            except (OSError, ValueError):
+                entry = None
+            if entry is None or now - entry.get('fetched_at', 0) >= self.ttl:
+                os.remove(path)
+                entries += 1
+            elif entry.get('content'):
+                referenced.add(entry['content'])
+        for path in self._files('objects'):
+            if os.path.basename(path).split('.', 1)[0] not in referenced:
+                os.remove(path)
+                objects += 1
+        return entries, objects
+
+    def _files(self, kind: str) -> Iterable[str]:
+        for directory, _, filenames in os.walk(os.path.join(self.root, kind)):
+            for filename in filenames:
+                yield os.path.join(directory, filename)
+
+
+class HostRateLimiter:
+    """Spaces out requests so each host gets at most ``rate`` per second"""
+
+    def __init__(self, rate: float = DEFAULT_RATE):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next: Dict[str, float] = {}
+
+    def wait(self, url: str):
+        """Block until a request to the URL's host is allowed"""
+        host = urllib.parse.urlsplit(url).hostname or ''
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next.get(host, now))
+            self._next[host] = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def retry_after(headers) -> Optional[float]:
+    """Seconds from a Retry-After header (the delta-seconds form only), capped at MAX_RETRY_AFTER"""
+    value = headers.get('Retry-After') if headers is not None else None
+    if value is None or not value.strip().isdigit():
+        return None
+    return min(float(value), MAX_RETRY_AFTER)
+
+
+def fetch_url(url: str, limiter: HostRateLimiter, retries: int = DEFAULT_RETRIES, timeout: float = FETCH_TIMEOUT,
+              keep_body: bool = True) -> Tuple[Optional[int], Optional[bytes], Optional[str]]:
+    """GET a URL with rate limiting and retries; returns (status, HTML body or None, error or None)
+
+    Connection errors, timeouts and RETRY_STATUSES are retried with exponential
+    backoff (or the server's Retry-After). Only HTML bodies up to MAX_BODY_BYTES
+    are kept.
+    """
+    request = urllib.request.Request(url, headers={'User-Agent': USER_AGENT, 'Accept': 'text/html,*/*;q=0.5'})
+    status, error = None, None
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(delay)
+        limiter.wait(url)
+        delay = RETRY_BACKOFF * 2 ** attempt
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                status = response.status
+                if not keep_body or 'html' not in response.headers.get('Content-Type', ''):
+                    return status, None, None
+                return status, response.read(MAX_BODY_BYTES), None
+        except urllib.error.HTTPError as e:
+            status, error = e.code, None
+            if e.code not in RETRY_STATUSES:
+                return status, None, None
+            delay = retry_after(e.headers) or delay
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            status, error = None, str(getattr(e, 'reason', e))
+    return status, None, error
+
+
+def extract_text(body: bytes, url: str) -> str:
+    """Main text of an HTML page (trafilatura), whitespace collapsed and cut to SITE_TEXT_LIMIT at a word boundary"""
+    # trafilatura pulls in lxml and friends; only enrichment runs need it
+    import trafilatura
+
+    text = trafilatura.extract(body.decode('utf-8', errors='replace'), url=url,
+                               include_comments=False, include_tables=False) or ''
+    text = WHITESPACE_RE.sub(' ', text).strip()
+    if len(text) > SITE_TEXT_LIMIT:
+        text = text[:SITE_TEXT_LIMIT].rsplit(' ', 1)[0]
+    return text
+
+
+def link_status(entry: Optional[Dict[str, Any]]) -> str:
+    """ok, broken (404/410) or unknown (errors, and LinkedIn's 999/403 answers to automated requests)"""
+    status = entry.get('status') if entry else None
+    if status is not None and 200 <= status < 400:
+        return 'ok'
+    if status in (404, 410):
+        return 'broken'
+    return 'unknown'
+
+
+def company_links(company: Dict[str, Any]) -> List[str]:
+    """LinkedIn URLs of a company and its founders"""
+    links = [company.get('company_linkedin')]
+    links += [founder.get('linkedin') for founder in company.get('founders') or [] if isinstance(founder, dict)]
+    return list(dict.fromkeys(link for link in links if isinstance(link, str) and link.startswith('http')))
+
+
+def enrich_companies(companies: List[Dict[str, Any]], cache: FetchCache, concurrency: int = DEFAULT_CONCURRENCY,
+                     rate: float = DEFAULT_RATE, retries: int = DEFAULT_RETRIES, check_links: bool = True,
+                     force: bool = False, progress: Optional[Callable[[str], None]] = None,
+                     extract: Callable[[bytes, str], str] = extract_text) -> Dict[int, Dict[str, Any]]:
+    """Fetch what is stale, then build {company id: {site_text, linkedin_status}} from the cache
+
+    ``companies`` are dicts with id, website, company_linkedin and founders.
+    Websites are fetched for their text, LinkedIn URLs only for their status.
+    A value of None means "leave the stored value alone" (failed fetch, or
+    links not checked). ``extract`` turns a page body into its site text.
+    """
+    sites = {company['website'] for company in companies if (company.get('website') or '').startswith('http')}
+    links = {link for company in companies for link in company_links(company)} if check_links else set()
+
+    now = time.time()
+    stale = [url for url in sorted(sites | links) if force or not cache.is_fresh(cache.get(url), now)]
+    if progress:
+        progress(f"{len(sites)} websites, {len(links)} LinkedIn URLs; fetching {len(stale)}")
+
+    limiter = HostRateLimiter(rate)
+
+    def fetch(url: str):
+        status, body, error = fetch_url(url, limiter, retries, keep_body=url in sites)
+        return cache.put(url, status, body, error)
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as pool:
+        futures = [pool.submit(fetch, url) for url in stale]
+        for done, future in enumerate(as_completed(futures), start=1):
+            entry = future.result()
+            failed += bool(entry['error']) or entry['status'] in RETRY_STATUSES
+            if progress and (done % 25 == 0 or done == len(futures)):
+                progress(f"    {done}/{len(futures)} fetched, {failed} failed")
+
+    results = {}
+    for company in companies:
+        website = company.get('website') or ''
+        entry = cache.get(website) if website in sites else None
+        if website not in sites:
+            site_text = ''
+        elif entry is None or entry['error'] or entry['status'] in RETRY_STATUSES:
+            site_text = None  # Fetch failed this time; keep what an earlier run stored
+        else:
+            site_text = cache.text(entry, extract)
+        results[company['id']] = {
+            'site_text': site_text,
+            'linkedin_status': {link: link_status(cache.get(link)) for link in company_links(company)} if check_links else None,
+        }
+    return results
@@ -0,0 +1,125 @@
+import asyncio
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Seconds between change log polls while clients are connected (picks up
+# changes committed by other workers; local writes wake the poller at once)
+POLL_INTERVAL = 1.0
+
+# Seconds between keep-alive comments on idle streams
+HEARTBEAT_INTERVAL = 15.0
+
+# Larger backlogs on reconnect make the client reload the list instead
+MAX_REPLAY = 1000
+
+# Changes queued for one client; a client that falls further behind is dropped and told to reload
+QUEUE_SIZE = MAX_REPLAY
+
+
+def format_event(event: str, data: Dict[str, Any], event_id: Optional[int] = None) -> str:
+    """Serialize one server-sent event"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+class ChangeBroadcaster:
+    """Fans change log entries out to connected SSE clients of this worker
+
+    The change log table is the single source of events: a poller reads
+    entries newer than the last one it saw and puts them on every
+    subscriber's queue. It only runs while someone is subscribed.
+
+    Queues are bounded: when a slow client's queue is full, it is
+    unsubscribed, emptied and gets a single None, which tells the stream to
+    send a reset (and subscribe again).
+
+    A new subscriber tells the poller where its stream starts (``replay`` does
+    this, or ``resume_from`` after a reset), and the poller moves back there if
+    it is ahead, so nothing committed in between is skipped. Streams drop the
+    entries they already sent.
+    """
+
+    def __init__(self, fetch_changes: Callable[[int, int], Awaitable[List[Dict[str, Any]]]],
+                 fetch_version: Callable[[], Awaitable[int]]):
+        self._fetch_changes = fetch_changes
+        self._fetch_version = fetch_version
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._poller: Optional[asyncio.Task] = None
+        self.last_version: Optional[int] = None
+
+    def subscribe(self) -> asyncio.Queue:
+        """Register a client queue (starts the poller if needed)"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self._subscribers.add(queue)
+        if self._poller is None or self._poller.done():
+            self._wakeup = asyncio.Event()
+            self._poller = asyncio.create_task(self._poll())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    def _deliver(self, queue: asyncio.Queue, change: Dict[str, Any]) -> None:
+        try:
+            queue.put_nowait(change)
+        except asyncio.QueueFull:
+            self._subscribers.discard(queue)
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(None)
+
+    def notify(self) -> None:
+        """Wake the poller right away (called after a local commit)"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def resume_from(self, version: int) -> None:
+        """Make sure the poller delivers every change after ``version`` to current subscribers"""
+        if self.last_version is None or version < self.last_version:
+            self.last_version = version
+            self.notify()
+
+    async def replay(self, since: int) -> Optional[List[Dict[str, Any]]]:
+        """Changes after ``since`` (the poller continues after the last one), or None if the backlog is too large"""
+        changes = await self._fetch_changes(since, MAX_REPLAY + 1)
+        if len(changes) > MAX_REPLAY:
+            return None
+        self.resume_from(changes[-1]["version"] if changes else since)
+        return changes
+
+    async def _poll(self) -> None:
+        if self.last_version is None:
+            version = await self._fetch_version()
+            if self.last_version is None:  # Unless a subscriber resumed from a version meanwhile
+                self.last_version = version
+        while self._subscribers:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            since = self.last_version
+            try:
+                changes = await self._fetch_changes(since, MAX_REPLAY)
+            except Exception:
+                logger.exception("Error polling change log")
+                continue
+            for change in changes:
+                for queue in list(self._subscribers):
+                    self._deliver(queue, change)
+            # A subscriber may have moved the poller back while it was fetching
+            if changes and self.last_version == since:
+                self.last_version = changes[-1]["version"]
+            if len(changes) == MAX_REPLAY:
+                # More entries waiting; fetch them without sleeping
+                self._wakeup.set()
+        self._poller = None
+        self.last_version = None
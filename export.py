@@ -0,0 +1,140 @@
+import csv
+import io
+from typing import Any, AsyncIterator, Dict, List
+
+from serialization import dumps
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Optional; without it only CSV and JSON Lines exports are available
+    pyarrow = None
+
+# Media type per export format
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# CSV columns; list fields are joined with LIST_SEPARATOR
+CSV_COLUMNS = [
+    'id', 'batch', 'name', 'tier', 'votes', 'tags', 'founders', 'founder_linkedins',
+    'website', 'url', 'company_linkedin', 'short_description', 'founded_year', 'location'
+]
+LIST_SEPARATOR = '; '
+
+# Chunks of company dicts as produced by database.stream_companies
+Chunks = AsyncIterator[List[Dict[str, Any]]]
+
+
+def founder_fields(founders: List[Any]) -> List[Dict[str, Any]]:
+    """Founders as {name, linkedin} dicts (other keys and malformed entries dropped)"""
+    return [
+        {'name': founder.get('name'), 'linkedin': founder.get('linkedin')}
+        for founder in founders if isinstance(founder, dict)
+    ]
+
+
+def csv_row(company: Dict[str, Any]) -> List[Any]:
+    """One CSV row in CSV_COLUMNS order"""
+    founders = founder_fields(company['founders'])
+    row = dict(
+        company,
+        tags=LIST_SEPARATOR.join(company['tags']),
+        founders=LIST_SEPARATOR.join(founder['name'] or '' for founder in founders),
+        founder_linkedins=LIST_SEPARATOR.join(founder['linkedin'] or '' for founder in founders)
+    )
+    return [row[column] for column in CSV_COLUMNS]
+
+
+async def csv_stream(chunks: Chunks) -> AsyncIterator[bytes]:
+    """CSV export: the header right away, then one write per chunk"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def take() -> bytes:
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    writer.writerow(CSV_COLUMNS)
+    yield take()
+    async for chunk in chunks:
+        writer.writerows(csv_row(company) for company in chunk)
+        yield take()
+
+
+async def jsonl_stream(chunks: Chunks) -> AsyncIterator[bytes]:
+    """JSON Lines export: one object per company"""
+    async for chunk in chunks:
+        yield b''.join(dumps(dict(company, founders=founder_fields(company['founders']))) + b'\n' for company in chunk)
+
+
+class ChunkSink:
+    """Write-only file object that hands out what was written since the last take()
+
+    ParquetWriter asks the sink for its position to record row group offsets,
+    so tell() counts every byte ever written, not just the buffered ones.
+    """
+
+    def __init__(self):
+        self.closed = False
+        self._parts: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def parquet_schema():
+    """Arrow schema of the Parquet export (tags and founders as list columns)"""
+    string = pyarrow.string()
+    founder = pyarrow.struct([('name', string), ('linkedin', string)])
+    return pyarrow.schema([
+        ('id', pyarrow.int64()), ('batch', string), ('name', string), ('tier', string), ('votes', pyarrow.int64()),
+        ('tags', pyarrow.list_(string)), ('founders', pyarrow.list_(founder)),
+        ('website', string), ('url', string), ('company_linkedin', string), ('short_description', string),
+        ('founded_year', string), ('location', string),
+    ])
+
+
+async def parquet_stream(chunks: Chunks) -> AsyncIterator[bytes]:
+    """Parquet export: one row group per chunk, sent as soon as it is written (footer last)"""
+    schema = parquet_schema()
+    sink = ChunkSink()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema)
+    yield sink.take()
+    async for chunk in chunks:
+        records = [dict(company, founders=founder_fields(company['founders'])) for company in chunk]
+        writer.write_table(pyarrow.Table.from_pylist(records, schema=schema))
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+def export_stream(export_format: str, chunks: Chunks) -> AsyncIterator[bytes]:
+    """Encoded export body for one of EXPORT_FORMATS"""
+    streams = {"csv": csv_stream, "jsonl": jsonl_stream, "parquet": parquet_stream}
+    return streams[export_format](chunks)
@@ -0,0 +1,234 @@
+import hashlib
+import os
+import re
+import tomllib
+from typing import TYPE_CHECKING, List, Dict, Any, Iterable, Iterator, Optional, Union
+
+from batches import ORIGINAL_CSV, file_sha256
+
+# pandas takes ~0.5s to import; it's imported by the functions below so that
+# importing this module (e.g. at startup, when nothing needs parsing) stays cheap
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Columns we actually use from the YC export
+CSV_COLUMNS = [
+    'Company URL', 'Company Name', 'Company Description', 'Company Website',
+    'Founder Name', 'Founder LinkedIn', 'Founder Title'
+]
+
+# Rows read per chunk; keeps memory bounded for multi-batch exports
+DEFAULT_CHUNKSIZE = 50_000
+
+# Founder/description heuristics and per-company overrides
+RULES_PATH = os.environ.get("INGEST_RULES", os.path.join(os.path.dirname(os.path.abspath(__file__)), "ingest_rules.toml"))
+
+
+def _any_of(keywords: Iterable[str]) -> re.Pattern:
+    """Compile a list of literal keywords into a single alternation regex (matches nothing if empty)"""
+    keywords = list(keywords)
+    if not keywords:
+        return re.compile(r'(?!)')
+    return re.compile('|'.join(re.escape(keyword) for keyword in keywords))
+
+
+def _merge(base: Dict[str, Any], extra: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge a batch section into the base rules: tables recursively, lists appended"""
+    merged = dict(base)
+    for key, value in extra.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            # Company overrides are replaced whole rather than merged field by field
+            merged[key] = {**merged[key], **value} if key == 'companies' else _merge(merged[key], value)
+        elif isinstance(value, list) and isinstance(merged.get(key), list):
+            merged[key] = merged[key] + value
+        else:
+            merged[key] = value
+    return merged
+
+
+class IngestRules:
+    """Founder-extraction rules from ingest_rules.toml, compiled once per parse"""
+
+    def __init__(self, config: Dict[str, Any]):
+        founders = config.get('founders', {})
+        names = config.get('names', {})
+        self.founder_title_re = _any_of(founders.get('title_keywords', []))
+        self.min_name_length = names.get('min_length', 0)
+        self.max_name_length = names.get('max_length', 1_000)
+        self.reject_exact = list(names.get('reject_exact', []))
+        self.description_name_re = _any_of(names.get('reject_fragments', []) + names.get('reject_keywords', []))
+
+        companies = config.get('companies', {})
+        # (company, founder name) pairs that are founders whatever their title
+        self.forced_founders = [
+            (company, founder) for company, rules in companies.items() for founder in rules.get('founders', [])
+        ]
+        self.fallback_founders = {
+            company: rules['fallback_founders'] for company, rules in companies.items() if rules.get('fallback_founders')
+        }
+        self.fields = {company: rules['fields'] for company, rules in companies.items() if rules.get('fields')}
+
+    @classmethod
+    def load(cls, batch: Optional[str] = None, path: str = RULES_PATH) -> 'IngestRules':
+        """Read the rules file, applying the batch's section if it has one"""
+        with open(path, 'rb') as f:
+            config = tomllib.load(f)
+        batch_config = config.pop('batches', {}).get(batch) if batch else None
+        return cls(_merge(config, batch_config) if batch_config else config)
+
+    def apply_overrides(self, companies: Dict[str, Dict[str, Any]]):
+        """Fill in fallback founders and replace overridden fields of parsed companies"""
+        for name, founders in self.fallback_founders.items():
+            if name in companies and not companies[name]['founders']:
+                companies[name]['founders'] = [dict(founder) for founder in founders]
+        for name, fields in self.fields.items():
+            if name in companies:
+                companies[name].update(fields)
+
+
+def iter_csv_chunks(paths: Union[str, Iterable[str]], chunksize: Optional[int] = DEFAULT_CHUNKSIZE) -> Iterator['pd.DataFrame']:
+    """Yield DataFrame chunks from one or more CSV files, in file order"""
+    import pandas as pd
+
+    if isinstance(paths, str):
+        paths = [paths]
+    for path in paths:
+        if chunksize:
+            yield from pd.read_csv(path, usecols=CSV_COLUMNS, chunksize=chunksize)
+        else:
+            yield pd.read_csv(path, usecols=CSV_COLUMNS)
+
+
+def _founder_mask(chunk: 'pd.DataFrame', descriptions: 'pd.Series', rules: IngestRules) -> 'pd.Series':
+    """Boolean mask of rows whose founder name/title describe an actual founder"""
+    import pandas as pd
+
+    company_names = chunk['Company Name']
+    founder_names = chunk['Founder Name']
+    titles = chunk['Founder Title']
+
+    # Title check (non-string titles never match)
+    title_is_str = titles.map(lambda value: isinstance(value, str)).astype(bool)
+    is_founder = title_is_str & titles.where(title_is_str, '').str.contains(rules.founder_title_re)
+
+    # Per-company overrides
+    if rules.forced_founders:
+        is_founder |= pd.MultiIndex.from_arrays([company_names, founder_names]).isin(rules.forced_founders)
+
+    # Filter non-founder entries from founder fields
+    name_is_str = founder_names.map(lambda value: isinstance(value, str)).astype(bool)
+    names = founder_names.where(name_is_str, '')
+    lengths = names.str.len()
+    is_description = (
+        ~name_is_str
+        | (lengths < rules.min_name_length)
+        | (lengths > rules.max_name_length)
+        | (names == company_names)
+        | names.isin(rules.reject_exact)
+        # The first line in the CSV for each company repeats its description
+        | pd.Series(
+            [isinstance(desc, str) and desc.startswith(name) for desc, name in zip(descriptions, names)],
+            index=chunk.index, dtype=bool
+        )
+        | names.str.contains(rules.description_name_re)
+    )
+
+    return is_founder & ~is_description
+
+
+def ingest_csv(paths: Union[str, Iterable[str]], chunksize: Optional[int] = DEFAULT_CHUNKSIZE,
+               rules: Optional[IngestRules] = None) -> List[Dict[str, Any]]:
+    """Parse YC company CSV export(s) into a list of company dicts
+
+    Works chunk by chunk so memory stays bounded by ``chunksize`` rows plus the
+    resulting companies. Pass ``chunksize=None`` to read each file in one go.
+    ``rules`` defaults to the rules file without any batch section.
+    """
+    import pandas as pd
+
+    if rules is None:
+        rules = IngestRules.load()
+
+    companies: Dict[str, Dict[str, Any]] = {}
+    seen_founders = set()
+
+    for chunk in iter_csv_chunks(paths, chunksize):
+        # Register companies on their first row
+        first_rows = chunk.drop_duplicates('Company Name')
+        first_rows = first_rows[~first_rows['Company Name'].isin(companies)]
+        for name, url, description, website in zip(
+            first_rows['Company Name'], first_rows['Company URL'],
+            first_rows['Company Description'], first_rows['Company Website']
+        ):
+            companies[name] = {
+                'name': name,
+                'url': url,
+                'description': description,
+                'website': website,
+                'founders': [],
+                'company_linkedin': None,
+                'rank': 0  # Initial votes count is 0
+            }
+
+        # Description of each row's company (from its first row, possibly an earlier chunk)
+        descriptions = chunk['Company Name'].map(
+            {name: companies[name]['description'] for name in chunk['Company Name'].unique()}
+        )
+
+        # Founders, deduplicated per company and kept in CSV order
+        founder_rows = chunk[_founder_mask(chunk, descriptions, rules)]
+        founder_rows = founder_rows.drop_duplicates(['Company Name', 'Founder Name'])
+        for company_name, founder_name, linkedin in zip(
+            founder_rows['Company Name'], founder_rows['Founder Name'], founder_rows['Founder LinkedIn']
+        ):
+            key = (company_name, founder_name)
+            if key in seen_founders:
+                continue
+            seen_founders.add(key)
+            companies[company_name]['founders'].append({
+                'name': founder_name,
+                'linkedin': linkedin
+            })
+
+        # Capture company LinkedIn URL (the row where the "founder" is the company itself)
+        linkedin_urls = chunk['Founder LinkedIn'].astype(str)
+        company_rows = chunk[
+            (chunk['Founder Name'] == chunk['Company Name'])
+            & linkedin_urls.str.contains('linkedin.com/company', regex=False)
+        ]
+        for company_name, linkedin in zip(company_rows['Company Name'], linkedin_urls[company_rows.index]):
+            companies[company_name]['company_linkedin'] = linkedin
+
+    if not companies:
+        return []
+
+    # Extract location and founding year from description
+    descriptions = pd.Series([company['description'] for company in companies.values()], dtype=object)
+    founded_years = descriptions.str.extract(r'Founded in (\d{4})', expand=False).fillna('Unknown')
+    locations = descriptions.str.extract(r'based in ([^,\.]+(?:, [^,\.]+)*)', expand=False).str.strip().fillna('Unknown')
+    # Clean up description - get first sentence
+    short_descriptions = descriptions.str.split('.', n=1).str[0] + '.'
+
+    for company, founded_year, location, short_description in zip(
+        companies.values(), founded_years, locations, short_descriptions
+    ):
+        company['founded_year'] = founded_year
+        company['location'] = location
+        company['short_description'] = short_description
+
+    rules.apply_overrides(companies)
+
+    # Convert to list of companies
+    return list(companies.values())
+
+
+def process_csv_data(csv_path: str = ORIGINAL_CSV, chunksize: Optional[int] = DEFAULT_CHUNKSIZE,
+                     batch: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Parse a batch's CSV with the batch's rules from ingest_rules.toml"""
+    return ingest_csv(csv_path, chunksize=chunksize, rules=IngestRules.load(batch))
+
+
+def source_hash(csv_path: str) -> str:
+    """Fingerprint of everything a batch's parsed data depends on: SHA-256 over the CSV's and the rules file's digests"""
+    digests = [file_sha256(path) for path in (csv_path, RULES_PATH)]
+    return hashlib.sha256(':'.join(digests).encode('ascii')).hexdigest()
@@ -1,21 +1,56 @@
 from fastapi import FastAPI, Request, Form, Depends, HTTPException
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import RedirectResponse, JSONResponse
-import pandas as pd
+from fastapi.responses import RedirectResponse, JSONResponse, StreamingResponse, PlainTextResponse, Response
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware.gzip import GZipMiddleware
+import asyncio
+import base64
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+import hashlib
+import re
 import os
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Literal, Callable, Awaitable, Tuple
 import json
-import re
 import bleach
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 # Import database functionality
-from database import get_db, Company as DBCompany, create_tables, initialize_db
+from database import (
+    get_async_db, AsyncSessionLocal, engine, async_engine, Company as DBCompany, create_tables, reload_companies,
+    get_companies, get_company, get_companies_by_ids, get_companies_page, stream_companies, count_companies, get_tag_counts, get_company_tags, lock_company,
+    batch_exists, get_batch_counts, get_source_hash, UNRANKED_SORT,
+    set_votes_statement, increment_votes_statement, decrement_votes_statement, set_tier_statement,
+    add_tag_statement, remove_tag_statement, record_change, record_changes,
+    get_dataset_version, get_version_timestamp, get_changes_since, create_reload_job, update_reload_job, get_reload_job,
+    set_user_ranking, get_user_rankings, get_consensus, consensus_summary
+)
+from ingest import process_csv_data, source_hash
+from cache import company_cache
+from search_index import SearchIndex, search_index
+from events import ChangeBroadcaster, format_event, HEARTBEAT_INTERVAL, MAX_REPLAY
+from serialization import (
+    dumps, loads, join_array, RawJSONResponse, negotiate_encoding, compress, MIN_COMPRESS_SIZE, GZIP_LEVEL
+)
+from export import export_stream, EXPORT_FORMATS, pyarrow
+from analytics import batch_analytics
+from batches import BatchRegistry, discover_batches, DEFAULT_BATCH, ORIGINAL_CSV
+from metrics import metrics, timed, instrument_engine, MetricsMiddleware
 
 app = FastAPI(title="YC X25 Batch Explorer")
 
+# Compress other responses (HTML, small JSON); list bodies arrive pre-compressed and pass through
+app.add_middleware(GZipMiddleware, minimum_size=MIN_COMPRESS_SIZE, compresslevel=GZIP_LEVEL)
+
+# Per-request timing (METRICS_ENABLED / SERVER_TIMING); a pass-through when both are off
+app.add_middleware(MetricsMiddleware)
+if metrics.active:
+    instrument_engine(engine)
+    instrument_engine(async_engine.sync_engine)
+
 # Mount static directory
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -34,131 +69,422 @@ class CompanyModel(BaseModel):
     location: str
     company_linkedin: Optional[str] = None
 
-# CSV data file path
-ORIGINAL_CSV = "attached_assets/yc_companies_S25.csv"
-
-# Function to load and process data from CSV
-def process_csv_data():
-    """Process YC companies data from CSV file"""
-    # Process from CSV
-    df = pd.read_csv(ORIGINAL_CSV)
-    
-    # Get unique companies
-    companies = {}
-    for _, row in df.iterrows():
-        company_name = row['Company Name']
-        if company_name not in companies:
-            companies[company_name] = {
-                'name': company_name,
-                'url': row['Company URL'],
-                'description': row['Company Description'],
-                'website': row['Company Website'],
-                'founders': [],
-                'company_linkedin': None,
-                'rank': 0  # Initial votes count is 0
-            }
-        
-        # Process founder data
-        # Manual fix for GroundControl company to ensure its founders are included
-        if (company_name == 'GroundControl' and 
-            isinstance(row['Founder Name'], str) and 
-            row['Founder Name'] in ['Matthew Noseworthy', 'Mehul Shah', 'Nick Warren']):
-            is_founder = True
-        else:
-            # Check for founder titles including more variations that appear in the data
-            founder_titles = ['Founder', 'Co-Founder', 'CEO', 'Co-Founder & CEO', 'Co-Founder & CTO', 
-                             'CTO & Co-Founder', 'CEO & Co-Founder', 'COO & Co-Founder', 
-                             'CTO & Co-founder', 'CEO & Co-founder', 'COO & Co-founder']
-            # Handle founder entries with titles containing "Founder" or "founder" anywhere in the title
-            is_founder = (row['Founder Title'] in founder_titles or 
-                (isinstance(row['Founder Title'], str) and 
-                 ('Founder' in row['Founder Title'] or 'founder' in row['Founder Title'] or 
-                  'CEO' in row['Founder Title'] or 'CTO' in row['Founder Title'] or 'COO' in row['Founder Title'])))
-                  
-        if is_founder:
-            founder_name = row['Founder Name']
-            
-            # Filter non-founder entries from founder fields
-            is_description = False
-            
-            # Skip if it's not a string
-            if not isinstance(founder_name, str):
-                is_description = True
-            # Skip if the name is empty or too short
-            elif not founder_name or len(founder_name) < 3:
-                is_description = True
-            # Skip if the founder name matches the company name
-            elif founder_name == company_name:
-                is_description = True
-            # Skip if founder name is unreasonably long for a person's name
-            elif len(founder_name) > 50:
-                is_description = True
-            # Skip "Programs" entries (common in the CSV)
-            elif founder_name == "Programs":
-                is_description = True
-            # Skip if it's the company description (first line in the CSV for each company)
-            elif companies[company_name]['description'].startswith(founder_name):
-                is_description = True
-            # Skip if the name matches these specific description patterns
-            elif any(pattern in founder_name for pattern in [
-                "Founded in", "Based in", "has employees", "AI for", "AI that"
-            ]):
-                is_description = True
-            # More focused list of description keywords that shouldn't appear in actual people's names
-            elif any(keyword in founder_name for keyword in [
-                "Open-Source", "Faster", "Co-Pilot", "Vision-first", "Platform",
-                "Software", "Troubleshoot", "Powering", "Monitor", "Control",
-                "Solution", "Service", "System", "Framework", "Application", 
-                "Product", "Workflow", "Gigascale"
-            ]):
-                is_description = True
-            
-            # Only add if it's an actual founder and not already in the list
-            if (not is_description and 
-                isinstance(founder_name, str) and 
-                founder_name not in [f['name'] for f in companies[company_name]['founders']]):
-                companies[company_name]['founders'].append({
-                    'name': founder_name,
-                    'linkedin': row['Founder LinkedIn']
-                })
-        
-        # Capture company LinkedIn URL
-        founder_name = row['Founder Name']
-        founder_linkedin = str(row['Founder LinkedIn'])
-        if isinstance(founder_name, str) and founder_name == company_name and 'linkedin.com/company' in founder_linkedin:
-            companies[company_name]['company_linkedin'] = founder_linkedin
-    
-    # Extract location and founding year from description
-    for company_name, company in companies.items():
-        # Parse founded year
-        founded_match = re.search(r'Founded in (\d{4})', company['description'])
-        company['founded_year'] = founded_match.group(1) if founded_match else 'Unknown'
-        
-        # Parse location
-        location_match = re.search(r'based in ([^,\.]+(?:, [^,\.]+)*)', company['description'])
-        company['location'] = location_match.group(1).strip() if location_match else 'Unknown'
-        
-        # Clean up description - get first sentence
-        company['short_description'] = company['description'].split('.')[0] + '.'
+# Companies rendered with the home page and returned per page by /api/companies
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Most results a fuzzy /api/search returns
+FUZZY_LIMIT = 50
+
+# Load and serialize all companies from database
+async def load_companies(db: AsyncSession):
+    """Load all companies from database (serialized in the threadpool, off the event loop)"""
+    companies = await get_companies(db)
+    with timed("to_dict"):
+        return await run_in_threadpool(lambda: [company.to_dict() for company in companies])
+
+# Cache loader: dataset version plus companies
+async def load_snapshot(db: AsyncSession):
+    """Read the change log version first, so the companies are at least that new"""
+    version = await get_dataset_version(db)
+    return version, await load_companies(db)
+
+# Change log fields that are part of the cached company dicts
+CACHED_CHANGE_FIELDS = ('votes', 'tier', 'tags')
+
+# Cache refresher: the change log entries after the snapshot's version
+async def read_changes(db: AsyncSession, since: int):
+    """(version, [(company_id, fields)]) after ``since``, or None if the snapshot must be reloaded
+
+    Reload entries (company_id None) and more than MAX_REPLAY entries need a
+    full reload; so does a change log that is behind the snapshot.
+    """
+    version = await get_dataset_version(db)
+    if version == since:
+        return since, []
+    entries = await get_changes_since(db, since, MAX_REPLAY + 1)
+    if version < since or len(entries) > MAX_REPLAY:
+        return None
+    changes = []
+    for entry in entries:
+        if entry["company_id"] is None:
+            return None
+        fields = {key: value for key, value in entry["changes"].items() if key in CACHED_CHANGE_FIELDS}
+        if "votes" in fields:
+            fields["rank"] = fields["votes"]
+        changes.append((entry["company_id"], fields))
+    return max(version, entries[-1]["version"] if entries else 0), changes
+
+# Current company snapshot, brought up to date first if it expired
+async def cached_records(db: AsyncSession):
+    """Cached company dicts by id"""
+    return await company_cache.arecords(lambda: load_snapshot(db), lambda since: read_changes(db, since))
+
+# Sort key matching the database order (COMPANY_ORDER): tier, then rank with unranked last, then id
+def company_sort_key(company):
+    """(tier, rank sort value, id) of a company dict"""
+    votes = company.get('votes') or 0
+    return company.get('tier') or '', votes if votes > 0 else UNRANKED_SORT, company['id']
+
+# Sort companies first by tier (A,B,C,D) and then by rank (lowest first - 1 is the highest rank)
+def sort_companies(companies):
+    """Sort companies by tier, then rank (unranked last)"""
+    with timed("sort"):
+        return sorted(companies, key=company_sort_key)
+
+# Cached company fields that are never sent to clients (the website text is only searched)
+SERVER_ONLY_FIELDS = ('site_text',)
+
+# Remove founded_year and location fields (not shown in the UI)
+def strip_unused_fields(company):
+    """Copy of a company dict without founded_year/location and server-only fields"""
+    return {key: value for key, value in company.items() if key not in ('founded_year', 'location', *SERVER_ONLY_FIELDS)}
+
+# Remove fields clients never get
+def public_fields(company):
+    """Copy of a company dict without server-only fields"""
+    return {key: value for key, value in company.items() if key not in SERVER_ONLY_FIELDS}
+
+# View served by /api/companies without paging: one pre-encoded JSON array
+def build_api_json(companies):
+    """Sorted companies for AJAX updates, encoded from cached per-company fragments"""
+    companies = sort_companies(companies)
+    with timed("serialize"):
+        return join_array(company_cache.fragments("api", companies, lambda company: dumps(strip_unused_fields(company))))
+
+# Opaque keyset cursor: the sort key of the last company on a page
+def encode_cursor(company):
+    """Cursor pointing just after a company"""
+    return base64.urlsafe_b64encode(dumps(list(company_sort_key(company)))).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str):
+    """Sort key from a cursor (422 if malformed)"""
+    try:
+        tier, rank_sort, company_id = loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(tier, str) or not isinstance(rank_sort, int) or not isinstance(company_id, int):
+            raise ValueError(cursor)
+    except (ValueError, TypeError):  # Not base64/JSON, or not a 3-element list
+        raise HTTPException(status_code=422, detail="Invalid cursor")
+    return tier, rank_sort, company_id
+
+# Load one page of companies in display order from the database
+async def load_companies_page(db: AsyncSession, limit: int, cursor: Optional[str] = None,
+                             tier: Optional[str] = None, batch: str = DEFAULT_BATCH):
+    """Companies (as strip_unused_fields leaves them) and the cursor of the next page (None on the last page)"""
+    after = decode_cursor(cursor) if cursor else None
+    rows = await get_companies_page(db, limit + 1, after, tier, batch)
+    with timed("to_dict"):
+        companies = [strip_unused_fields(company.to_dict()) for company in rows[:limit]]
+    next_cursor = encode_cursor(companies[-1]) if len(rows) > limit else None
+    return companies, next_cursor
+
+# Encode a list of cached company dicts as a JSON array
+def encode_companies(companies):
+    """JSON array of companies as stored in the cache"""
+    with timed("serialize"):
+        return join_array(company_cache.fragments("all", companies, lambda company: dumps(public_fields(company))))
+
+# Get all companies of a batch (sorted), served from the in-memory snapshot
+async def get_companies_from_db(db: AsyncSession, view: str = "all", batch: str = DEFAULT_BATCH,
+                                encoding: Optional[str] = None):
+    """Get all companies from the cache, loading from database on a miss
+
+    With an ``encoding`` (JSON views only) the body is compressed once per
+    snapshot version and served from the cache after that.
+    """
+    builders = {
+        "all": sort_companies,
+        "api_json": build_api_json,
+        "all_json": lambda companies: encode_companies(sort_companies(companies)),
+        # Position of each company id in the "all" view
+        "positions": lambda companies: {company['id']: i for i, company in enumerate(sort_companies(companies))},
+        "analytics": lambda companies: dumps(batch_analytics(companies))
+    }
+    # The snapshot holds every loaded batch; views are built per batch
+    build = lambda companies: builders[view]([company for company in companies if company['batch'] == batch])
+    if encoding is not None:
+        build_encoded = lambda companies: compress(build(companies), encoding)
+        return await company_cache.aview(
+            f"{view}:{batch}:{encoding}", lambda: load_snapshot(db), build_encoded, lambda since: read_changes(db, since)
+        )
+    return await company_cache.aview(f"{view}:{batch}", lambda: load_snapshot(db), build, lambda since: read_changes(db, since))
+
+# Conditional GETs: strong ETag from the dataset version and whatever else selects the body
+def make_etag(version: int, *parts) -> str:
+    """ETag value "<version>-<hash of parts>" """
+    key = hashlib.sha1('\x1f'.join(map(str, parts)).encode('utf-8')).hexdigest()[:16]
+    return f'"{version}-{key}"'
+
+# Content-coding suffixes, so compressed and identity bodies have distinct strong ETags
+def encoded_etag(etag: str, encoding: Optional[str]) -> str:
+    return f'{etag[:-1]}-{encoding}"' if encoding else etag
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match check (weak comparison; any content coding of the same body matches)"""
+    if if_none_match.strip() == '*':
+        return True
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag or (candidate.startswith(etag[:-1] + '-') and candidate.endswith('"')):
+            return True
+    return False
+
+# HTTP-date of a dataset version (memoized; a version's timestamp never changes)
+version_dates: Dict[int, Optional[str]] = {}
+
+async def version_last_modified(db: AsyncSession, version: int) -> Optional[str]:
+    """Last-Modified value for a dataset version, or None before the first change"""
+    if version not in version_dates:
+        created_at = await get_version_timestamp(db, version)
+        if created_at is not None and created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)  # SQLite stores UTC without an offset
+        if len(version_dates) > 10_000:
+            version_dates.clear()
+        version_dates[version] = format_datetime(created_at, usegmt=True) if created_at else None
+    return version_dates[version]
+
+async def not_modified_response(request: Request, db: AsyncSession, version: int, etag: str,
+                                headers: Dict[str, str]) -> Optional[Response]:
+    """304 response if the client's copy is current (also fills in ETag/Last-Modified headers)"""
+    headers.update({"ETag": etag, "Cache-Control": "no-cache"})
+    last_modified = await version_last_modified(db, version)
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        fresh = etag_matches(if_none_match, etag)
+    else:
+        # If-Modified-Since only counts when there is no ETag to compare
+        since = request.headers.get("if-modified-since")
+        try:
+            fresh = bool(since and last_modified) and parsedate_to_datetime(last_modified) <= parsedate_to_datetime(since)
+        except (TypeError, ValueError):
+            fresh = False
+    return Response(status_code=304, headers=headers) if fresh else None
+
+# Body producer for conditional_json_response: gets the negotiated coding and the response
+# headers (to add to), returns the body and the coding actually applied
+BodyFn = Callable[[Optional[str], Dict[str, str]], Awaitable[Tuple[bytes, Optional[str]]]]
+
+# JSON list response with validators, compressed for clients that accept it
+async def conditional_json_response(request: Request, db: AsyncSession, version: int, etag: str,
+                                    body_fn: BodyFn, headers: Optional[Dict[str, str]] = None,
+                                    vary: str = "Accept-Encoding") -> Response:
+    """304 when If-None-Match/If-Modified-Since match, otherwise the body from body_fn
+
+    The check runs before body_fn, so unchanged lists cost no serialization.
+    """
+    headers = dict(headers or {})
+    headers["Vary"] = vary
+    response = await not_modified_response(request, db, version, etag, headers)
+    if response is not None:
+        return response
     
-    # Convert to list of companies
-    return list(companies.values())
+    encoding = negotiate_encoding(request.headers.get("accept-encoding", ""))
+    body, encoding = await body_fn(encoding, headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+        if "ETag" in headers:
+            headers["ETag"] = encoded_etag(etag, encoding)
+    return RawJSONResponse(body, headers=headers)
 
-# Get all companies from database
-def get_companies_from_db(db: Session):
-    """Get all companies from database"""
-    companies = db.query(DBCompany).all()
-    return [company.to_dict() for company in companies]
+# Compress a per-request body unless it is small
+def compress_body(body: bytes, encoding: Optional[str]):
+    """(body, encoding actually applied)"""
+    if encoding is None or len(body) < MIN_COMPRESS_SIZE:
+        return body, None
+    return compress(body, encoding), encoding
+
+# Body producer for a cached JSON view (compressed once per snapshot and coding)
+def cached_view_body(db: AsyncSession, view: str, batch: str) -> BodyFn:
+    async def body(encoding: Optional[str], headers: Dict[str, str]):
+        return await get_companies_from_db(db, view=view, batch=batch, encoding=encoding), encoding
+    return body
+
+# Bring the company snapshot up to date and return the dataset version it reflects
+async def snapshot_version(db: AsyncSession) -> int:
+    """Version of the cached snapshot (reloaded first if it expired)"""
+    await cached_records(db)
+    return company_cache.dataset_version
+
+# Search index rebuild in progress (one at a time per worker; the current index serves queries meanwhile)
+search_index_task: Optional[asyncio.Task] = None
+
+# Index a reloaded snapshot in the threadpool, then swap the new index in
+async def rebuild_search_index(companies: List[Dict[str, Any]], generation: int):
+    """Build a new index of the companies; those patched during the build are reindexed before the swap"""
+    global search_index
+    index = SearchIndex()
+    await run_in_threadpool(index.build, companies, generation)
+    if company_cache.generation != generation and search_index.generation is not None:
+        return  # Reloaded again meanwhile; the next search starts another build
+    for company in companies:
+        # Patches replace the cached dicts, so a different object means it changed
+        current = company_cache.get(company['id'])
+        if current is not None and current is not company:
+            index.update(current)
+    search_index = index
+
+# Get the search index, rebuilding it in the background after the cache snapshot was reloaded
+async def get_search_index(db: AsyncSession):
+    """Search index of the cached companies (the previous snapshot's while a rebuild runs)"""
+    global search_index_task
+    records = await cached_records(db)
+    if search_index.generation != company_cache.generation:
+        if search_index_task is None or search_index_task.done():
+            search_index_task = asyncio.create_task(
+                rebuild_search_index(list(records.values()), company_cache.generation)
+            )
+        if search_index.generation is None:
+            # Nothing to serve before the first build
+            await asyncio.shield(search_index_task)
+    return search_index
+
+# Results from the previous snapshot's index (rebuild still running) mustn't be cached under
+# the current version's validators; other workers may already answer that ETag with fresh results
+def uncacheable_if_behind(index: SearchIndex, headers: Dict[str, str]):
+    """Drop ETag/Last-Modified and send no-store if the index lags the cache snapshot"""
+    if index.generation != company_cache.generation:
+        headers.pop("ETag", None)
+        headers.pop("Last-Modified", None)
+        headers["Cache-Control"] = "no-store"
+
+# Keep the search index in step with tags patched into the cache (by this worker or from the change log)
+def reindex_tags(record: Dict[str, Any], fields: Dict[str, Any]):
+    """Reindex a company incrementally if its tags changed"""
+    if "tags" in fields and search_index.generation == company_cache.generation:
+        search_index.update(record)
+
+company_cache.on_patch = reindex_tags
+
+# Update cache and search index after a company's tags changed
+def refresh_company_tags(company_id: int, tags, version: Optional[int] = None):
+    """Patch cached tags (reindexed by reindex_tags)"""
+    company_cache.patch(company_id, dataset_version=version, tags=list(tags))
 
 # Get company by ID
-def get_company_by_id(db: Session, company_id: int):
+async def get_company_by_id(db: AsyncSession, company_id: int):
     """Get a company by ID"""
-    return db.query(DBCompany).filter(DBCompany.id == company_id).first()
+    return await get_company(db, company_id)
 
 # Get company by name (keep for backward compatibility)
-def get_company_by_name(db: Session, name: str):
+async def get_company_by_name(db: AsyncSession, name: str):
     """Get a company by name"""
-    return db.query(DBCompany).filter(DBCompany.name == name).first()
+    return (await db.execute(select(DBCompany).where(DBCompany.name == name))).scalars().first()
+
+# Parse a batch's CSV and apply the difference to the database
+async def ingest_batch(batch: str, csv_path: str):
+    """Delta-reload a batch from its CSV (votes, tiers and tags are kept) and store the file's hash
+
+    Returns the {inserted, updated, deleted, unchanged} counts; if anything
+    changed, clients are told to reload the batch.
+    """
+    # Hashing, CSV parsing and the database writes are blocking, so they run in the threadpool.
+    # The hash is taken first: if the file changes mid-parse, the next check reloads it again.
+    sha256 = await run_in_threadpool(source_hash, csv_path)
+    companies_data = await run_in_threadpool(process_csv_data, csv_path, batch=batch)
+    counts = await run_in_threadpool(
+        reload_companies, companies_data, batch=batch, csv_path=csv_path, sha256=sha256
+    )
+    if counts['inserted'] or counts['updated'] or counts['deleted']:
+        company_cache.invalidate()
+        change_broadcaster.notify()
+    return counts
+
+# Load a batch whose CSV is new or changed (first request for a batch, or startup)
+async def load_batch(batch: str, csv_path: str):
+    """Load a batch into the database"""
+    await ingest_batch(batch, csv_path)
+
+# Serve batches that are in the database as they are, without hashing their CSVs
+# (for deployments that ingest with cli.py; batches not loaded yet still load on first request)
+SKIP_CSV_CHECK = os.environ.get("SKIP_CSV_CHECK", "").lower() in ("1", "true", "yes")
+
+# Check a batch against its CSV with a short-lived session
+async def batch_is_current(batch: str):
+    """True if the batch is in the database and was loaded from its CSV and ingest rules as they are now
+
+    Batches without a CSV on disk (or any batch, with SKIP_CSV_CHECK) are
+    current as long as they have companies.
+    """
+    async with AsyncSessionLocal() as db:
+        exists = await batch_exists(db, batch)
+        stored_hash = await get_source_hash(db, batch)
+    path = batch_registry.paths.get(batch)
+    if not exists or SKIP_CSV_CHECK or path is None or not os.path.exists(path):
+        return exists
+    return stored_hash == await run_in_threadpool(source_hash, path)
+
+batch_registry = BatchRegistry(discover_batches(), batch_is_current, load_batch)
+
+# Resolve the batch query parameter of batch-scoped endpoints
+async def resolve_batch(batch: str = DEFAULT_BATCH):
+    """Batch key, loading the batch's CSV on first use (404 for unknown batches)"""
+    if not await batch_registry.ensure_loaded(batch):
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return batch
+
+# User ids name whose ranking a request reads or changes (there is no login; partners pick a name)
+USER_ID_RE = re.compile(r'^[A-Za-z0-9_.@-]{1,64}$')
+
+# Resolve the ranking user from the X-User header or the user cookie
+async def current_user(request: Request) -> Optional[str]:
+    """User id, or None for the shared ranking (422 for malformed ids)"""
+    user = request.headers.get("X-User") or request.cookies.get("user")
+    if not user:
+        return None
+    if not USER_ID_RE.match(user):
+        raise HTTPException(status_code=422, detail="Invalid user id")
+    return user
+
+# Change a user's ranking; the shared votes/tier columns are left alone
+async def apply_user_ranking(db: AsyncSession, user: str, company_id: int, op: str, value=None):
+    """Write the user's row and consensus counts, log the new counts and commit; returns (ranking, version)"""
+    ranking = await set_user_ranking(db, user, company_id, op, value)
+    if ranking is None:
+        raise HTTPException(status_code=404, detail="Company not found")
+    version = await record_change(db, company_id, consensus=ranking["consensus"])
+    await db.commit()
+    change_broadcaster.notify()
+    return ranking, version
+
+# Consensus fields served with the personal and consensus views
+def consensus_fields(counts, batch_size: int):
+    """Summary counts plus mean rank and Borda points (a rank r among n companies is worth n + 1 - r)"""
+    summary = consensus_summary(counts)
+    ranked = summary["ranked"]
+    summary["mean_rank"] = summary["rank_sum"] / ranked if ranked else None
+    summary["borda"] = ranked * (batch_size + 1) - summary["rank_sum"]
+    return summary
+
+# Personal or consensus list of a batch: cached companies joined with per-user or summary rows
+async def ranking_view(db: AsyncSession, view: str, user: Optional[str], batch: str):
+    """Companies of a batch with consensus fields; personal views show the user's votes and tiers"""
+    records = await cached_records(db)
+    companies = [company for company in records.values() if company['batch'] == batch]
+    consensus = await get_consensus(db, batch)
+    rankings = await get_user_rankings(db, user, batch) if view == "personal" else {}
+    
+    result = []
+    for company in companies:
+        entry = strip_unused_fields(company)
+        entry["consensus"] = consensus_fields(consensus.get(company['id']), len(companies))
+        if view == "personal":
+            votes, tier = rankings.get(company['id'], (0, None))
+            entry.update(votes=votes, rank=votes, tier=tier or 'C')
+        result.append(entry)
+    
+    if view == "personal":
+        result.sort(key=company_sort_key)
+    else:
+        # Most Borda points first, then best mean rank
+        result.sort(key=lambda entry: (
+            -entry["consensus"]["borda"], entry["consensus"]["mean_rank"] or UNRANKED_SORT, entry["id"]
+        ))
+    return result
 
 # Database setup at startup
 @app.on_event("startup")
@@ -167,90 +493,148 @@ async def startup_event():
     # Create database tables
     create_tables()
     
-    # Process CSV data
-    companies_data = process_csv_data()
-    
-    # Initialize database with company data
-    initialize_db(companies_data)
+    # Load the default batch, parsing its CSV only if the database doesn't have it yet
+    # or the file changed since (other batches load on first request)
+    if not await batch_registry.ensure_loaded(DEFAULT_BATCH):
+        raise FileNotFoundError(f"Batch {DEFAULT_BATCH} has no companies and {ORIGINAL_CSV} was not found")
+
+# Close pooled connections on shutdown
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background reloads (their jobs are marked failed), then dispose of the async engine"""
+    for task in list(reload_tasks):
+        task.cancel()
+    await asyncio.gather(*reload_tasks, return_exceptions=True)
+    await async_engine.dispose()
     
-# Add a utility route to reset and reload the database (for maintenance and testing)
+# Background reloads: one at a time per worker (reload_companies also locks each batch in the
+# database, so reloads from other workers wait too); tasks are kept referenced until they finish
+reload_lock = asyncio.Lock()
+reload_tasks = set()
+
+# Reload batches from their CSVs, recording progress in the job's row
+async def run_reload_job(job_id: int, batches: List[str]):
+    """Delta-reload each batch in turn; the job ends as done or failed (also when cancelled)"""
+    results = {}
+    try:
+        async with reload_lock:
+            async with AsyncSessionLocal() as db:
+                await update_reload_job(db, job_id, 'running')
+                await db.commit()
+            for key in batches:
+                results[key] = await ingest_batch(key, batch_registry.paths[key])
+                batch_registry.loaded.add(key)
+                async with AsyncSessionLocal() as db:
+                    await update_reload_job(db, job_id, 'running', results=results)
+                    await db.commit()
+        status, error = 'done', None
+    except asyncio.CancelledError:
+        # Shutting down: record the job as failed instead of leaving it pending or running forever
+        async with AsyncSessionLocal() as db:
+            await update_reload_job(db, job_id, 'failed', results=results, error="Cancelled")
+            await db.commit()
+        raise
+    except Exception as e:
+        status, error = 'failed', str(e)
+    async with AsyncSessionLocal() as db:
+        await update_reload_job(db, job_id, status, results=results, error=error)
+        await db.commit()
+
+# Add a utility route to reload the database from the CSVs (for maintenance and testing)
 @app.get("/admin/reset-and-reload")
-async def reset_and_reload(request: Request, confirmation: str = ""):
+async def reset_and_reload(request: Request, confirmation: str = "", batch: Optional[str] = None):
     """
-    Admin utility to reset and reload the database with corrected data
-    Must provide confirmation=yes as a query parameter
+    Admin utility to reload the database with corrected data, in the background
+    Must provide confirmation=yes as a query parameter; reloads every loaded batch unless batch is given.
+    Only companies whose CSV data changed are written; follow progress at /admin/reload-status.
     """
     # Require a confirmation parameter for safety
     if confirmation != "yes":
         return {"success": False, "message": "Confirmation required. Add ?confirmation=yes to URL to proceed."}
     
-    # Reset and reload database
-    from database import get_db, Company
-    
-    db = next(get_db())
     try:
-        # Drop all company records
-        db.query(Company).delete()
-        db.commit()
+        async with AsyncSessionLocal() as db:
+            if batch is None:
+                batches = [key for key in await get_batch_counts(db) if key in batch_registry.paths]
+            elif batch in batch_registry.paths:
+                batches = [batch]
+            else:
+                return {"success": False, "message": f"Unknown batch: {batch}"}
+            job_id = await create_reload_job(db, batches)
+            await db.commit()
         
-        # Reload with corrected data
-        companies_data = process_csv_data()
-        from database import initialize_db
-        initialize_db(companies_data)
+        task = asyncio.create_task(run_reload_job(job_id, batches))
+        reload_tasks.add(task)
+        task.add_done_callback(reload_tasks.discard)
         
-        return {"success": True, "message": "Database reset and reloaded successfully with corrected founders data."}
+        return {
+            "success": True,
+            "message": "Reload started. Votes, tiers and tags will be kept.",
+            "job_id": job_id,
+            "status_url": f"/admin/reload-status?job_id={job_id}"
+        }
     except Exception as e:
-        db.rollback()
         return {"success": False, "message": f"Error: {str(e)}"}
-    finally:
-        db.close()
+
+# Status of a background reload
+@app.get("/admin/reload-status")
+async def reload_status(job_id: Optional[int] = None, db: AsyncSession = Depends(get_async_db)):
+    """Report a reload job (the latest one if job_id is omitted)"""
+    job = await get_reload_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Reload job not found")
+    return job
 
 @app.get("/")
-async def home(request: Request, db: Session = Depends(get_db)):
-    # Get companies from database
-    companies = get_companies_from_db(db)
+async def home(request: Request, batch: str = Depends(resolve_batch), db: AsyncSession = Depends(get_async_db)):
+    # Render only the first page (without founded_year/location); the rest loads on scroll
+    dataset_version = await get_dataset_version(db)
+    companies, next_cursor = await load_companies_page(db, PAGE_SIZE, batch=batch)
+    total_companies = await count_companies(db, batch=batch)
     
-    # Process companies to remove unwanted fields
-    for company in companies:
-        # Remove founded_year and location fields
-        if 'founded_year' in company:
-            del company['founded_year']
-        if 'location' in company:
-            del company['location']
-    
-    # Sort companies first by tier (A,B,C,D) and then by rank (lowest first - 1 is the highest rank)
-    sorted_companies = sorted(companies, key=lambda x: (
-        # Tier sorting (A,B,C,D)
-        'ABCD'.index(x['tier']) if x['tier'] in 'ABCD' else 3,  # Default to D (index 3) if tier not valid
-        # Rank sorting (1,2,3...)
-        x['rank'] if x['rank'] > 0 else float('inf')
-    ))
-    
-    return templates.TemplateResponse(
-        "index.html", 
-        {"request": request, "companies": sorted_companies}
-    )
+    # The template is rendered (including the initial_page JSON) when the response is built
+    with timed("render"):
+        return templates.TemplateResponse(
+            "index.html", 
+            {
+                "request": request,
+                "companies": companies,
+                "total_companies": total_companies,
+                "batch": batch,
+                "batches": sorted(set(batch_registry.paths) | batch_registry.loaded),
+                # First page state for app.js
+                "initial_page": {
+                    "companies": companies, "next_cursor": next_cursor, "version": dataset_version,
+                    "page_size": PAGE_SIZE, "batch": batch
+                }
+            }
+        )
 
 @app.post("/update_rank/{company_id}")
 async def update_rank(
     request: Request,
     company_id: int, 
     rank: int = Form(...), 
-    db: Session = Depends(get_db)
+    user: Optional[str] = Depends(current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Update votes for a company"""
-    # Find the company in the database
-    company = get_company_by_id(db, company_id)
-    if not company:
-        raise HTTPException(status_code=404, detail="Company not found")
-    
+    """Update votes for a company (the user's own ranking if a user is given)"""
     # Update votes
     if rank < 1:
         rank = 1  # Minimum rank is 1
     
-    # Using update directly on the query is more reliable with SQLAlchemy
-    db.query(DBCompany).filter(DBCompany.id == company_id).update({"votes": rank})
-    db.commit()
+    if user is not None:
+        ranking, version = await apply_user_ranking(db, user, company_id, "rank", rank)
+        rank = ranking["votes"]
+    else:
+        # Single UPDATE ... RETURNING; no row means the company doesn't exist
+        rank = (await db.execute(set_votes_statement(company_id, rank))).scalar_one_or_none()
+        if rank is None:
+            raise HTTPException(status_code=404, detail="Company not found")
+        version = await record_change(db, company_id, votes=rank)
+        await db.commit()
+        company_cache.patch(company_id, dataset_version=version, votes=rank, rank=rank)
+        change_broadcaster.notify()
     
     # Check if it's an AJAX request or a regular form submission
     is_ajax = request.headers.get("accept") == "application/json"
@@ -260,39 +644,29 @@ async def update_rank(
             "success": True,
             "rank": rank,
             "votes": rank,  # Keep for backward compatibility
-            "company_id": company_id
+            "company_id": company_id,
+            "version": version
         })
     else:
         return RedirectResponse(url="/", status_code=303)
 
 @app.post("/upvote/{company_id}")
-async def upvote(request: Request, company_id: int, db: Session = Depends(get_db)):
+async def upvote(request: Request, company_id: int, user: Optional[str] = Depends(current_user),
+                 db: AsyncSession = Depends(get_async_db)):
     """For ranking: When we upvote, we actually decrease the rank (higher number = worse rank)"""
-    # Find the company in the database
-    company = get_company_by_id(db, company_id)
-    if not company:
-        raise HTTPException(status_code=404, detail="Company not found")
-    
-    # Get the current rank
-    current_rank = company.votes if company.votes is not None else 0
-    if not isinstance(current_rank, int):
-        try:
-            current_rank = int(current_rank)
-        except:
-            current_rank = 0
-    
-    # Handle initial rank of 0 (unranked)
-    if current_rank == 0:
-        # Start at rank 2 for previously unranked companies
-        # (since downranking means a higher number)
-        new_rank = 2
+    if user is not None:
+        ranking, version = await apply_user_ranking(db, user, company_id, "upvote")
+        new_rank = ranking["votes"]
     else:
-        # Normal case: decrease rank by increasing number
-        new_rank = current_rank + 1
-    
-    # Update the database
-    db.query(DBCompany).filter(DBCompany.id == company_id).update({"votes": new_rank})
-    db.commit()
+        # Increment the rank number atomically in SQL
+        # (previously unranked companies start at rank 2, since downranking means a higher number)
+        new_rank = (await db.execute(increment_votes_statement(company_id))).scalar_one_or_none()
+        if new_rank is None:
+            raise HTTPException(status_code=404, detail="Company not found")
+        version = await record_change(db, company_id, votes=new_rank)
+        await db.commit()
+        company_cache.patch(company_id, dataset_version=version, votes=new_rank, rank=new_rank)
+        change_broadcaster.notify()
     
     # Check if it's an AJAX request or a regular form submission
     is_ajax = request.headers.get("accept") == "application/json"
@@ -302,41 +676,29 @@ async def upvote(request: Request, company_id: int, db: Session = Depends(get_db
             "success": True,
             "rank": new_rank,
             "votes": new_rank,  # Keep for backward compatibility
-            "company_id": company_id
+            "company_id": company_id,
+            "version": version
         })
     else:
         return RedirectResponse(url="/", status_code=303)
 
 @app.post("/downvote/{company_id}")
-async def downvote(request: Request, company_id: int, db: Session = Depends(get_db)):
+async def downvote(request: Request, company_id: int, user: Optional[str] = Depends(current_user),
+                   db: AsyncSession = Depends(get_async_db)):
     """Downvote a company (which improves its rank)"""
-    # Find the company in the database
-    company = get_company_by_id(db, company_id)
-    if not company:
-        raise HTTPException(status_code=404, detail="Company not found")
-    
-    # For ranking: when we downvote, we actually improve the rank (lower number)
-    current_rank = company.votes if company.votes is not None else 0
-    if not isinstance(current_rank, int):
-        try:
-            current_rank = int(current_rank)
-        except:
-            current_rank = 0
-    
-    # Handle cases where rank starts at 0 (unranked)
-    if current_rank == 0:
-        # Set to rank 1 (best rank) for previously unranked companies
-        new_rank = 1
-    elif current_rank > 1:
-        # Normal case: improve rank by decreasing number
-        new_rank = current_rank - 1
+    # For ranking: when we downvote, we actually improve the rank (lower number).
+    if user is not None:
+        ranking, version = await apply_user_ranking(db, user, company_id, "downvote")
+        new_rank = ranking["votes"]
     else:
-        # Already at rank 1, can't go higher
-        new_rank = 1
-    
-    # Update the database with the new rank
-    db.query(DBCompany).filter(DBCompany.id == company_id).update({"votes": new_rank})
-    db.commit()
+        # Decrement atomically in SQL; unranked companies and rank 1 end up at rank 1
+        new_rank = (await db.execute(decrement_votes_statement(company_id))).scalar_one_or_none()
+        if new_rank is None:
+            raise HTTPException(status_code=404, detail="Company not found")
+        version = await record_change(db, company_id, votes=new_rank)
+        await db.commit()
+        company_cache.patch(company_id, dataset_version=version, votes=new_rank, rank=new_rank)
+        change_broadcaster.notify()
     
     # Check if it's an AJAX request or a regular form submission
     is_ajax = request.headers.get("accept") == "application/json"
@@ -346,7 +708,8 @@ async def downvote(request: Request, company_id: int, db: Session = Depends(get_
             "success": True,
             "rank": new_rank,
             "votes": new_rank,  # Keep for backward compatibility
-            "company_id": company_id
+            "company_id": company_id,
+            "version": version
         })
     else:
         return RedirectResponse(url="/", status_code=303)
@@ -357,21 +720,26 @@ async def update_tier(
     request: Request,
     company_id: int, 
     tier: str = Form(...), 
-    db: Session = Depends(get_db)
+    user: Optional[str] = Depends(current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Update tier for a company"""
+    """Update tier for a company (the user's own tier if a user is given)"""
     # Validate tier input
     if tier not in ['A', 'B', 'C', 'D']:
         raise HTTPException(status_code=422, detail="Invalid tier. Must be A, B, C, or D")
     
-    # Find the company
-    company = get_company_by_id(db, company_id)
-    if not company:
-        raise HTTPException(status_code=404, detail="Company not found")
-    
-    # Update the tier directly in the database query
-    db.query(DBCompany).filter(DBCompany.id == company_id).update({"tier": tier})
-    db.commit()
+    if user is not None:
+        ranking, version = await apply_user_ranking(db, user, company_id, "tier", tier)
+        tier = ranking["tier"]
+    else:
+        # Update the tier with a single UPDATE ... RETURNING
+        tier = (await db.execute(set_tier_statement(company_id, tier))).scalar_one_or_none()
+        if tier is None:
+            raise HTTPException(status_code=404, detail="Company not found")
+        version = await record_change(db, company_id, tier=tier)
+        await db.commit()
+        company_cache.patch(company_id, dataset_version=version, tier=tier)
+        change_broadcaster.notify()
     
     # Check if it's an AJAX request or a regular form submission
     is_ajax = request.headers.get("accept") == "application/json"
@@ -380,70 +748,227 @@ async def update_tier(
         return JSONResponse({
             "success": True,
             "tier": tier,  # Return the new tier value directly
-            "company_id": company_id
+            "company_id": company_id,
+            "version": version
         })
     else:
         return RedirectResponse(url="/", status_code=303)
 
 # API endpoint to get sorted companies
 @app.get("/api/companies")
-async def api_companies(request: Request, db: Session = Depends(get_db)):
-    """Get sorted companies data for AJAX updates"""
-    # Get companies from database
-    companies = get_companies_from_db(db)
+async def api_companies(
+    request: Request,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    tier: Optional[str] = None,
+    view: Literal["shared", "personal", "consensus"] = "shared",
+    batch: str = Depends(resolve_batch),
+    user: Optional[str] = Depends(current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get sorted companies data of a batch for AJAX updates
+
+    Without parameters the whole list is returned. With ``limit`` (and the
+    ``cursor`` from the previous page's X-Next-Cursor header) one page is
+    read from the database in index order; ``tier`` restricts it to one tier.
+    ``view=personal`` (the user's own votes and tiers) and ``view=consensus``
+    (ordered by Borda points) return the whole list with consensus fields.
+    """
+    # Every response carries ETag/Last-Modified from the dataset version (304 if unchanged) and
+    # X-Dataset-Version, which lets the client resume the live update stream from this data
+    if view != "shared":
+        if limit is not None or cursor is not None or tier is not None:
+            raise HTTPException(status_code=422, detail="Paging is only available for the shared view")
+        if view == "personal" and user is None:
+            raise HTTPException(status_code=422, detail="The personal view needs an X-User header or user cookie")
+        dataset_version = await get_dataset_version(db)
+        
+        async def ranking_body(encoding: Optional[str], headers: Dict[str, str]):
+            companies = await ranking_view(db, view, user, batch)
+            with timed("serialize"):
+                return compress_body(join_array(dumps(company) for company in companies), encoding)
+        
+        return await conditional_json_response(
+            request, db, dataset_version, make_etag(dataset_version, view, batch, user if view == "personal" else ""),
+            ranking_body, {"X-Dataset-Version": str(dataset_version)},
+            vary="Accept-Encoding, X-User, Cookie" if view == "personal" else "Accept-Encoding"
+        )
     
-    # Process companies to remove unwanted fields
-    for company in companies:
-        # Remove founded_year and location fields
-        if 'founded_year' in company:
-            del company['founded_year']
-        if 'location' in company:
-            del company['location']
-    
-    # Define a helper function to determine tier order safely
-    def get_tier_index(tier):
-        if tier == 'A': 
-            return 0
-        elif tier == 'B':
-            return 1
-        elif tier == 'C':
-            return 2
-        elif tier == 'D':
-            return 3
-        else:
-            return 3  # Default to D if tier not recognized
+    if limit is None and cursor is None and tier is None:
+        dataset_version = await snapshot_version(db)
+        return await conditional_json_response(
+            request, db, dataset_version, make_etag(dataset_version, "api_json", batch),
+            cached_view_body(db, "api_json", batch), {"X-Dataset-Version": str(dataset_version)}
+        )
     
-    # Make sure companies have both rank and votes fields with the same value
-    for company in companies:
-        # If we have votes but no rank, create rank field
-        if 'votes' in company and ('rank' not in company or company['rank'] is None):
-            company['rank'] = company['votes']
-        # If we have rank but no votes, create votes field
-        elif 'rank' in company and ('votes' not in company or company['votes'] is None):
-            company['votes'] = company['rank']
-        # If both are None or 0, set to a moderate value
-        if ('rank' not in company or company['rank'] == 0) and ('votes' not in company or company['votes'] == 0):
-            company['rank'] = company['votes'] = 9  # Default moderate rank for unranked
-    
-    # Sort companies first by tier (A,B,C,D) and then by rank (lowest first)
-    sorted_companies = sorted(companies, key=lambda x: (
-        # Tier sorting (A,B,C,D)
-        get_tier_index(x.get('tier', 'C')),
-        # Rank sorting (1,2,3...) - use votes for ranking
-        int(x.get('votes', 9)) if x.get('votes', 0) > 0 else 9
-    ))
-    
-    return sorted_companies
+    if tier is not None and tier not in ['A', 'B', 'C', 'D']:
+        raise HTTPException(status_code=422, detail="Invalid tier. Must be A, B, C, or D")
+    limit = min(max(limit or PAGE_SIZE, 1), MAX_PAGE_SIZE)
+    
+    dataset_version = await get_dataset_version(db)
+    
+    async def page_body(encoding: Optional[str], headers: Dict[str, str]):
+        companies, next_cursor = await load_companies_page(db, limit, cursor, tier, batch)
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        with timed("serialize"):
+            return compress_body(join_array(dumps(company) for company in companies), encoding)
+    
+    return await conditional_json_response(
+        request, db, dataset_version, make_etag(dataset_version, "page", batch, limit, cursor or "", tier or ""),
+        page_body, {"X-Dataset-Version": str(dataset_version)}
+    )
+
+# Delta sync for clients that keep their own copy of a batch (static/js/store.js)
+@app.get("/api/companies/changes")
+async def company_changes(
+    request: Request,
+    since: int,
+    batch: str = Depends(resolve_batch),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Companies of a batch changed after dataset version ``since``
+
+    Returns ``{version, reset, companies}`` with the current record of every
+    company that has a change log entry after ``since``. ``reset`` is true
+    (and ``companies`` empty) when the client has to fetch the whole list
+    instead: the batch was reloaded (which is also how companies get removed),
+    the backlog is longer than the stream would replay, or ``since`` is ahead
+    of this database.
+    """
+    dataset_version = await get_dataset_version(db)
+    
+    async def changes_body(encoding: Optional[str], headers: Dict[str, str]):
+        delta = {"version": dataset_version, "reset": True, "companies": []}
+        changes = await get_changes_since(db, since, MAX_REPLAY + 1) if 0 <= since <= dataset_version else None
+        # Reloads of other batches don't touch this one (entries without a batch predate batches)
+        if changes is not None and len(changes) <= MAX_REPLAY and not any(
+            change["company_id"] is None and change["changes"].get("batch", batch) == batch for change in changes
+        ):
+            # Records are read after the version, so they are at least that new
+            rows = await get_companies_by_ids(db, {change["company_id"] for change in changes}, batch)
+            with timed("to_dict"):
+                companies = [strip_unused_fields(row.to_dict()) for row in rows]
+            delta.update(reset=False, companies=companies)
+        with timed("serialize"):
+            return compress_body(dumps(delta), encoding)
+    
+    return await conditional_json_response(
+        request, db, dataset_version, make_etag(dataset_version, "changes", batch, since),
+        changes_body, {"X-Dataset-Version": str(dataset_version)}
+    )
+
+# Streaming export of a batch's rankings
+@app.get("/api/export")
+async def export_rankings(
+    format: Literal["csv", "jsonl", "parquet"] = "csv",
+    batch: str = Depends(resolve_batch),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Download every company of a batch with votes, tier, tags and founders
+
+    Rows are read through a server-side cursor in display order and written
+    out a chunk at a time as CSV, JSON Lines or Parquet (needs pyarrow), so
+    memory use doesn't grow with the batch and the first bytes go out before
+    the query has finished.
+    """
+    if format == "parquet" and pyarrow is None:
+        raise HTTPException(status_code=501, detail="Parquet export needs the pyarrow package")
+    dataset_version = await get_dataset_version(db)
+    
+    # The request's session is closed when this handler returns, so the stream opens its own
+    async def chunks():
+        async with AsyncSessionLocal() as stream_db:
+            async for chunk in stream_companies(stream_db, batch):
+                yield chunk
+    
+    return StreamingResponse(
+        export_stream(format, chunks()),
+        media_type=EXPORT_FORMATS[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="rankings-{batch}.{format}"',
+            "X-Dataset-Version": str(dataset_version)
+        }
+    )
+
+# Read change log entries with a short-lived session (used by the broadcaster)
+async def fetch_changes(since: int, limit: int):
+    """Changes after a version"""
+    async with AsyncSessionLocal() as db:
+        return await get_changes_since(db, since, limit)
+
+# Read the current dataset version with a short-lived session
+async def fetch_dataset_version():
+    """Latest change log version"""
+    async with AsyncSessionLocal() as db:
+        return await get_dataset_version(db)
+
+change_broadcaster = ChangeBroadcaster(fetch_changes, fetch_dataset_version)
+
+# Push channel: server-sent events with one small delta per change
+@app.get("/api/stream")
+async def stream_changes(request: Request, since: Optional[int] = None):
+    """Stream company deltas as server-sent events
+
+    Each "change" event carries {version, company_id, changes} and uses the
+    version as its event id, so a reconnecting EventSource resumes from
+    Last-Event-ID. If the backlog is too large (or the client has no version,
+    or falls too far behind while connected) a "reset" event tells the client
+    to reload the list.
+    """
+    last_event_id = request.headers.get("last-event-id", "")
+    if last_event_id.isdigit():
+        since = int(last_event_id)
+    
+    async def event_stream():
+        # Subscribed only once the stream runs, so the finally clause always unsubscribes
+        queue = None
+        try:
+            queue = change_broadcaster.subscribe()
+            backlog = await change_broadcaster.replay(since) if since is not None else None
+            if backlog is None:
+                sent = await fetch_dataset_version()
+                change_broadcaster.resume_from(sent)
+                yield format_event("reset", {"version": sent}, sent)
+            else:
+                sent = since
+                for change in backlog:
+                    sent = change["version"]
+                    yield format_event("change", change, sent)
+            
+            # Runs until the client disconnects (the response cancels this generator)
+            while True:
+                try:
+                    change = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if change is None:
+                    # Dropped for falling behind: start over from the current version
+                    queue = change_broadcaster.subscribe()
+                    sent = await fetch_dataset_version()
+                    change_broadcaster.resume_from(sent)
+                    yield format_event("reset", {"version": sent}, sent)
+                    continue
+                # Skip entries already sent as part of the backlog
+                if change["version"] <= sent:
+                    continue
+                sent = change["version"]
+                yield format_event("change", change, sent)
+        finally:
+            if queue is not None:
+                change_broadcaster.unsubscribe(queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 # API endpoints for managing tags
 @app.post("/api/tags/{company_id}")
-async def add_tag(request: Request, company_id: int, tag: str = Form(...), db: Session = Depends(get_db)):
+async def add_tag(request: Request, company_id: int, tag: str = Form(...), db: AsyncSession = Depends(get_async_db)):
     """Add a tag to a company"""
-    # Find the company in the database
-    company = get_company_by_id(db, company_id)
-    if not company:
-        raise HTTPException(status_code=404, detail="Company not found")
-    
     # Sanitize the tag (remove HTML and limit length)
     sanitized_tag = bleach.clean(tag, tags=[], strip=True)[:30].strip()
     
@@ -451,121 +976,301 @@ async def add_tag(request: Request, company_id: int, tag: str = Form(...), db: S
     if not sanitized_tag:
         raise HTTPException(status_code=422, detail="Tag cannot be empty")
     
-    # Load existing tags or create empty list
-    try:
-        if company.tags:
-            tags = json.loads(company.tags)
-        else:
-            tags = []
-    except json.JSONDecodeError:
-        tags = []
+    # Tag edits of a company are serialized on its row, so the list read back below is the one to log
+    if await lock_company(db, company_id) is None:
+        raise HTTPException(status_code=404, detail="Company not found")
+    
+    # Append the tag in one INSERT ... SELECT; no row means a duplicate
+    inserted = (await db.execute(add_tag_statement(company_id, sanitized_tag))).first()
+    tags = list(await get_company_tags(db, company_id))
     
     # Check if tag already exists
-    if sanitized_tag in tags:
+    if inserted is None:
+        record = company_cache.get(company_id)
+        if record is not None and record['tags'] != tags:
+            # Changed by another worker since our snapshot was taken
+            refresh_company_tags(company_id, tags)
         return JSONResponse({
             "success": True,
             "tags": tags,
             "message": "Tag already exists"
         })
     
-    # Add new tag and save
-    tags.append(sanitized_tag)
-    setattr(company, 'tags', json.dumps(tags))
-    db.commit()
+    version = await record_change(db, company_id, tags=tags)
+    await db.commit()
+    refresh_company_tags(company_id, tags, version)
+    change_broadcaster.notify()
     
     return JSONResponse({
         "success": True,
-        "tags": tags
+        "tags": tags,
+        "version": version
     })
 
 @app.delete("/api/tags/{company_id}/{tag_index}")
-async def remove_tag(request: Request, company_id: int, tag_index: int, db: Session = Depends(get_db)):
-    """Remove a tag from a company by index"""
-    # Find the company in the database
-    company = get_company_by_id(db, company_id)
-    if not company:
+async def remove_tag(request: Request, company_id: int, tag_index: int, tag: Optional[str] = None,
+                     db: AsyncSession = Depends(get_async_db)):
+    """Remove a tag from a company: the ``tag`` given, or else the one at this index"""
+    if await lock_company(db, company_id) is None:
         raise HTTPException(status_code=404, detail="Company not found")
     
-    # Load existing tags
-    try:
-        if company.tags:
-            tags = json.loads(company.tags)
-        else:
-            tags = []
-    except json.JSONDecodeError:
-        tags = []
+    # Delete the tag (or the tag at this position) in one DELETE ... RETURNING
+    removed_tag = None
+    if tag is not None or tag_index >= 0:
+        removed_tag = (await db.execute(remove_tag_statement(company_id, tag_index, tag))).scalar_one_or_none()
     
-    # Check if index is valid
-    if tag_index < 0 or tag_index >= len(tags):
-        raise HTTPException(status_code=422, detail="Invalid tag index")
+    # Check if the tag or index was valid
+    if removed_tag is None:
+        raise HTTPException(status_code=422, detail="Invalid tag index" if tag is None else "Tag not found")
     
-    # Remove tag by index
-    removed_tag = tags.pop(tag_index)
-    setattr(company, 'tags', json.dumps(tags))
-    db.commit()
+    tags = list(await get_company_tags(db, company_id))
+    version = await record_change(db, company_id, tags=tags)
+    await db.commit()
+    refresh_company_tags(company_id, tags, version)
+    change_broadcaster.notify()
     
     return JSONResponse({
         "success": True,
         "tags": tags,
-        "removed": removed_tag
+        "removed": removed_tag,
+        "version": version
     })
 
+# Model for one operation in a batch request
+class BatchOperation(BaseModel):
+    op: Literal["rank", "upvote", "downvote", "tier", "add_tag", "remove_tag"]
+    company_id: int
+    rank: Optional[int] = None
+    tier: Optional[str] = None
+    tag: Optional[str] = None  # add_tag; for remove_tag, the tag to remove (preferred over tag_index)
+    tag_index: Optional[int] = None
+
+# Model for a batch of operations
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation]
+
+# Apply one batch operation; returns its result and the changed fields
+async def apply_batch_operation(db: AsyncSession, operation: BatchOperation, user: Optional[str] = None):
+    """Run the statement for one operation inside the caller's transaction"""
+    company_id = operation.company_id
+    result = {"op": operation.op, "company_id": company_id, "success": False}
+    
+    # Rank and tier operations of a user change only that user's ranking
+    if user is not None and operation.op in ("rank", "upvote", "downvote", "tier"):
+        if operation.op == "rank" and operation.rank is None:
+            return dict(result, error="rank is required"), None
+        if operation.op == "tier" and operation.tier not in ['A', 'B', 'C', 'D']:
+            return dict(result, error="Invalid tier. Must be A, B, C, or D"), None
+        value = max(operation.rank, 1) if operation.op == "rank" else operation.tier
+        ranking = await set_user_ranking(db, user, company_id, operation.op, value)
+        if ranking is None:
+            return dict(result, error="Company not found"), None
+        if operation.op == "tier":
+            result.update(tier=ranking["tier"])
+        else:
+            result.update(rank=ranking["votes"], votes=ranking["votes"])
+        return dict(result, success=True), {"consensus": ranking["consensus"]}
+    
+    if operation.op in ("rank", "upvote", "downvote"):
+        if operation.op == "rank":
+            if operation.rank is None:
+                return dict(result, error="rank is required"), None
+            stmt = set_votes_statement(company_id, max(operation.rank, 1))  # Minimum rank is 1
+        elif operation.op == "upvote":
+            stmt = increment_votes_statement(company_id)
+        else:
+            stmt = decrement_votes_statement(company_id)
+        rank = (await db.execute(stmt)).scalar_one_or_none()
+        if rank is None:
+            return dict(result, error="Company not found"), None
+        return dict(result, success=True, rank=rank, votes=rank), {"votes": rank, "rank": rank}
+    
+    if operation.op == "tier":
+        if operation.tier not in ['A', 'B', 'C', 'D']:
+            return dict(result, error="Invalid tier. Must be A, B, C, or D"), None
+        tier = (await db.execute(set_tier_statement(company_id, operation.tier))).scalar_one_or_none()
+        if tier is None:
+            return dict(result, error="Company not found"), None
+        return dict(result, success=True, tier=tier), {"tier": tier}
+    
+    # Tag operations lock the company's row and read its tags back after the write (as add_tag/remove_tag do)
+    if operation.op == "add_tag":
+        # Sanitize the tag (remove HTML and limit length)
+        tag = bleach.clean(operation.tag or "", tags=[], strip=True)[:30].strip()
+        if not tag:
+            return dict(result, error="Tag cannot be empty"), None
+        if await lock_company(db, company_id) is None:
+            return dict(result, error="Company not found"), None
+        inserted = (await db.execute(add_tag_statement(company_id, tag))).first()
+        tags = list(await get_company_tags(db, company_id))
+        if inserted is None:
+            return dict(result, success=True, tags=tags, message="Tag already exists"), None
+        return dict(result, success=True, tags=tags), {"tags": tags}
+    
+    # remove_tag
+    if await lock_company(db, company_id) is None:
+        return dict(result, error="Company not found"), None
+    removed_tag = None
+    if operation.tag is not None or (operation.tag_index is not None and operation.tag_index >= 0):
+        stmt = remove_tag_statement(company_id, operation.tag_index, operation.tag)
+        removed_tag = (await db.execute(stmt)).scalar_one_or_none()
+    if removed_tag is None:
+        return dict(result, error="Invalid tag index" if operation.tag is None else "Tag not found"), None
+    tags = list(await get_company_tags(db, company_id))
+    return dict(result, success=True, tags=tags, removed=removed_tag), {"tags": tags}
+
+# API endpoint to apply several rank/tier/tag changes in one transaction
+@app.post("/api/batch")
+async def batch_update(batch: BatchRequest, user: Optional[str] = Depends(current_user),
+                       db: AsyncSession = Depends(get_async_db)):
+    """Apply a list of operations in order in a single transaction
+
+    Each operation gets its own result; failed operations (unknown company,
+    invalid tier or tag index) change nothing and don't stop the others.
+    """
+    results = []
+    changed: Dict[int, Dict[str, Any]] = {}
+    
+    for operation in batch.operations:
+        result, fields = await apply_batch_operation(db, operation, user)
+        results.append(result)
+        if fields:
+            changed.setdefault(operation.company_id, {}).update(fields)
+    
+    # One change log entry per company touched
+    version = await record_changes(db, [
+        (company_id, {key: value for key, value in fields.items() if key != "rank"})
+        for company_id, fields in changed.items()
+    ])
+    await db.commit()
+    
+    # Patch the cache (and search index for tag changes) after the commit
+    for company_id, fields in changed.items():
+        fields.pop("consensus", None)  # Per-user rankings aren't part of the cached companies
+        if "tags" in fields:
+            refresh_company_tags(company_id, fields.pop("tags"), version)
+        if fields:
+            company_cache.patch(company_id, dataset_version=version, **fields)
+    if changed:
+        change_broadcaster.notify()
+    
+    return {"success": all(result["success"] for result in results), "results": results, "version": version}
+
+# API endpoint for tag facet counts (fills the tag filter dropdown)
+@app.get("/api/tags")
+async def tag_counts(batch: str = Depends(resolve_batch), db: AsyncSession = Depends(get_async_db)):
+    """List all tags of a batch with the number of companies carrying each"""
+    return await get_tag_counts(db, batch)
+
+# API endpoint for the analytics dashboard
+@app.get("/api/analytics")
+async def batch_analytics_view(request: Request, batch: str = Depends(resolve_batch), db: AsyncSession = Depends(get_async_db)):
+    """Companies per location and country, tier x location, founding years, founder counts and tag pairs
+
+    Built from the in-memory snapshot once per snapshot version (edits drop it
+    like the list views), so a polling dashboard gets 304s or a cached body
+    and never causes a database scan.
+    """
+    dataset_version = await snapshot_version(db)
+    return await conditional_json_response(
+        request, db, dataset_version, make_etag(dataset_version, "analytics", batch),
+        cached_view_body(db, "analytics", batch), {"X-Dataset-Version": str(dataset_version)}
+    )
+
+# API endpoint listing the batches that can be browsed
+@app.get("/api/batches")
+async def list_batches(db: AsyncSession = Depends(get_async_db)):
+    """Known batches with their company counts (0 until a batch is first requested)"""
+    counts = await get_batch_counts(db)
+    return [
+        {"batch": key, "loaded": key in counts, "companies": counts.get(key, 0), "default": key == DEFAULT_BATCH}
+        for key in sorted(set(batch_registry.paths) | set(counts))
+    ]
+
 # API endpoint to search/filter companies
 @app.get("/api/search")
 async def search_companies(
     request: Request, 
     query: str = "", 
     tags: str = "", 
-    db: Session = Depends(get_db)
+    mode: Literal["exact", "fuzzy"] = "exact",
+    batch: str = Depends(resolve_batch),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Search and filter companies by name, founder, or tags"""
-    # Get all companies
-    companies = get_companies_from_db(db)
-    
+    """Search and filter companies of a batch by name, founder, description or tags
+
+    The text query matches any of name, founder names, short description and
+    tags; the tag filter must also hold (AND). Results are in tier/rank order.
+
+    ``mode=fuzzy`` tolerates typos: query words are matched by trigram
+    similarity against names, founder names and short descriptions, and up to
+    FUZZY_LIMIT companies come back best first with a relevance ``score``
+    (0..1). If the latency budget runs out, the results cover only part of
+    the query and carry an X-Search-Partial header.
+    """
     # Parse tag filter - pass a single tag as a string, not comma-separated
     tag_filter = tags.strip() if tags else ""
     
-    # Filter companies
-    filtered_companies = []
-    for company in companies:
-        # Always include company if no filters are applied
-        if not query and not tag_filter:
-            filtered_companies.append(company)
-            continue
-            
-        # Check name match
-        name_match = query.lower() in company['name'].lower() if query else True
+    # Results only change with the dataset, so unchanged searches get a 304 (a client's
+    # copy for this version is current even while this worker's index is rebuilt)
+    dataset_version = await snapshot_version(db)
+    etag = make_etag(dataset_version, "search", batch, query, tag_filter, mode)
+    
+    async def fuzzy_body(encoding: Optional[str], headers: Dict[str, str]):
+        index = await get_search_index(db)
+        uncacheable_if_behind(index, headers)
+        with timed("search"):
+            ranked, partial = index.fuzzy_search(query, tag_filter)
+        if partial:
+            # Incomplete results shouldn't be revalidated and reused
+            headers.update({"X-Search-Partial": "1", "Cache-Control": "no-store"})
         
-        # Check founder match
-        founder_match = False
-        if query:
-            for founder in company['founders']:
-                if query.lower() in founder['name'].lower():
-                    founder_match = True
+        records = await cached_records(db)
+        matches = []
+        for company_id, score in ranked:
+            company = records.get(company_id)
+            if company is not None and company['batch'] == batch:
+                matches.append(dict(public_fields(company), score=round(score, 3)))
+                if len(matches) == FUZZY_LIMIT:
                     break
-        else:
-            founder_match = True
-            
-        # Check tag match (company must have the selected tag)
-        tag_match = True
-        if tag_filter:
-            company_tags = company.get('tags', [])
-            # Check if the selected tag is in the company's tags
-            tag_match = tag_filter in company_tags
+        with timed("serialize"):
+            return compress_body(join_array(dumps(company) for company in matches), encoding)
+    
+    if mode == "fuzzy" and query.strip():
+        return await conditional_json_response(request, db, dataset_version, etag, fuzzy_body)
+    
+    async def search_body(encoding: Optional[str], headers: Dict[str, str]):
+        # Get all companies (already sorted)
+        companies = await get_companies_from_db(db, batch=batch)
+        
+        # Look up matching company ids in the trigram/tag index
+        index = await get_search_index(db)
+        matched_ids = index.search(query, tag_filter)
+        if matched_ids is None:
+            # Always include every company if no filters are applied
+            return await cached_view_body(db, "all_json", batch)(encoding, headers)
+        uncacheable_if_behind(index, headers)
         
-        # Add company if it matches any filter
-        if name_match or founder_match or tag_match:
-            filtered_companies.append(company)
-    
-    # Sort filtered companies
-    sorted_companies = sorted(filtered_companies, key=lambda x: (
-        # Tier sorting (A,B,C,D)
-        'ABCD'.index(x['tier']) if x['tier'] in 'ABCD' else 3,
-        # Rank sorting (1,2,3...)
-        x['rank'] if x['rank'] > 0 else float('inf')
-    ))
-    
-    return sorted_companies
+        # Keep the tier/rank order of the full list (ids of other batches aren't in positions)
+        positions = await get_companies_from_db(db, view="positions", batch=batch)
+        matches = [companies[positions[company_id]] for company_id in sorted(matched_ids & positions.keys(), key=positions.get)]
+        return compress_body(encode_companies(matches), encoding)
+    
+    return await conditional_json_response(request, db, dataset_version, etag, search_body)
+
+# Prometheus metrics of this worker (METRICS_ENABLED=1)
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Request latency, phase and SQL histograms in Prometheus text format"""
+    if not metrics.enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# Cache hit/miss counters (for monitoring)
+@app.get("/admin/cache-stats")
+async def cache_stats():
+    """Report company cache statistics"""
+    return company_cache.stats()
 
 # Run with: uvicorn main:app --host 0.0.0.0 --port 5000 --reload
 if __name__ == "__main__":
@@ -0,0 +1,220 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+
+# Collect per-route metrics and serve them at /metrics (off by default)
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "").lower() in ("1", "true", "yes")
+
+# Add a Server-Timing header (db, to_dict, sort, search, serialize, render, total) to every response
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "").lower() in ("1", "true", "yes")
+
+# Histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Route label for requests that matched no route (keeps label cardinality bounded)
+UNMATCHED_ROUTE = "unmatched"
+
+
+class RequestTimings:
+    """Time spent per phase and SQL statements executed while serving one request"""
+    __slots__ = ('phases', 'queries', 'query_seconds')
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+        self.queries = 0
+        self.query_seconds = 0.0
+
+    def add(self, phase: str, seconds: float):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+
+# Timings of the request being served; the object is shared with the threadpool
+# and SQLAlchemy's greenlets, which run in copies of the request's context
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    """Add the time spent in the block to the current request's phase (no-op outside requests)"""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(phase, time.perf_counter() - start)
+
+
+class Histogram:
+    """Cumulative histogram per label set, rendered in Prometheus text format"""
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series: Dict[Tuple[Tuple[str, str], ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: str):
+        """Record one value (caller holds the registry lock)"""
+        key = tuple(sorted(labels.items()))
+        series = self._series.get(key)
+        if series is None:
+            # Bucket counts, then sum and count
+            series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self._series.items()):
+            labels = ','.join(f'{name}="{_escape(value)}"' for name, value in key)
+            prefix = labels + ',' if labels else ''
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative:g}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {series[-1]:g}')
+            suffix = '{' + labels + '}' if labels else ''
+            lines.append(f"{self.name}_sum{suffix} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{suffix} {series[-1]:g}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    """Escape a Prometheus label value"""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+    """Per-worker request, SQL and phase metrics
+
+    Each worker process keeps its own numbers; Prometheus scrapes whichever
+    worker answers, so run one worker per scrape target (or sum across them).
+    """
+
+    def __init__(self, enabled: bool = METRICS_ENABLED, server_timing: bool = SERVER_TIMING):
+        self.enabled = enabled
+        self.server_timing = server_timing
+        self._lock = threading.Lock()
+        self.requests = Histogram(
+            "http_request_duration_seconds", "Request latency by route, method and status", LATENCY_BUCKETS
+        )
+        self.phases = Histogram(
+            "http_request_phase_duration_seconds",
+            "Time per request spent in db, to_dict, sort, search, serialize and render", LATENCY_BUCKETS
+        )
+        self.query_counts = Histogram(
+            "db_queries_per_request", "SQL statements executed per request", QUERY_COUNT_BUCKETS
+        )
+        self.queries = Histogram(
+            "db_query_duration_seconds", "Duration of individual SQL statements", LATENCY_BUCKETS
+        )
+
+    @property
+    def active(self) -> bool:
+        """True if requests need to be timed at all"""
+        return self.enabled or self.server_timing
+
+    def observe_query(self, seconds: float):
+        """Record one SQL statement against the current request"""
+        timings = _current.get()
+        if timings is not None:
+            timings.queries += 1
+            timings.query_seconds += seconds
+        if self.enabled:
+            with self._lock:
+                self.queries.observe(seconds)
+
+    def observe_request(self, route: str, method: str, status: int, seconds: float, timings: RequestTimings):
+        """Record a finished request"""
+        with self._lock:
+            self.requests.observe(seconds, route=route, method=method, status=str(status))
+            self.query_counts.observe(timings.queries, route=route)
+            if timings.queries:
+                self.phases.observe(timings.query_seconds, route=route, phase="db")
+            for phase, phase_seconds in timings.phases.items():
+                self.phases.observe(phase_seconds, route=route, phase=phase)
+
+    def render(self) -> str:
+        """All metrics in Prometheus text exposition format"""
+        with self._lock:
+            lines = []
+            for histogram in (self.requests, self.phases, self.query_counts, self.queries):
+                lines.extend(histogram.render())
+        return '\n'.join(lines) + '\n'
+
+
+def server_timing_header(timings: RequestTimings, total: float) -> bytes:
+    """Server-Timing value with durations in milliseconds"""
+    entries = [f'db;dur={timings.query_seconds * 1000:.2f};desc="{timings.queries} queries"']
+    entries += [f"{phase};dur={seconds * 1000:.2f}" for phase, seconds in timings.phases.items()]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ', '.join(entries).encode('latin-1')
+
+
+# Time SQL statements on an engine (sync engines; pass async_engine.sync_engine for async ones)
+def instrument_engine(engine):
+    """Attach cursor execute hooks that feed metrics.observe_query"""
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        metrics.observe_query(time.perf_counter() - conn.info['query_start'].pop())
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing each HTTP request and collecting its RequestTimings
+
+    When neither metrics nor Server-Timing are enabled it passes requests
+    straight through.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not metrics.active:
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if metrics.server_timing:
+                    header = server_timing_header(timings, time.perf_counter() - start)
+                    message = dict(message, headers=list(message.get("headers", [])) + [(b"server-timing", header)])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            if metrics.enabled:
+                route = scope.get("route")
+                metrics.observe_request(
+                    getattr(route, "path", UNMATCHED_ROUTE), scope["method"], status,
+                    time.perf_counter() - start, timings
+                )
+
+
+metrics = Metrics()
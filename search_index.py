@@ -0,0 +1,261 @@
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# Queries shorter than this can't use the trigram postings and fall back to a scan
+NGRAM = 3
+
+# Fuzzy matching: a query word matches an indexed word when their trigram similarity
+# (shared / total distinct trigrams of the padded words, as pg_trgm computes it) reaches this
+FUZZY_THRESHOLD = 0.3
+
+# Weight of a match per field, so name matches outrank description matches
+FUZZY_FIELD_WEIGHTS = {'name': 1.0, 'founder': 0.8, 'description': 0.5}
+
+# Milliseconds a fuzzy search may spend collecting matches before it scores what it has
+FUZZY_BUDGET_MS = float(os.environ.get("FUZZY_BUDGET_MS", "50"))
+
+WORD_RE = re.compile(r'\w+')
+
+
+def ngrams(text: str, n: int = NGRAM) -> Set[str]:
+    """All n-character substrings of text"""
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def searchable_texts(company: Dict[str, Any]) -> List[str]:
+    """Lowercased strings a query is matched against: name, founders, short description, tags, website text"""
+    texts = [company.get('name') or '']
+    for founder in company.get('founders') or []:
+        if isinstance(founder, dict) and isinstance(founder.get('name'), str):
+            texts.append(founder['name'])
+    texts.append(company.get('short_description') or '')
+    texts.extend(company.get('tags') or [])
+    texts.append(company.get('site_text') or '')
+    return [text.lower() for text in texts if isinstance(text, str) and text]
+
+
+def word_trigrams(word: str) -> Set[str]:
+    """Trigrams of a lowercased word padded like pg_trgm (two spaces before, one after)"""
+    return ngrams(f"  {word} ")
+
+
+def fuzzy_words(company: Dict[str, Any]) -> Dict[str, float]:
+    """Words fuzzy queries are matched against, with the weight of the best field each occurs in
+
+    Multi-word names are also indexed run together, so "groundcntrl" can match "Ground Control".
+    """
+    fields = [('name', company.get('name'))]
+    for founder in company.get('founders') or []:
+        if isinstance(founder, dict):
+            fields.append(('founder', founder.get('name')))
+    fields.append(('description', company.get('short_description')))
+
+    words: Dict[str, float] = {}
+    for field, text in fields:
+        if not isinstance(text, str):
+            continue
+        tokens = WORD_RE.findall(text.lower())
+        if field == 'name' and len(tokens) > 1:
+            tokens.append(''.join(tokens))
+        weight = FUZZY_FIELD_WEIGHTS[field]
+        for token in tokens:
+            if weight > words.get(token, 0.0):
+                words[token] = weight
+    return words
+
+
+class SearchIndex:
+    """In-memory trigram index over company text plus a tag -> company id posting list
+
+    Built from the company cache snapshot (``generation`` records which load it
+    came from) and updated incrementally when a company's tags change.
+
+    A second, word-level trigram index over names, founder names and short
+    descriptions serves ``fuzzy_search``: query words are compared with indexed
+    words by trigram similarity, so misspellings still match. It is built along
+    with the rest in ``build``; edits never change those fields (only votes,
+    tiers and tags), so ``update`` leaves it alone.
+    """
+
+    def __init__(self):
+        self.generation: Optional[int] = None
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Set[int]] = defaultdict(set)
+        self._company_grams: Dict[int, Set[str]] = {}
+        self._texts: Dict[int, List[str]] = {}
+        self._tag_postings: Dict[str, Set[int]] = defaultdict(set)
+        self._company_tags: Dict[int, Set[str]] = {}
+        # Fuzzy index: word -> its trigrams, trigram -> words, word -> {company id: field weight}
+        self._word_grams: Dict[str, Set[str]] = {}
+        self._gram_words: Dict[str, Set[str]] = {}
+        self._word_companies: Dict[str, Dict[int, float]] = {}
+
+    def build(self, companies: Iterable[Dict[str, Any]], generation: Optional[int] = None) -> None:
+        """Rebuild the whole index from company dicts"""
+        with self._lock:
+            self._postings = defaultdict(set)
+            self._company_grams = {}
+            self._texts = {}
+            self._tag_postings = defaultdict(set)
+            self._company_tags = {}
+            companies = list(companies)
+            for company in companies:
+                self._add(company)
+            self._build_fuzzy(companies)
+            self.generation = generation
+
+    def _add(self, company: Dict[str, Any]) -> None:
+        company_id = company['id']
+        texts = searchable_texts(company)
+        grams = set()
+        for text in texts:
+            grams |= ngrams(text)
+        for gram in grams:
+            self._postings[gram].add(company_id)
+        self._company_grams[company_id] = grams
+        self._texts[company_id] = texts
+
+        tags = set(company.get('tags') or [])
+        for tag in tags:
+            self._tag_postings[tag].add(company_id)
+        self._company_tags[company_id] = tags
+
+    def _remove(self, company_id: int) -> None:
+        for gram in self._company_grams.pop(company_id, ()):
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(company_id)
+                if not posting:
+                    del self._postings[gram]
+        self._texts.pop(company_id, None)
+        for tag in self._company_tags.pop(company_id, ()):
+            posting = self._tag_postings.get(tag)
+            if posting is not None:
+                posting.discard(company_id)
+                if not posting:
+                    del self._tag_postings[tag]
+
+    def update(self, company: Dict[str, Any]) -> None:
+        """Reindex a single company (e.g. after a tag was added or removed)"""
+        with self._lock:
+            self._remove(company['id'])
+            self._add(company)
+
+    def search(self, query: str = "", tag: str = "") -> Optional[Set[int]]:
+        """Company ids matching the query text AND carrying the tag
+
+        Returns None when neither filter is given (everything matches).
+        """
+        query = query.strip().lower()
+        if not query and not tag:
+            return None
+
+        with self._lock:
+            candidates: Optional[Set[int]] = None
+            if tag:
+                candidates = set(self._tag_postings.get(tag, ()))
+                if not candidates:
+                    return set()
+
+            if not query:
+                return candidates
+
+            if len(query) >= NGRAM:
+                # Intersect postings, smallest first, then verify the substring
+                postings = sorted((self._postings.get(gram, set()) for gram in ngrams(query)), key=len)
+                matched = set(postings[0])
+                for posting in postings[1:]:
+                    if not matched:
+                        break
+                    matched &= posting
+                if candidates is not None:
+                    matched &= candidates
+            else:
+                matched = set(self._texts) if candidates is None else candidates
+
+            return {
+                company_id for company_id in matched
+                if any(query in text for text in self._texts.get(company_id, ()))
+            }
+
+    def _build_fuzzy(self, companies: List[Dict[str, Any]]) -> None:
+        word_grams: Dict[str, Set[str]] = {}
+        gram_words: Dict[str, Set[str]] = defaultdict(set)
+        word_companies: Dict[str, Dict[int, float]] = defaultdict(dict)
+        for company in companies:
+            for word, weight in fuzzy_words(company).items():
+                if word not in word_grams:
+                    grams = word_grams[word] = word_trigrams(word)
+                    for gram in grams:
+                        gram_words[gram].add(word)
+                word_companies[word][company['id']] = weight
+        self._word_grams, self._gram_words, self._word_companies = word_grams, gram_words, word_companies
+
+    def _fuzzy_match(self, query_word: str, deadline: float, allowed: Optional[Set[int]]) -> Optional[Dict[int, float]]:
+        """Best score per company for one query word (None if the deadline passed)"""
+        # Count shared trigrams per indexed word via the trigram -> word postings
+        grams = word_trigrams(query_word)
+        shared: Dict[str, int] = defaultdict(int)
+        for gram in grams:
+            if time.perf_counter() > deadline:
+                return None
+            for word in self._gram_words.get(gram, ()):
+                shared[word] += 1
+
+        best: Dict[int, float] = {}
+        for word, count in shared.items():
+            similarity = count / (len(grams) + len(self._word_grams[word]) - count)
+            if similarity < FUZZY_THRESHOLD:
+                continue
+            for company_id, weight in self._word_companies[word].items():
+                if allowed is not None and company_id not in allowed:
+                    continue
+                score = similarity * weight
+                if score > best.get(company_id, 0.0):
+                    best[company_id] = score
+        return best
+
+    def fuzzy_search(self, query: str, tag: str = "", budget_ms: float = FUZZY_BUDGET_MS) -> Tuple[List[Tuple[int, float]], bool]:
+        """Companies matching the query words approximately, best first, as (id, score) pairs
+
+        A company's score is the mean over query words of its best match
+        (trigram similarity times field weight), in 0..1; a multi-word query
+        is also matched run together, and the better of the two counts.
+        Matches are collected until ``budget_ms`` runs out; the second value
+        is True if it did, in which case only the words looked up so far count.
+        """
+        deadline = time.perf_counter() + budget_ms / 1000
+        query_words = list(dict.fromkeys(WORD_RE.findall(query.lower())))
+        if not query_words:
+            return [], False
+
+        with self._lock:
+            allowed = self._tag_postings.get(tag, set()) if tag else None
+            scores: Dict[int, float] = defaultdict(float)
+            partial = False
+            for query_word in query_words:
+                best = self._fuzzy_match(query_word, deadline, allowed)
+                if best is None:
+                    partial = True
+                    break
+                for company_id, score in best.items():
+                    scores[company_id] += score / len(query_words)
+
+            if len(query_words) > 1 and not partial:
+                joined = self._fuzzy_match(''.join(query_words), deadline, allowed)
+                if joined is None:
+                    partial = True
+                else:
+                    for company_id, score in joined.items():
+                        scores[company_id] = max(scores[company_id], score)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked, partial
+
+
+# Shared index instance for this worker
+search_index = SearchIndex()
@@ -0,0 +1,70 @@
+import gzip
+import json
+from typing import Any, Iterable, Optional
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # Optional speedup; the standard library encoder gives the same JSON
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # Optional; without it responses are gzip-compressed
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed
+MIN_COMPRESS_SIZE = 1000
+
+# Mid-range levels: most of the size reduction at a fraction of the CPU time of the maximum
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def dumps(value: Any) -> bytes:
+    """Encode a value as compact UTF-8 JSON"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data: Any) -> Any:
+    """Decode JSON from str or bytes"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def join_array(fragments: Iterable[bytes]) -> bytes:
+    """Concatenate already encoded JSON values into a JSON array"""
+    return b'[' + b','.join(fragments) + b']'
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Best content coding ("br" or "gzip") the client accepts, or None for identity"""
+    accepted = set()
+    for item in accept_encoding.lower().split(','):
+        coding, _, params = item.strip().partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(coding.strip())
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress(body: bytes, encoding: Optional[str]) -> bytes:
+    """Body compressed with a coding from negotiate_encoding (unchanged for None)"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return body
+
+
+class RawJSONResponse(Response):
+    """Response for a body that is already encoded JSON"""
+    media_type = "application/json"
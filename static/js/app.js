@@ -1,3 +1,76 @@
+// Edits made within this window are sent together as one /api/batch request
+const BATCH_WINDOW_MS = 150;
+
+// Pending batch operations, keyed so repeated rank/tier edits of a company coalesce
+let pendingOperations = new Map();
+let batchTimer = null;
+let operationCounter = 0;
+
+// Queue a rank/tier/tag operation; resolves with its result from /api/batch
+function queueOperation(operation) {
+    // Rank and tier edits replace an earlier pending edit of the same company (last one wins),
+    // tag edits are all kept in order
+    const coalesce = operation.op === 'rank' || operation.op === 'tier';
+    const key = coalesce ? `${operation.op}:${operation.company_id}` : `op:${operationCounter++}`;
+    
+    return new Promise((resolve) => {
+        const entry = pendingOperations.get(key);
+        if (entry) {
+            entry.operation = operation;
+            entry.resolvers.push(resolve);
+        } else {
+            pendingOperations.set(key, { operation, resolvers: [resolve] });
+        }
+        
+        if (!batchTimer) {
+            batchTimer = setTimeout(flushOperations, BATCH_WINDOW_MS);
+        }
+    });
+}
+
+// Send all pending operations in one request
+async function flushOperations() {
+    clearTimeout(batchTimer);
+    batchTimer = null;
+    
+    const entries = Array.from(pendingOperations.values());
+    pendingOperations = new Map();
+    if (entries.length === 0) return;
+    
+    try {
+        const response = await fetch('/api/batch', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Accept': 'application/json'
+            },
+            body: JSON.stringify({ operations: entries.map(entry => entry.operation) })
+        });
+        
+        if (!response.ok) {
+            throw new Error(response.statusText);
+        }
+        
+        const data = await response.json();
+        entries.forEach((entry, index) => {
+            entry.resolvers.forEach(resolve => resolve(data.results[index]));
+        });
+    } catch (error) {
+        console.error('Error applying batch:', error);
+        entries.forEach(entry => {
+            entry.resolvers.forEach(resolve => resolve({ success: false, error: String(error) }));
+        });
+    }
+}
+
+// Send anything still queued when the page is closed
+window.addEventListener('pagehide', () => {
+    if (pendingOperations.size === 0) return;
+    const operations = Array.from(pendingOperations.values()).map(entry => entry.operation);
+    pendingOperations = new Map();
+    navigator.sendBeacon('/api/batch', new Blob([JSON.stringify({ operations })], { type: 'application/json' }));
+});
+
 // Function to handle ranking through AJAX
 async function handleRank(companyId, rankType) {
     try {
@@ -43,50 +116,23 @@ async function handleRank(companyId, rankType) {
             rankDisplayElement.classList.remove('vote-updated');
         }, 500);
         
-        // Determine the endpoint based on rank change type
-        const endpoint = `/update_rank/${companyId}`;
+        // Queue the new rank; quick successive clicks are coalesced into one batch operation
+        const data = await queueOperation({ op: 'rank', company_id: parseInt(companyId), rank: newRank });
         
-        // Make API call using form submission
-        const formData = new FormData();
-        formData.append('rank', newRank);
-        
-        const response = await fetch(endpoint, {
-            method: 'POST',
-            headers: {
-                'Accept': 'application/json'
-            },
-            body: formData
-        });
-        
-        if (response.ok) {
-            try {
-                // Get the actual updated rank from server
-                const data = await response.json();
-                
-                // Update to server value (only if different from our optimistic update)
-                if (data.rank !== newRank) {
-                    rankDisplayElement.textContent = data.rank;
-                }
-                
-                // Update local data
-                const companyIndex = allCompaniesData.findIndex(c => c.id === parseInt(companyId));
-                if (companyIndex !== -1) {
-                    allCompaniesData[companyIndex].rank = data.rank;
-                    allCompaniesData[companyIndex].votes = data.rank; // Ensure both fields are updated
-                }
-                
-                // Re-sort and redraw the table without full data refresh from server
-                const searchQuery = document.getElementById('searchInput')?.value || '';
-                const tagFilter = document.getElementById('tagFilterSelect')?.value || '';
-                const tierFilter = document.getElementById('tierFilterSelect')?.value || '';
-                searchAndFilterCompanies(searchQuery, tagFilter, tierFilter);
-            } catch (jsonError) {
-                console.error('Error parsing JSON response:', jsonError);
-                // Keep the optimistic update
+        if (data.success) {
+            // Update to server value (only if different from our optimistic update)
+            if (data.rank !== newRank) {
+                rankDisplayElement.textContent = data.rank;
             }
+            
+            // Update local data (both fields carry the rank)
+            updateCompany(companyId, { rank: data.rank, votes: data.rank });
+            
+            // Re-sort and redraw the table without full data refresh from server
+            redrawCompanies();
         } else {
             // If there was an error, rollback to original value
-            console.error('Error updating rank:', response.statusText);
+            console.error('Error updating rank:', data.error);
             rankDisplayElement.textContent = currentRank;
             
             // Show error indicator
@@ -160,33 +206,17 @@ async function submitVote(companyId) {
             rankDisplay.style.backgroundColor = 'transparent';
         }, 500);
         
-        // Make API call in background
-        const response = await fetch(`/update_rank/${companyId}`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/x-www-form-urlencoded',
-                'Accept': 'application/json'
-            },
-            body: `rank=${rankValue}`
-        });
+        // Queue the update; it is sent with any other edits made in the same window
+        const data = await queueOperation({ op: 'rank', company_id: parseInt(companyId), rank: rankValue });
         
-        if (response.ok) {
-            // Get updated data
-            const data = await response.json();
-            
+        if (data.success) {
             // Update local data
-            const companyIndex = allCompaniesData.findIndex(c => c.id === parseInt(companyId));
-            if (companyIndex !== -1) {
-                allCompaniesData[companyIndex].rank = data.rank;
-            }
+            updateCompany(companyId, { rank: data.rank, votes: data.rank });
             
             // Re-sort the table without full refresh
-            const searchQuery = document.getElementById('searchInput')?.value || '';
-            const tagFilter = document.getElementById('tagFilterSelect')?.value || '';
-            const tierFilter = document.getElementById('tierFilterSelect')?.value || '';
-            searchAndFilterCompanies(searchQuery, tagFilter, tierFilter);
+            redrawCompanies();
         } else {
-            console.error('Error updating rank:', response.statusText);
+            console.error('Error updating rank:', data.error);
             // Visual feedback for error
             rankDisplay.style.backgroundColor = 'rgba(239, 68, 68, 0.3)';
             setTimeout(() => {
@@ -213,36 +243,20 @@ async function handleTierChange(companyId, tier) {
             tierSelect.classList.remove('bg-accent-blue');
         }, 500);
         
-        // Make API call to update tier
-        const response = await fetch(`/update_tier/${companyId}`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/x-www-form-urlencoded',
-                'Accept': 'application/json'
-            },
-            body: `tier=${tier}`
-        });
+        // Queue the tier change for the next batch
+        const data = await queueOperation({ op: 'tier', company_id: parseInt(companyId), tier: tier });
         
-        if (response.ok) {
-            // Get updated data
-            const data = await response.json();
-            
+        if (data.success) {
             // Store the new tier as the original for future reference
             tierSelect.setAttribute('data-original-tier', data.tier);
             
             // Update local data instead of fetching everything again
-            const companyIndex = allCompaniesData.findIndex(c => c.id === parseInt(companyId));
-            if (companyIndex !== -1) {
-                allCompaniesData[companyIndex].tier = data.tier;
-            }
+            updateCompany(companyId, { tier: data.tier });
             
             // Re-apply current filters without full data refresh
-            const searchQuery = document.getElementById('searchInput')?.value || '';
-            const tagFilter = document.getElementById('tagFilterSelect')?.value || '';
-            const tierFilter = document.getElementById('tierFilterSelect')?.value || '';
-            searchAndFilterCompanies(searchQuery, tagFilter, tierFilter);
+            redrawCompanies();
         } else {
-            console.error('Error updating tier:', response.statusText);
+            console.error('Error updating tier:', data.error);
             
             // Revert to original tier
             tierSelect.value = originalTier;
@@ -258,36 +272,62 @@ async function handleTierChange(companyId, tier) {
     }
 }
 
-// Collect all unique tags from all companies
-function collectAllTags(companies) {
-    const tagSet = new Set();
-    companies.forEach(company => {
-        if (company.tags && Array.isArray(company.tags)) {
-            company.tags.forEach(tag => tagSet.add(tag));
-        }
-    });
-    return Array.from(tagSet).sort();
+// Load tag facet counts (counted in the local store once it has the whole batch)
+async function loadTagFacets() {
+    if (storeReady()) {
+        const facets = companyStore.tagFacets();
+        updateTagFilterOptions(facets);
+        return facets;
+    }
+    try {
+        const response = await fetch(`/api/tags?${withBatch(new URLSearchParams())}`);
+        const facets = await response.json();
+        updateTagFilterOptions(facets);
+        return facets;
+    } catch (error) {
+        console.error('Error loading tags:', error);
+        return [];
+    }
 }
 
 // Update tag filter dropdown with all available tags
-function updateTagFilterOptions(tags) {
+function updateTagFilterOptions(facets) {
     const tagFilterSelect = document.getElementById('tagFilterSelect');
     if (!tagFilterSelect) return;
     
+    // Keep the current selection if that tag still exists
+    const selectedTag = tagFilterSelect.value;
+    
     // Clear existing options (except the first one)
     while (tagFilterSelect.options.length > 1) {
         tagFilterSelect.remove(1);
     }
     
     // Add options for each tag
-    tags.forEach(tag => {
+    facets.forEach(facet => {
         const option = document.createElement('option');
-        option.value = tag;
-        option.textContent = tag;
+        option.value = facet.tag;
+        option.textContent = `${facet.tag} (${facet.count})`;
         tagFilterSelect.appendChild(option);
     });
     
-    console.log('Updated tag filter dropdown with', tags.length, 'tags');
+    if (facets.some(facet => facet.tag === selectedTag)) {
+        tagFilterSelect.value = selectedTag;
+    }
+    
+    console.log('Updated tag filter dropdown with', facets.length, 'tags');
+}
+
+// Apply a tag result from the server to local data and redraw
+async function applyTagResult(companyId, data) {
+    // Update local data instead of reloading every company
+    updateCompany(companyId, { tags: data.tags });
+    
+    // Update the tag dropdown with current tags
+    await loadTagFacets();
+    
+    // Reapply current filters
+    redrawCompanies();
 }
 
 // Add a tag to a company
@@ -295,31 +335,13 @@ async function addTag(companyId, tagText) {
     try {
         if (!tagText || !tagText.trim()) return;
         
-        // Submit the new tag to the server
-        const formData = new FormData();
-        formData.append('tag', tagText);
+        // Queue the new tag for the next batch
+        const data = await queueOperation({ op: 'add_tag', company_id: parseInt(companyId), tag: tagText });
         
-        const response = await fetch(`/api/tags/${companyId}`, {
-            method: 'POST',
-            body: formData
-        });
-        
-        if (response.ok) {
-            const data = await response.json();
-            if (data.success) {
-                // Reload all companies data to get the updated tags
-                await loadAllCompaniesData();
-                
-                // Update the tag dropdown with new tags
-                const allTags = collectAllTags(allCompaniesData);
-                updateTagFilterOptions(allTags);
-                
-                // Reapply current filters
-                const searchQuery = document.getElementById('searchInput')?.value || '';
-                const tagFilter = document.getElementById('tagFilterSelect')?.value || '';
-                const tierFilter = document.getElementById('tierFilterSelect')?.value || '';
-                searchAndFilterCompanies(searchQuery, tagFilter, tierFilter);
-            }
+        if (data.success) {
+            await applyTagResult(companyId, data);
+        } else {
+            console.error('Error adding tag:', data.error);
         }
     } catch (error) {
         console.error('Error adding tag:', error);
@@ -329,244 +351,466 @@ async function addTag(companyId, tagText) {
 // Remove a tag from a company
 async function removeTag(companyId, tagIndex) {
     try {
-        const response = await fetch(`/api/tags/${companyId}/${tagIndex}`, {
-            method: 'DELETE'
-        });
+        // Send the tag shown at this index too: the server removes it by value, wherever it is now
+        const id = parseInt(companyId);
+        const company = storeReady() ? companyStore.get(id) : allCompaniesData.find(c => c.id === id);
+        const tag = company && company.tags ? company.tags[tagIndex] : undefined;
         
-        if (response.ok) {
-            const data = await response.json();
-            if (data.success) {
-                // Reload all companies data to get the updated tags
-                await loadAllCompaniesData();
-                
-                // Update the tag dropdown with current tags
-                const allTags = collectAllTags(allCompaniesData);
-                updateTagFilterOptions(allTags);
-                
-                // Reapply current filters
-                const searchQuery = document.getElementById('searchInput')?.value || '';
-                const tagFilter = document.getElementById('tagFilterSelect')?.value || '';
-                const tierFilter = document.getElementById('tierFilterSelect')?.value || '';
-                searchAndFilterCompanies(searchQuery, tagFilter, tierFilter);
-            }
+        // Queue the removal for the next batch
+        const data = await queueOperation({ op: 'remove_tag', company_id: id, tag, tag_index: tagIndex });
+        
+        if (data.success) {
+            await applyTagResult(companyId, data);
+        } else {
+            console.error('Error removing tag:', data.error);
         }
     } catch (error) {
         console.error('Error removing tag:', error);
     }
 }
 
-// Store all companies data in memory for client-side filtering
+// Companies listed until the local store is ready (pages loaded so far, or the search results)
 let allCompaniesData = [];
 
+// Local copy of the whole batch (store.js); lists are filtered from it once it is ready
+let companyStore = null;
+
+// Rows rendered from the store; grows by a page as the end of the table scrolls into view
+let renderLimit = 50;
+let moreRows = false;
+
+// Rendered rows by company id, with the record each row was built from
+let renderedRows = new Map();
+
+// Typo-tolerant matches from the server for a query nothing in the store contains: { query, tags, ids }
+let fuzzyMatches = null;
+
+// Change log version the listed data reflects until the store is ready (from the first page and live updates)
+let datasetVersion = 0;
+
+// Companies per page (the server renders the first page with the HTML)
+let pageSize = 50;
+
+// Batch shown on this page (every list, search and tag request is scoped to it)
+let currentBatch = null;
+
+// Cursor of the next page of the list; null when everything is loaded or search results are shown
+let nextCursor = null;
+let loadingPage = false;
+
+// Bumped whenever the filters change, so responses for older filters are dropped
+let listRequestId = 0;
+
+// Current values of the search box and filter dropdowns
+function currentFilters() {
+    return {
+        query: document.getElementById('searchInput')?.value || '',
+        tags: document.getElementById('tagFilterSelect')?.value || '',
+        tier: document.getElementById('tierFilterSelect')?.value || ''
+    };
+}
+
+// True once the local store holds the whole batch
+function storeReady() {
+    return companyStore !== null && companyStore.ready;
+}
+
+// Apply the result of a local edit; records are replaced, so their rows get rendered again
+function updateCompany(companyId, fields) {
+    const id = parseInt(companyId);
+    if (companyStore) companyStore.update(id, fields);
+    const index = allCompaniesData.findIndex(c => c.id === id);
+    if (index !== -1) {
+        allCompaniesData[index] = { ...allCompaniesData[index], ...fields };
+    }
+}
+
+// True while a company's rank input is open (its row isn't replaced then)
+function isEditingRank(companyId) {
+    const inputContainer = document.getElementById(`rankInputContainer${companyId}`);
+    return inputContainer !== null && !inputContainer.classList.contains('hidden');
+}
+
 /**
- * Renders company rows in the table - this function is needed by other parts of the code
+ * Renders company rows in the table, reusing the rows of companies already shown
  * @param {Array} companies - Array of company objects to render
  * @param {HTMLElement} tableBody - The table body element to render into
  */
 function renderCompanyRows(companies, tableBody) {
     if (!tableBody) return;
     
-    // Clear the table body
-    tableBody.innerHTML = '';
-    
     // Handle empty results
     if (companies.length === 0) {
-        const noResultsRow = document.createElement('tr');
-        noResultsRow.innerHTML = '<td colspan="5" class="px-3 py-5 text-center text-gray-400">No companies match your search criteria</td>';
-        tableBody.appendChild(noResultsRow);
+        renderedRows = new Map();
+        tableBody.innerHTML = '<tr><td colspan="5" class="px-3 py-5 text-center text-gray-400">No companies match your search criteria</td></tr>';
         return;
     }
     
-    // Add each company to the table
+    // Drop rows of companies no longer listed (and server-rendered or "no results" rows)
+    const listed = new Set(companies.map(company => company.id));
+    Array.from(tableBody.children).forEach(row => {
+        const id = Number(row.dataset.companyId);
+        const entry = renderedRows.get(id);
+        if (!entry || entry.row !== row || !listed.has(id)) row.remove();
+    });
+    renderedRows.forEach((entry, id) => {
+        if (!listed.has(id) || entry.row.parentNode !== tableBody) renderedRows.delete(id);
+    });
+    
+    // Walk the list in order: changed records get a new row, rows out of place are moved
+    let next = tableBody.firstElementChild;
     companies.forEach(company => {
-        const row = document.createElement('tr');
-        row.className = 'company-row border-b border-dark-border';
-        row.dataset.companyId = company.id;
-        
-        // Create the HTML for the row
-        row.innerHTML = `
-            <td class="px-2 py-2 whitespace-nowrap">
-                <div class="flex items-center space-x-1">
-                    <div class="flex items-center flex-col md:flex-row space-y-1 md:space-y-0 md:space-x-2">
-                        <!-- Tier dropdown -->
-                        <div class="flex items-center">
-                            <select id="tierSelect${company.id}" data-company-id="${company.id}" data-original-tier="${company.tier}" class="text-sm w-12 px-1 py-1 bg-dark-accent text-gray-200 border border-dark-border rounded-md focus:outline-none focus:ring-1 focus:ring-accent-blue" onchange="handleTierChange(${company.id}, this.value)">
-                                <option value="A" ${company.tier === 'A' ? 'selected' : ''}>A</option>
-                                <option value="B" ${company.tier === 'B' ? 'selected' : ''}>B</option>
-                                <option value="C" ${company.tier === 'C' ? 'selected' : ''}>C</option>
-                                <option value="D" ${company.tier === 'D' ? 'selected' : ''}>D</option>
-                            </select>
-                            <span class="mx-2 text-gray-500">/</span>
+        let entry = renderedRows.get(company.id);
+        if (!entry) {
+            entry = { row: createCompanyRow(company), company };
+            renderedRows.set(company.id, entry);
+        } else if (entry.company !== company && !isEditingRank(company.id)) {
+            const row = createCompanyRow(company);
+            entry.row.replaceWith(row);
+            if (entry.row === next) next = row;
+            entry.row = row;
+            entry.company = company;
+        }
+        
+        if (entry.row === next) {
+            next = next.nextElementSibling;
+        } else {
+            tableBody.insertBefore(entry.row, next);
+        }
+    });
+}
+
+/**
+ * Builds the table row of a company
+ * @param {Object} company - Company to render
+ * @returns {HTMLElement} The row element
+ */
+function createCompanyRow(company) {
+    const row = document.createElement('tr');
+    row.className = 'company-row border-b border-dark-border';
+    row.dataset.companyId = company.id;
+    
+    // Create the HTML for the row
+    row.innerHTML = `
+        <td class="px-2 py-2 whitespace-nowrap">
+            <div class="flex items-center space-x-1">
+                <div class="flex items-center flex-col md:flex-row space-y-1 md:space-y-0 md:space-x-2">
+                    <!-- Tier dropdown -->
+                    <div class="flex items-center">
+                        <select id="tierSelect${company.id}" data-company-id="${company.id}" data-original-tier="${company.tier}" class="text-sm w-12 px-1 py-1 bg-dark-accent text-gray-200 border border-dark-border rounded-md focus:outline-none focus:ring-1 focus:ring-accent-blue" onchange="handleTierChange(${company.id}, this.value)">
+                            <option value="A" ${company.tier === 'A' ? 'selected' : ''}>A</option>
+                            <option value="B" ${company.tier === 'B' ? 'selected' : ''}>B</option>
+                            <option value="C" ${company.tier === 'C' ? 'selected' : ''}>C</option>
+                            <option value="D" ${company.tier === 'D' ? 'selected' : ''}>D</option>
+                        </select>
+                        <span class="mx-2 text-gray-500">/</span>
+                    </div>
+                    
+                    <!-- Rank controls -->
+                    <div class="flex items-center">
+                        <div id="rankInputContainer${company.id}" class="hidden">
+                            <input type="number" id="rankInput${company.id}" min="1" class="vote-input w-16 text-sm px-2 py-1 bg-dark-accent text-gray-200 border border-accent-blue rounded-md focus:outline-none focus:ring-1 focus:ring-accent-blue" value="${company.rank}" onblur="handleVoteBlur(${company.id})" onkeydown="handleEnterKey(event, ${company.id})">
                         </div>
-                        
-                        <!-- Rank controls -->
-                        <div class="flex items-center">
-                            <div id="rankInputContainer${company.id}" class="hidden">
-                                <input type="number" id="rankInput${company.id}" min="1" class="vote-input w-16 text-sm px-2 py-1 bg-dark-accent text-gray-200 border border-accent-blue rounded-md focus:outline-none focus:ring-1 focus:ring-accent-blue" value="${company.rank}" onblur="handleVoteBlur(${company.id})" onkeydown="handleEnterKey(event, ${company.id})">
-                            </div>
-                            <span id="rankDisplay${company.id}" class="font-semibold text-xl text-gray-200 cursor-pointer hover:text-accent-blue transition-colors duration-200" onclick="showVoteInput(${company.id})">${company.rank}</span>
-                        
-                            <div class="flex flex-col space-y-1 ml-2">
-                                <button onclick="handleRank(${company.id}, 'promote')" class="text-gray-400 hover:text-accent-green focus:outline-none transition-colors duration-200" title="Promote (Lower Rank Number)">
-                                    <i class="fas fa-arrow-up text-sm"></i>
-                                </button>
-                                <button onclick="handleRank(${company.id}, 'demote')" class="text-gray-400 hover:text-accent-red focus:outline-none transition-colors duration-200" title="Demote (Higher Rank Number)">
-                                    <i class="fas fa-arrow-down text-sm"></i>
-                                </button>
-                            </div>
+                        <span id="rankDisplay${company.id}" class="font-semibold text-xl text-gray-200 cursor-pointer hover:text-accent-blue transition-colors duration-200" onclick="showVoteInput(${company.id})">${company.rank}</span>
+                    
+                        <div class="flex flex-col space-y-1 ml-2">
+                            <button onclick="handleRank(${company.id}, 'promote')" class="text-gray-400 hover:text-accent-green focus:outline-none transition-colors duration-200" title="Promote (Lower Rank Number)">
+                                <i class="fas fa-arrow-up text-sm"></i>
+                            </button>
+                            <button onclick="handleRank(${company.id}, 'demote')" class="text-gray-400 hover:text-accent-red focus:outline-none transition-colors duration-200" title="Demote (Higher Rank Number)">
+                                <i class="fas fa-arrow-down text-sm"></i>
+                            </button>
                         </div>
                     </div>
                 </div>
-            </td>
-            <td class="px-2 py-2 whitespace-nowrap">
-                <div class="flex flex-col">
-                    <div class="flex items-center">
-                        <a href="${company.website}" target="_blank" class="text-accent-blue hover:text-blue-400 transition-colors duration-200 text-sm font-medium">
-                            ${company.name}
-                        </a>
-                        ${company.company_linkedin ? `
-                        <a href="${company.company_linkedin}" target="_blank" class="ml-1 text-blue-500 hover:text-blue-400 transition-colors duration-200 flex-shrink-0">
-                            <span class="bg-blue-900 text-blue-100 px-1 py-0 rounded text-xs font-semibold">LinkedIn</span>
-                        </a>
-                        ` : ''}
-                    </div>
-                    <div class="text-xs text-gray-500 mt-0.5">${company.short_description || ''}</div>
+            </div>
+        </td>
+        <td class="px-2 py-2 whitespace-nowrap">
+            <div class="flex flex-col">
+                <div class="flex items-center">
+                    <a href="${company.website}" target="_blank" class="text-accent-blue hover:text-blue-400 transition-colors duration-200 text-sm font-medium">
+                        ${company.name}
+                    </a>
+                    ${company.company_linkedin ? `
+                    <a href="${company.company_linkedin}" target="_blank" class="ml-1 text-blue-500 hover:text-blue-400 transition-colors duration-200 flex-shrink-0"${brokenLinkAttrs(company, company.company_linkedin)}>
+                        <span class="bg-blue-900 text-blue-100 px-1 py-0 rounded text-xs font-semibold">LinkedIn</span>
+                    </a>
+                    ` : ''}
                 </div>
-            </td>
+                <div class="text-xs text-gray-500 mt-0.5">${company.short_description || ''}</div>
+            </div>
+        </td>
 
-            <td class="px-2 py-2 whitespace-nowrap">
-                <div class="flex flex-col space-y-0.5">
-                    ${renderFounders(company.founders)}
-                </div>
-                <div class="text-xs text-gray-500 mt-0.5">${company.founded_year || ''} • ${company.location || ''}</div>
-            </td>
-            <td class="px-2 py-2">
-                <div class="flex flex-wrap gap-0.5">
-                    ${renderTags(company.tags, company.id)}
-                    <div class="mt-0.5">
-                        <form onsubmit="event.preventDefault(); addTag(${company.id}, this.querySelector('input').value); this.querySelector('input').value='';" class="flex items-center">
-                            <input type="text" placeholder="Add tag..." class="text-xs w-16 px-1 py-0.5 bg-dark-accent text-gray-200 border border-dark-border rounded-l-md focus:outline-none focus:ring-1 focus:ring-accent-blue">
-                            <button type="submit" class="bg-dark-accent border border-dark-border border-l-0 rounded-r-md px-1 py-0.5 text-xs text-gray-400 hover:text-accent-blue">+</button>
-                        </form>
-                    </div>
+        <td class="px-2 py-2 whitespace-nowrap">
+            <div class="flex flex-col space-y-0.5">
+                ${renderFounders(company.founders, company)}
+            </div>
+            <div class="text-xs text-gray-500 mt-0.5">${company.founded_year || ''} • ${company.location || ''}</div>
+        </td>
+        <td class="px-2 py-2">
+            <div class="flex flex-wrap gap-0.5">
+                ${renderTags(company.tags, company.id)}
+                <div class="mt-0.5">
+                    <form onsubmit="event.preventDefault(); addTag(${company.id}, this.querySelector('input').value); this.querySelector('input').value='';" class="flex items-center">
+                        <input type="text" placeholder="Add tag..." class="text-xs w-16 px-1 py-0.5 bg-dark-accent text-gray-200 border border-dark-border rounded-l-md focus:outline-none focus:ring-1 focus:ring-accent-blue">
+                        <button type="submit" class="bg-dark-accent border border-dark-border border-l-0 rounded-r-md px-1 py-0.5 text-xs text-gray-400 hover:text-accent-blue">+</button>
+                    </form>
                 </div>
-            </td>
-        `;
-        
-        tableBody.appendChild(row);
-    });
+            </div>
+        </td>
+    `;
+    
+    return row;
+}
+
+// Read the first page that was rendered with the HTML
+function loadInitialPage() {
+    const element = document.getElementById('initialPage');
+    if (!element) return;
+    
+    const page = JSON.parse(element.textContent);
+    allCompaniesData = page.companies;
+    nextCursor = page.next_cursor;
+    datasetVersion = page.version;
+    pageSize = page.page_size || pageSize;
+    renderLimit = pageSize;
+    currentBatch = page.batch || null;
+    companyStore = new CompanyStore(currentBatch);
 }
 
-// Load all companies data from the server for client-side filtering
-async function loadAllCompaniesData() {
+// Switch the table over to the local store once it holds the whole batch
+async function openCompanyStore() {
     try {
-        const response = await fetch('/api/companies');
-        allCompaniesData = await response.json();
-        console.log('Loaded', allCompaniesData.length, 'companies for client-side filtering');
-        
-        // Update tag filter with all available tags
-        const allTags = collectAllTags(allCompaniesData);
-        updateTagFilterOptions(allTags);
-        
-        return allCompaniesData;
+        await companyStore.open();
     } catch (error) {
-        console.error('Error loading companies data:', error);
-        return [];
+        console.error('Error loading companies, staying with server pages:', error);
+        return;
     }
+    
+    // Keep at least as many rows as the server pages showed, and drop responses still on the way
+    renderLimit = Math.max(renderLimit, allCompaniesData.length);
+    allCompaniesData = [];
+    nextCursor = null;
+    listRequestId++;
+    
+    console.log('Loaded', companyStore.companies.size, 'companies at version', companyStore.version);
+    loadTagFacets();
+    redrawCompanies();
+}
+
+// Add the current batch to request parameters
+function withBatch(params) {
+    if (currentBatch) params.set('batch', currentBatch);
+    return params;
 }
 
-// Search and filter companies client-side
-function searchAndFilterCompanies(query = '', tags = '', tier = '') {
-    console.log('Filtering locally with params:', { query, tags, tier });
+// Fetch one page of the list from the server (in the server's tier/rank order)
+async function fetchCompaniesPage(cursor, tier) {
+    const params = withBatch(new URLSearchParams({ limit: pageSize }));
+    if (cursor) params.set('cursor', cursor);
+    if (tier) params.set('tier', tier);
     
-    if (!allCompaniesData || !allCompaniesData.length) {
-        console.error('No company data available for filtering');
+    const response = await fetch(`/api/companies?${params}`);
+    if (!response.ok) {
+        throw new Error(response.statusText);
+    }
+    return {
+        companies: await response.json(),
+        nextCursor: response.headers.get('X-Next-Cursor'),
+        version: parseInt(response.headers.get('X-Dataset-Version') || '0', 10)
+    };
+}
+
+// Show the "loading more" row only while there are more pages (or store rows not rendered yet)
+function updateLoadMoreSentinel() {
+    const sentinel = document.getElementById('loadMoreSentinel');
+    if (sentinel) {
+        sentinel.classList.toggle('hidden', !(nextCursor || moreRows));
+    }
+}
+
+// True when the end of the table is on (or close to) the screen
+function nearEndOfList() {
+    const sentinel = document.getElementById('loadMoreSentinel');
+    return sentinel && sentinel.getBoundingClientRect().top < window.innerHeight + 600;
+}
+
+// Append the next page of the list
+async function loadNextPage() {
+    // With the store, the next rows are already here
+    if (storeReady()) {
+        if (!moreRows) return;
+        renderLimit += pageSize;
+        redrawCompanies();
+        if (moreRows && nearEndOfList()) {
+            loadNextPage();
+        }
         return;
     }
     
-    // Convert to lowercase for case-insensitive search
-    const searchQuery = query.toLowerCase();
-    const tableBody = document.getElementById('companiesTableBody');
+    if (!nextCursor || loadingPage) return;
+    loadingPage = true;
     
-    // Filter companies based on search query, tag filter, and tier filter
-    const filteredCompanies = allCompaniesData.filter(company => {
-        // Always check if the company is matching the tier filter
-        if (tier && company.tier !== tier) {
-            return false;
-        }
+    const requestId = listRequestId;
+    let loaded = false;
+    try {
+        const page = await fetchCompaniesPage(nextCursor, currentFilters().tier);
+        if (requestId !== listRequestId) return;
         
-        // Check if the company has the selected tag
-        if (tags) {
-            if (!company.tags || !company.tags.includes(tags)) {
-                return false;
+        // Skip companies already listed (edits can move a company into a later page)
+        const listed = new Set(allCompaniesData.map(c => c.id));
+        const companies = page.companies.filter(c => !listed.has(c.id));
+        allCompaniesData.push(...companies);
+        nextCursor = page.nextCursor;
+        redrawCompanies();
+        loaded = true;
+        console.log('Loaded', allCompaniesData.length, 'companies');
+    } catch (error) {
+        console.error('Error loading more companies:', error);
+    } finally {
+        loadingPage = false;
+        updateLoadMoreSentinel();
+    }
+    
+    // A short page may leave the end of the list in view
+    if (loaded && nearEndOfList()) {
+        loadNextPage();
+    }
+}
+
+// Load further pages as the end of the table scrolls into view
+function setupInfiniteScroll() {
+    const sentinel = document.getElementById('loadMoreSentinel');
+    if (!sentinel) return;
+    
+    if (window.IntersectionObserver) {
+        const observer = new IntersectionObserver((entries) => {
+            if (entries.some(entry => entry.isIntersecting)) {
+                loadNextPage();
             }
-        }
+        }, { rootMargin: '600px' });
+        observer.observe(sentinel);
+    } else {
+        window.addEventListener('scroll', debounce(() => {
+            if (nearEndOfList()) loadNextPage();
+        }, 100));
+    }
+}
+
+// Search and filter companies: in the local store once it is ready, on the server before that.
+// On the server a text query or tag filter shows all matches from /api/search; otherwise the
+// paged list is reloaded
+async function searchAndFilterCompanies(query = '', tags = '', tier = '') {
+    const requestId = ++listRequestId;
+    
+    if (storeReady()) {
+        // The list is filtered from the indexes in memory, so this runs on every keystroke
+        renderLimit = pageSize;
+        redrawCompanies();
         
-        // If we have a search query, check for matches
-        if (searchQuery) {
-            // Check company name
-            if (company.name.toLowerCase().includes(searchQuery)) {
-                return true;
-            }
-            
-            // Check company description
-            if (company.description && company.description.toLowerCase().includes(searchQuery)) {
-                return true;
+        if (query.trim() && companyStore.query({ query, tags, tier }).length === 0) {
+            loadFuzzyMatches(query, tags, requestId);
+        }
+        return;
+    }
+    
+    console.log('Filtering with params:', { query, tags, tier });
+    try {
+        let companies;
+        let cursor = null;
+        if (query.trim() || tags) {
+            const params = withBatch(new URLSearchParams({ query, tags }));
+            const response = await fetch(`/api/search?${params}`);
+            if (!response.ok) {
+                throw new Error(response.statusText);
             }
-            
-            // Check founders
-            if (company.founders && Array.isArray(company.founders)) {
-                const foundersMatch = company.founders.some(founder => {
-                    if (typeof founder === 'object') {
-                        const founderName = founder.name ? founder.name.toLowerCase() : '';
-                        return founderName.includes(searchQuery);
-                    } else if (typeof founder === 'string') {
-                        return founder.toLowerCase().includes(searchQuery);
-                    }
-                    return false;
-                });
-                
-                if (foundersMatch) {
-                    return true;
-                }
+            companies = await response.json();
+            if (tier) {
+                companies = companies.filter(company => company.tier === tier);
             }
-            
-            // No match found
-            return false;
+        } else {
+            const page = await fetchCompaniesPage(null, tier);
+            companies = page.companies;
+            cursor = page.nextCursor;
+            datasetVersion = Math.max(datasetVersion, page.version);
         }
+        if (requestId !== listRequestId) return;
         
-        // If we don't have a search query, include all companies
-        return true;
-    });
-    
-    console.log('Found', filteredCompanies.length, 'companies matching criteria');
-    
-    // Sort companies by tier first, then by rank
-    const sortedCompanies = [...filteredCompanies].sort((a, b) => {
-        // First sort by tier - A is better than B is better than C, etc.
-        function getTierIndex(tier) {
-            switch (tier) {
-                case 'A': return 0;
-                case 'B': return 1;
-                case 'C': return 2;
-                case 'D': return 3;
-                default: return 4;
-            }
+        console.log('Found', companies.length, 'companies matching criteria');
+        allCompaniesData = companies;
+        nextCursor = cursor;
+        redrawCompanies();
+    } catch (error) {
+        console.error('Error filtering companies:', error);
+    } finally {
+        updateLoadMoreSentinel();
+    }
+}
+
+// Ask the server for typo-tolerant matches (typing pauses first, as with server search)
+const loadFuzzyMatches = debounce(async (query, tags, requestId) => {
+    try {
+        const params = withBatch(new URLSearchParams({ query, tags, mode: 'fuzzy' }));
+        const response = await fetch(`/api/search?${params}`);
+        if (!response.ok) {
+            throw new Error(response.statusText);
         }
+        const matches = await response.json();
+        if (requestId !== listRequestId) return;
         
-        const tierDiff = getTierIndex(a.tier) - getTierIndex(b.tier);
-        if (tierDiff !== 0) return tierDiff;
+        fuzzyMatches = { query, tags, ids: matches.map(company => company.id) };
+        redrawCompanies();
+    } catch (error) {
+        console.error('Error loading fuzzy matches:', error);
+    }
+}, 300);
+
+// Companies to list for the current filters, in display order (compareCompanies is in store.js)
+function visibleCompanies() {
+    if (storeReady()) {
+        const filters = currentFilters();
+        const companies = companyStore.query(filters);
         
-        // Within same tier, sort by rank (lower is better)
-        return a.rank - b.rank;
-    });
+        // Nothing contains the text: show the server's fuzzy matches instead, best first
+        if (companies.length === 0 && fuzzyMatches && fuzzyMatches.query === filters.query && fuzzyMatches.tags === filters.tags) {
+            return fuzzyMatches.ids
+                .map(id => companyStore.get(id))
+                .filter(company => company && (!filters.tier || company.tier === filters.tier));
+        }
+        return companies;
+    }
+    
+    // Edits can take a company out of the current tier/tag filter
+    const { tags, tier } = currentFilters();
+    return allCompaniesData.filter(company => {
+        if (tier && company.tier !== tier) return false;
+        if (tags && !(company.tags || []).includes(tags)) return false;
+        return true;
+    }).sort(compareCompanies);
+}
+
+// Re-sort and redraw the listed companies after local edits or live updates
+function redrawCompanies() {
+    let companies = visibleCompanies();
+    
+    // Only the first renderLimit rows of the store's list are in the table
+    moreRows = storeReady() && companies.length > renderLimit;
+    if (moreRows) {
+        companies = companies.slice(0, renderLimit);
+    }
     
-    // Render the filtered and sorted companies
-    renderCompanyRows(sortedCompanies, tableBody);
+    renderCompanyRows(companies, document.getElementById('companiesTableBody'));
+    updateLoadMoreSentinel();
+}
+
+// Attributes that mark a LinkedIn link the last enrichment run found broken (see enrich.py)
+function brokenLinkAttrs(company, url) {
+    if (!company || !company.linkedin_status || company.linkedin_status[url] !== 'broken') return '';
+    return ' title="This link looked broken at the last check" style="opacity: 0.5; text-decoration: line-through;"';
 }
 
 // Helper function to render founders list
-function renderFounders(founders) {
+function renderFounders(founders, company) {
     if (!founders || !Array.isArray(founders) || founders.length === 0) {
         return '<span class="text-gray-500">No founder info</span>';
     }
@@ -583,7 +827,7 @@ function renderFounders(founders) {
                 <span class="text-sm text-gray-300">${founderName}</span>`;
                 
             if (linkedin) {
-                html += `<a href="${linkedin}" target="_blank" class="ml-2 text-blue-500 hover:text-blue-400">
+                html += `<a href="${linkedin}" target="_blank" class="ml-2 text-blue-500 hover:text-blue-400"${brokenLinkAttrs(company, linkedin)}>
                     <i class="fab fa-linkedin text-xs"></i>
                 </a>`;
             }
@@ -624,37 +868,142 @@ function debounce(func, wait) {
     };
 }
 
-// Fetch and update companies data
+// Fetch and update companies data (syncs the store, or reloads the first page for the current filters)
 async function fetchAndUpdateCompanies() {
-    await loadAllCompaniesData();
+    if (storeReady()) {
+        try {
+            await companyStore.sync();
+        } catch (error) {
+            console.error('Error syncing companies:', error);
+        }
+        scheduleRedraw(true);
+        return;
+    }
+    
+    const { query, tags, tier } = currentFilters();
+    await searchAndFilterCompanies(query, tags, tier);
+}
+
+// Redraw at most once per animation frame when several live updates arrive together
+let redrawScheduled = false;
+let tagsChanged = false;
+function scheduleRedraw(reloadTags) {
+    tagsChanged = tagsChanged || reloadTags;
+    if (redrawScheduled) return;
+    redrawScheduled = true;
+    
+    requestAnimationFrame(() => {
+        redrawScheduled = false;
+        if (tagsChanged) {
+            tagsChanged = false;
+            loadTagFacets();
+        }
+        
+        redrawCompanies();
+    });
+}
+
+// Apply one delta pushed by the server
+function applyChange(change) {
+    // The store fetches the changed records itself (a burst of changes costs one or two requests)
+    if (storeReady()) {
+        if (change.version > companyStore.version) {
+            fetchAndUpdateCompanies();
+        }
+        return;
+    }
+    
+    // Already applied (e.g. replayed after a reconnect)
+    if (change.version <= datasetVersion) return;
+    datasetVersion = change.version;
+    
+    // Whole-dataset change (reload): fetch the list again, unless another batch was loaded
+    if (change.company_id === null) {
+        const batch = (change.changes || {}).batch;
+        if (batch && batch !== currentBatch) return;
+        fetchAndUpdateCompanies();
+        return;
+    }
+    
+    const company = allCompaniesData.find(c => c.id === change.company_id);
+    if (!company) return;
+    
+    const fields = change.changes || {};
+    const updates = {};
+    if ('votes' in fields) {
+        updates.votes = fields.votes;
+        updates.rank = fields.votes;
+    }
+    if ('tier' in fields) {
+        updates.tier = fields.tier;
+    }
+    if ('tags' in fields) {
+        updates.tags = fields.tags;
+    }
+    if (Object.keys(updates).length === 0) return;
+    updateCompany(company.id, updates);
     
-    // Apply current filters
-    const searchQuery = document.getElementById('searchInput')?.value || '';
-    const tagFilter = document.getElementById('tagFilterSelect')?.value || '';
-    const tierFilter = document.getElementById('tierFilterSelect')?.value || '';
-    searchAndFilterCompanies(searchQuery, tagFilter, tierFilter);
+    // Rows with an open rank input are left as they are until the next redraw
+    scheduleRedraw('tags' in fields);
+}
+
+// Subscribe to live updates; the browser resumes from the last event id on reconnect
+function connectLiveUpdates() {
+    if (!window.EventSource) return;
+    
+    const source = new EventSource(`/api/stream?since=${datasetVersion}`);
+    
+    source.addEventListener('change', (event) => {
+        applyChange(JSON.parse(event.data));
+    });
+    
+    // Sent when the server can't replay the missed changes: reload everything
+    source.addEventListener('reset', (event) => {
+        const data = JSON.parse(event.data);
+        if (data.version !== (storeReady() ? companyStore.version : datasetVersion)) {
+            fetchAndUpdateCompanies();
+        }
+    });
+    
+    source.onerror = () => {
+        console.log('Live updates disconnected, reconnecting...');
+    };
 }
 
 // Load initial data and set up event listeners when the DOM is loaded
 document.addEventListener('DOMContentLoaded', async () => {
-    // Load all companies on initial page load
-    await loadAllCompaniesData();
+    // Take over the first page rendered by the server and load the tag filter options
+    loadInitialPage();
+    loadTagFacets();
+    
+    // Initialize the table with the first page; later pages load on scroll
+    redrawCompanies();
+    setupInfiniteScroll();
     
-    // Initialize the table with all companies
-    const tableBody = document.getElementById('companiesTableBody');
-    renderCompanyRows(allCompaniesData, tableBody);
+    // Keep the table in sync with edits from other browsers
+    connectLiveUpdates();
     
-    // Set up search input with debouncing
+    // Load the whole batch into the local store (from IndexedDB plus a delta when possible)
+    openCompanyStore();
+    
+    // Set up search input: filtered locally on every keystroke, debounced while the server searches
     const searchInput = document.getElementById('searchInput');
     if (searchInput) {
-        const debouncedSearch = debounce((event) => {
+        const search = (event) => {
             const query = event.target.value;
             const tagFilter = document.getElementById('tagFilterSelect')?.value || '';
             const tierFilter = document.getElementById('tierFilterSelect')?.value || '';
             searchAndFilterCompanies(query, tagFilter, tierFilter);
-        }, 300);
+        };
+        const debouncedSearch = debounce(search, 300);
         
-        searchInput.addEventListener('input', debouncedSearch);
+        searchInput.addEventListener('input', (event) => {
+            if (storeReady()) {
+                search(event);
+            } else {
+                debouncedSearch(event);
+            }
+        });
     }
     
     // Set up tag filter
@@ -0,0 +1,287 @@
+// Local copy of one batch's companies for app.js: indexed so filtering runs as you type,
+// persisted to IndexedDB and kept current with deltas from /api/companies/changes
+
+// IndexedDB database: a "companies" store (records of every batch, keyed by id) and a
+// "sync" store with the dataset version the records of each batch reflect
+const STORE_DB_NAME = 'yc-explorer';
+const STORE_DB_VERSION = 1;
+
+// Changed records are written to IndexedDB this long after the last change
+const PERSIST_DELAY_MS = 500;
+
+// Identifies this tab's writes in the sync store (see persist)
+const STORE_WRITER_ID = `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+
+// Compare companies the way the server orders them: tier, then rank (unranked last), then id
+function compareCompanies(a, b) {
+    const tierA = a.tier || '';
+    const tierB = b.tier || '';
+    if (tierA !== tierB) return tierA < tierB ? -1 : 1;
+
+    const rankA = a.rank > 0 ? a.rank : Infinity;
+    const rankB = b.rank > 0 ? b.rank : Infinity;
+    if (rankA !== rankB) return rankA < rankB ? -1 : 1;
+
+    return a.id - b.id;
+}
+
+// Lowercased text a search query is matched against (the server's search index fields, except the
+// website text, which isn't sent to clients); joined with newlines, which a query from the search box can't contain
+function searchKey(company) {
+    const texts = [company.name || ''];
+    (company.founders || []).forEach(founder => {
+        if (founder && typeof founder.name === 'string') texts.push(founder.name);
+    });
+    texts.push(company.short_description || '');
+    texts.push(...(company.tags || []));
+    return texts.join('\n').toLowerCase();
+}
+
+// Promise for an IndexedDB request
+function idbRequest(request) {
+    return new Promise((resolve, reject) => {
+        request.onsuccess = () => resolve(request.result);
+        request.onerror = () => reject(request.error);
+    });
+}
+
+class CompanyStore {
+    constructor(batch) {
+        this.batch = batch;
+        // Change log version the records reflect; only advanced by data from the server
+        this.version = 0;
+        // True once the whole batch is in memory
+        this.ready = false;
+
+        // Records are replaced, never mutated, so a changed record is a new object
+        this.companies = new Map();
+        this.searchKeys = new Map();
+        this.tagIndex = new Map();
+        this.sortedIds = null;
+
+        this.db = null;
+        this.dirty = new Set();
+        this.fullWrite = false;
+        this.persistTimer = null;
+        this.syncPromise = null;
+        this.resyncRequested = false;
+    }
+
+    // Add or replace one record and update the indexes
+    put(company) {
+        this.unindexTags(company.id);
+        this.companies.set(company.id, company);
+        this.searchKeys.set(company.id, searchKey(company));
+        (company.tags || []).forEach(tag => {
+            if (!this.tagIndex.has(tag)) this.tagIndex.set(tag, new Set());
+            this.tagIndex.get(tag).add(company.id);
+        });
+        this.sortedIds = null;
+        this.dirty.add(company.id);
+    }
+
+    unindexTags(companyId) {
+        const old = this.companies.get(companyId);
+        if (!old) return;
+        (old.tags || []).forEach(tag => {
+            const ids = this.tagIndex.get(tag);
+            if (!ids) return;
+            ids.delete(companyId);
+            if (ids.size === 0) this.tagIndex.delete(tag);
+        });
+    }
+
+    // Apply fields of a local edit; returns the new record (undefined for unknown ids)
+    update(companyId, fields) {
+        const company = this.companies.get(companyId);
+        if (!company) return undefined;
+        const updated = { ...company, ...fields };
+        this.put(updated);
+        this.schedulePersist();
+        return updated;
+    }
+
+    // Replace every record (whole-list load)
+    replaceAll(companies, version) {
+        this.companies = new Map();
+        this.searchKeys = new Map();
+        this.tagIndex = new Map();
+        companies.forEach(company => this.put(company));
+        this.version = version;
+        this.fullWrite = true;
+        this.schedulePersist();
+    }
+
+    get(companyId) {
+        return this.companies.get(companyId);
+    }
+
+    // Companies matching the search text, tag and tier filters, in display order
+    query({ query = '', tags = '', tier = '' } = {}) {
+        const text = query.trim().toLowerCase();
+        const tagged = tags ? this.tagIndex.get(tags) : null;
+        if (tags && !tagged) return [];
+
+        if (!this.sortedIds) {
+            this.sortedIds = Array.from(this.companies.values()).sort(compareCompanies).map(company => company.id);
+        }
+
+        const result = [];
+        for (const id of this.sortedIds) {
+            if (tagged && !tagged.has(id)) continue;
+            const company = this.companies.get(id);
+            if (tier && company.tier !== tier) continue;
+            if (text && !this.searchKeys.get(id).includes(text)) continue;
+            result.push(company);
+        }
+        return result;
+    }
+
+    // Tag facet counts, most used first (same order as /api/tags)
+    tagFacets() {
+        return Array.from(this.tagIndex, ([tag, ids]) => ({ tag, count: ids.size }))
+            .sort((a, b) => b.count - a.count || (a.tag < b.tag ? -1 : a.tag > b.tag ? 1 : 0));
+    }
+
+    // Load the batch: records saved by an earlier visit plus a delta, or the whole list
+    async open() {
+        try {
+            this.db = await this.openDatabase();
+            if (this.db) await this.loadPersisted();
+        } catch (error) {
+            console.error('Error reading saved companies:', error);
+            this.db = null;
+        }
+
+        try {
+            await this.sync();
+        } catch (error) {
+            // Saved records are still usable; the next change event syncs again
+            if (this.companies.size === 0) throw error;
+            console.error('Error syncing companies:', error);
+        }
+        this.ready = true;
+    }
+
+    // Open (and on first use create) the IndexedDB database; null where IndexedDB is unavailable
+    openDatabase() {
+        if (!window.indexedDB) return Promise.resolve(null);
+
+        const request = indexedDB.open(STORE_DB_NAME, STORE_DB_VERSION);
+        request.onupgradeneeded = () => {
+            const db = request.result;
+            const companies = db.createObjectStore('companies', { keyPath: 'id' });
+            companies.createIndex('batch', 'batch');
+            db.createObjectStore('sync', { keyPath: 'batch' });
+        };
+        return idbRequest(request);
+    }
+
+    // Read this batch's saved records and version
+    async loadPersisted() {
+        const transaction = this.db.transaction(['companies', 'sync'], 'readonly');
+        const [state, companies] = await Promise.all([
+            idbRequest(transaction.objectStore('sync').get(this.batch)),
+            idbRequest(transaction.objectStore('companies').index('batch').getAll(this.batch))
+        ]);
+        if (!state) return;
+
+        companies.forEach(company => this.put(company));
+        this.dirty.clear();
+        this.version = state.version;
+    }
+
+    // Bring the records up to date; calls made while a sync runs are folded into one more round
+    sync() {
+        if (this.syncPromise) {
+            this.resyncRequested = true;
+            return this.syncPromise;
+        }
+        this.syncPromise = (async () => {
+            do {
+                this.resyncRequested = false;
+                await this.fetchChanges();
+            } while (this.resyncRequested);
+        })().finally(() => {
+            this.syncPromise = null;
+        });
+        return this.syncPromise;
+    }
+
+    // Apply the delta since our version, or load the whole list if the server can't give one
+    async fetchChanges() {
+        if (this.companies.size > 0) {
+            const params = new URLSearchParams({ since: this.version, batch: this.batch });
+            const response = await fetch(`/api/companies/changes?${params}`);
+            if (!response.ok) {
+                throw new Error(response.statusText);
+            }
+            const delta = await response.json();
+            if (!delta.reset) {
+                delta.companies.forEach(company => this.put(company));
+                this.version = Math.max(this.version, delta.version);
+                this.schedulePersist();
+                return;
+            }
+        }
+
+        const response = await fetch(`/api/companies?${new URLSearchParams({ batch: this.batch })}`);
+        if (!response.ok) {
+            throw new Error(response.statusText);
+        }
+        const companies = await response.json();
+        this.replaceAll(companies, parseInt(response.headers.get('X-Dataset-Version') || '0', 10));
+    }
+
+    schedulePersist() {
+        if (!this.db || this.persistTimer) return;
+        this.persistTimer = setTimeout(() => {
+            this.persistTimer = null;
+            this.persist().catch(error => console.error('Error saving companies:', error));
+        }, PERSIST_DELAY_MS);
+    }
+
+    // Write changed records and the version in one transaction. If another tab wrote this
+    // batch since our last write, its records may be older or newer than our version says,
+    // so the whole batch is written instead of the changed records.
+    persist() {
+        const ids = this.fullWrite ? null : this.dirty;
+        this.dirty = new Set();
+        this.fullWrite = false;
+
+        return new Promise((resolve, reject) => {
+            const transaction = this.db.transaction(['companies', 'sync'], 'readwrite');
+            const companies = transaction.objectStore('companies');
+            const syncStore = transaction.objectStore('sync');
+            transaction.oncomplete = () => resolve();
+            transaction.onerror = () => reject(transaction.error);
+
+            const writeAll = () => {
+                // Delete records dropped from the batch, then write every current one
+                const cursorRequest = companies.index('batch').openKeyCursor(IDBKeyRange.only(this.batch));
+                cursorRequest.onsuccess = () => {
+                    const cursor = cursorRequest.result;
+                    if (cursor) {
+                        if (!this.companies.has(cursor.primaryKey)) companies.delete(cursor.primaryKey);
+                        cursor.continue();
+                    } else {
+                        this.companies.forEach(company => companies.put(company));
+                    }
+                };
+            };
+
+            syncStore.get(this.batch).onsuccess = (event) => {
+                const state = event.target.result;
+                if (ids === null || (state && state.writer !== STORE_WRITER_ID)) {
+                    writeAll();
+                } else {
+                    ids.forEach(id => {
+                        const company = this.companies.get(id);
+                        if (company) companies.put(company);
+                    });
+                }
+                syncStore.put({ batch: this.batch, version: this.version, writer: STORE_WRITER_ID });
+            };
+        });
+    }
+}
@@ -0,0 +1,232 @@
+# Concurrent writes and index rebuilds through the app against a throwaway SQLite database.
+#
+#   python -m pytest tests/test_concurrency.py
+#
+# Writes made by "another worker" go straight to the database (rows plus a
+# change log entry), so this worker's cached snapshot is stale, as it is in
+# production between TTL refreshes.
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+TMP_DIR = tempfile.mkdtemp(prefix="concurrency-test-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TMP_DIR, 'test.db')}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import insert, select  # noqa: E402
+
+import database  # noqa: E402
+import main  # noqa: E402
+
+JSON = {"accept": "application/json"}
+THREADS = 8
+
+
+def setUpModule():
+    global client
+    client = TestClient(main.app)
+    client.__enter__()
+
+
+def tearDownModule():
+    client.__exit__(None, None, None)
+    shutil.rmtree(TMP_DIR, ignore_errors=True)
+
+
+def run_concurrently(calls):
+    """Run the calls from THREADS threads; returns their results in order"""
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        return list(pool.map(lambda call: call(), calls))
+
+
+class ConcurrencyTest(unittest.TestCase):
+    def setUp(self):
+        companies = client.get('/api/companies').json()
+        self.company_id = companies[self.company_index]['id']
+
+    def db_company(self):
+        with database.SessionLocal() as db:
+            company = db.get(database.Company, self.company_id)
+            return company.votes, [row.tag for row in company.tag_rows]
+
+    def db_tags(self):
+        return self.db_company()[1]
+
+    def cached(self):
+        """This worker's snapshot of the company, brought up to date first"""
+        client.get('/api/companies')
+        return main.company_cache.get(self.company_id)
+
+    def last_logged(self):
+        with database.SessionLocal() as db:
+            table = database.CompanyChange.__table__
+            changes = db.execute(
+                select(table.c.changes).where(table.c.company_id == self.company_id).order_by(table.c.id.desc())
+            ).scalars().first()
+            return json.loads(changes)
+
+    def other_worker_adds_tag(self, tag):
+        """Add a tag the way another worker would, without touching this worker's cache"""
+        with database.SessionLocal() as db:
+            position = len(db.get(database.Company, self.company_id).tag_rows)
+            db.execute(insert(database.CompanyTag.__table__).values(company_id=self.company_id, tag=tag, position=position))
+            tags = [row.tag for row in db.get(database.Company, self.company_id).tag_rows]
+            db.execute(insert(database.CompanyChange.__table__).values(
+                company_id=self.company_id, changes=json.dumps({"tags": tags})
+            ))
+            db.commit()
+
+
+class VoteTest(ConcurrencyTest):
+    company_index = 0
+
+    def test_concurrent_votes(self):
+        client.post(f'/update_rank/{self.company_id}', data={'rank': 500}, headers=JSON)
+        upvotes, downvotes = 60, 20
+        calls = ([lambda: client.post(f'/upvote/{self.company_id}', headers=JSON)] * upvotes
+                 + [lambda: client.post(f'/downvote/{self.company_id}', headers=JSON)] * downvotes)
+        responses = run_concurrently(calls)
+
+        self.assertTrue(all(response.status_code == 200 for response in responses))
+        votes, _ = self.db_company()
+        self.assertEqual(votes, 500 + upvotes - downvotes)
+        self.assertEqual(self.cached()['votes'], votes)
+        self.assertEqual(self.cached()['rank'], votes)
+
+    def test_concurrent_ranks(self):
+        responses = run_concurrently([
+            (lambda rank=rank: client.post(f'/update_rank/{self.company_id}', data={'rank': rank}, headers=JSON))
+            for rank in range(1, 41)
+        ])
+        # Whichever write committed last wins, in the database and in the cache
+        last = max(responses, key=lambda response: response.json()['version']).json()['rank']
+        self.assertEqual(self.db_company()[0], last)
+        self.assertEqual(self.cached()['votes'], last)
+
+
+class TagTest(ConcurrencyTest):
+    company_index = 1
+
+    def setUp(self):
+        super().setUp()
+        for tag in self.db_tags():
+            client.delete(f'/api/tags/{self.company_id}/0', params={'tag': tag})
+
+    def test_concurrent_tag_adds(self):
+        tags = [f"tag{n}" for n in range(24)]
+        responses = run_concurrently([
+            (lambda tag=tag: client.post(f'/api/tags/{self.company_id}', data={'tag': tag})) for tag in tags
+        ])
+
+        self.assertTrue(all(response.json()['success'] for response in responses))
+        stored = self.db_tags()
+        self.assertEqual(sorted(stored), sorted(tags))
+        self.assertEqual(self.last_logged(), {"tags": stored})
+        self.assertEqual(self.cached()['tags'], stored)
+
+    def test_concurrent_tag_removes(self):
+        tags = [f"tag{n}" for n in range(12)]
+        for tag in tags:
+            client.post(f'/api/tags/{self.company_id}', data={'tag': tag})
+        run_concurrently([
+            (lambda tag=tag: client.delete(f'/api/tags/{self.company_id}/0', params={'tag': tag})) for tag in tags[::2]
+        ])
+
+        self.assertEqual(self.db_tags(), tags[1::2])
+        self.assertEqual(self.last_logged(), {"tags": tags[1::2]})
+        self.assertEqual(self.cached()['tags'], tags[1::2])
+
+    def test_add_after_another_worker(self):
+        # Lost update: this worker's snapshot doesn't have "x" yet
+        self.other_worker_adds_tag("x")
+        response = client.post(f'/api/tags/{self.company_id}', data={'tag': 'y'}).json()
+
+        self.assertEqual(response['tags'], ['x', 'y'])
+        self.assertEqual(self.db_tags(), ['x', 'y'])
+        self.assertEqual(self.last_logged(), {"tags": ['x', 'y']})
+        self.assertEqual(main.company_cache.get(self.company_id)['tags'], ['x', 'y'])
+
+    def test_remove_after_another_worker(self):
+        client.post(f'/api/tags/{self.company_id}', data={'tag': 'y'})
+        self.other_worker_adds_tag("x")
+        # The client saw ['y'] and removes "y": the tag it saw, not whatever is at index 0 now
+        response = client.delete(f'/api/tags/{self.company_id}/0', params={'tag': 'y'}).json()
+
+        self.assertEqual(response['removed'], 'y')
+        self.assertEqual(self.db_tags(), ['x'])
+        self.assertEqual(self.last_logged(), {"tags": ['x']})
+        self.assertEqual(self.cached()['tags'], ['x'])
+
+    def test_batch_after_another_worker(self):
+        self.other_worker_adds_tag("x")
+        response = client.post('/api/batch', json={"operations": [
+            {"op": "add_tag", "company_id": self.company_id, "tag": "y"},
+            {"op": "add_tag", "company_id": self.company_id, "tag": "z"},
+            {"op": "remove_tag", "company_id": self.company_id, "tag": "y"},
+        ]}).json()
+
+        self.assertTrue(response['success'])
+        self.assertEqual([result['tags'] for result in response['results']], [['x', 'y'], ['x', 'y', 'z'], ['x', 'z']])
+        self.assertEqual(self.db_tags(), ['x', 'z'])
+        self.assertEqual(self.last_logged(), {"tags": ['x', 'z']})
+        self.assertEqual(main.company_cache.get(self.company_id)['tags'], ['x', 'z'])
+
+    def test_concurrent_batches(self):
+        tags = [f"batch{n}" for n in range(16)]
+        run_concurrently([
+            (lambda tag=tag: client.post('/api/batch', json={"operations": [
+                {"op": "add_tag", "company_id": self.company_id, "tag": tag},
+                {"op": "upvote", "company_id": self.company_id},
+            ]})) for tag in tags
+        ])
+
+        stored = self.db_tags()
+        self.assertEqual(sorted(stored), sorted(tags))
+        self.assertEqual(self.last_logged()["tags"], stored)
+        self.assertEqual(self.cached()['tags'], stored)
+
+
+class SearchRebuildTest(ConcurrencyTest):
+    company_index = 2
+
+    def setUp(self):
+        super().setUp()
+        self.name = client.get('/api/companies').json()[self.company_index]['name']
+
+    def search(self, **headers):
+        return client.get('/api/search', params={'query': self.name}, headers=headers)
+
+    def test_no_etag_while_index_rebuilds(self):
+        fresh = self.search()
+        self.assertIn('etag', fresh.headers)
+
+        async def still_running(companies, generation):
+            pass
+
+        # Reloaded snapshot; the search index is the previous one until its rebuild swaps in
+        main.company_cache.invalidate()
+        with mock.patch.object(main, 'rebuild_search_index', still_running):
+            response = self.search()
+            self.assertNotEqual(main.search_index.generation, main.company_cache.generation)
+            self.assertNotIn('etag', response.headers)
+            self.assertNotIn('last-modified', response.headers)
+            self.assertEqual(response.headers['cache-control'], 'no-store')
+            # A copy that is current for this version still revalidates
+            self.assertEqual(self.search(**{'if-none-match': fresh.headers['etag']}).status_code, 304)
+
+        for _ in range(50):
+            response = self.search()
+            if 'etag' in response.headers:
+                break
+            time.sleep(0.1)
+        self.assertEqual(response.headers['etag'], fresh.headers['etag'])
+        self.assertEqual(response.headers['cache-control'], 'no-cache')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+# Offline tests for enrich.py against a local HTTP stub server.
+#
+#   python -m pytest tests/test_enrich.py
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import enrich
+
+RATE = 20.0  # Requests per second the tests allow per host
+
+PAGE = b"<html><body><h1>Acme</h1><p>We build   quantum widgets.</p></body></html>"
+SHARED_PAGE = b"<html><body><p>One page served at two URLs.</p></body></html>"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Canned answers by path; every request is recorded on the server"""
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            count = server.hits[self.path] = server.hits.get(self.path, 0) + 1
+            server.times.append(time.monotonic())
+        if self.path == '/flaky' and count == 1:
+            return self.send_error(503)
+        if self.path == '/limited' and count == 1:
+            self.send_response(429)
+            self.send_header('Retry-After', '0')
+            self.end_headers()
+            return
+        if self.path in ('/down', '/in/down'):
+            return self.send_error(500)
+        if self.path == '/in/gone':
+            return self.send_error(404)
+        if self.path == '/in/blocked':
+            # LinkedIn's answer to automated requests
+            return self.send_error(999)
+        body = SHARED_PAGE if self.path in ('/shared-a', '/shared-b') else PAGE
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def strip_tags(body: bytes, url: str) -> str:
+    """Stand-in for the trafilatura extractor: the page's text with tags removed"""
+    return enrich.WHITESPACE_RE.sub(' ', re.sub(r'<[^>]+>', ' ', body.decode('utf-8'))).strip()
+
+
+class EnrichTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.server.lock = threading.Lock()
+        self.server.hits = {}
+        self.server.times = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_port}"
+        self.cache_dir = tempfile.mkdtemp(prefix="enrich-test-")
+        self.cache = enrich.FetchCache(self.cache_dir, ttl=3600)
+        self.extracted = []
+        # Retries shouldn't slow the tests down
+        patcher = mock.patch.object(enrich, 'RETRY_BACKOFF', 0.01)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def company(self, company_id, path, linkedins=()):
+        founders = [{'name': f"Founder {n}", 'linkedin': self.base + link} for n, link in enumerate(linkedins)]
+        return {'id': company_id, 'website': self.base + path, 'company_linkedin': None, 'founders': founders}
+
+    def extract(self, body: bytes, url: str) -> str:
+        self.extracted.append(url)
+        return strip_tags(body, url)
+
+    def enrich(self, companies, **kwargs):
+        kwargs.setdefault('rate', RATE)
+        kwargs.setdefault('retries', 2)
+        return enrich.enrich_companies(companies, self.cache, extract=self.extract, **kwargs)
+
+    def test_site_text_and_retries(self):
+        companies = [self.company(1, '/ok'), self.company(2, '/flaky'), self.company(3, '/limited'),
+                     self.company(4, '/down'), {'id': 5, 'website': '', 'founders': []}]
+        results = self.enrich(companies, check_links=False)
+
+        self.assertEqual(results[1]['site_text'], "Acme We build quantum widgets.")
+        # 503 and 429 (with Retry-After) succeed on the second attempt
+        self.assertEqual(results[2]['site_text'], results[1]['site_text'])
+        self.assertEqual(results[3]['site_text'], results[1]['site_text'])
+        self.assertEqual(self.server.hits['/flaky'], 2)
+        self.assertEqual(self.server.hits['/limited'], 2)
+        # Still failing after the retries: keep whatever was stored before
+        self.assertIsNone(results[4]['site_text'])
+        self.assertEqual(self.server.hits['/down'], 3)
+        # No website: no text
+        self.assertEqual(results[5]['site_text'], '')
+        self.assertIsNone(results[1]['linkedin_status'])
+
+    def test_linkedin_status(self):
+        companies = [self.company(1, '/ok', ['/in/ok', '/in/gone', '/in/blocked', '/in/down'])]
+        status = self.enrich(companies)[1]['linkedin_status']
+
+        self.assertEqual(status, {
+            self.base + '/in/ok': 'ok',
+            self.base + '/in/gone': 'broken',
+            self.base + '/in/blocked': 'unknown',
+            self.base + '/in/down': 'unknown',
+        })
+        # Final answers aren't retried; 5xx is
+        self.assertEqual(self.server.hits['/in/gone'], 1)
+        self.assertEqual(self.server.hits['/in/blocked'], 1)
+        self.assertEqual(self.server.hits['/in/down'], 3)
+
+    def test_rate_limit(self):
+        companies = [self.company(n, f'/page{n}') for n in range(8)]
+        self.enrich(companies, concurrency=8, check_links=False)
+
+        times = sorted(self.server.times)
+        self.assertEqual(len(times), 8)
+        gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+        # All on one host, so never more than RATE requests a second despite 8 threads
+        self.assertGreater(min(gaps), 0.8 / RATE)
+        self.assertGreater(times[-1] - times[0], 7 * 0.8 / RATE)
+
+    def test_content_addressed_cache(self):
+        companies = [self.company(1, '/shared-a'), self.company(2, '/shared-b')]
+        results = self.enrich(companies, check_links=False)
+
+        self.assertEqual(results[1]['site_text'], "One page served at two URLs.")
+        self.assertEqual(results[2]['site_text'], results[1]['site_text'])
+        # Two URL entries point at one stored body, extracted once
+        entries = [self.cache.get(self.base + path) for path in ('/shared-a', '/shared-b')]
+        self.assertEqual(entries[0]['content'], entries[1]['content'])
+        bodies = [name for _, _, files in os.walk(os.path.join(self.cache_dir, 'objects'))
+                  for name in files if name.endswith('.body')]
+        self.assertEqual(len(bodies), 1)
+        self.assertEqual(len(self.extracted), 1)
+
+    def test_second_run_uses_cache(self):
+        companies = [self.company(1, '/ok', ['/in/ok', '/in/gone']), self.company(2, '/flaky')]
+        first = self.enrich(companies)
+        hits = dict(self.server.hits)
+        extracted = len(self.extracted)
+
+        second = self.enrich(companies)
+        self.assertEqual(second, first)
+        self.assertEqual(self.server.hits, hits)
+        self.assertEqual(len(self.extracted), extracted)
+
+        # --force fetches again
+        self.enrich(companies, force=True)
+        self.assertEqual(self.server.hits['/ok'], hits['/ok'] + 1)
+
+    def test_evict(self):
+        self.enrich([self.company(1, '/ok')], check_links=False)
+        expired = enrich.FetchCache(self.cache_dir, ttl=0)
+        self.assertFalse(expired.is_fresh(expired.get(self.base + '/ok')))
+        # One URL entry, plus the body and its extracted text
+        self.assertEqual(expired.evict(), (1, 2))
+        self.assertIsNone(expired.get(self.base + '/ok'))
+
+
+if __name__ == "__main__":
+    unittest.main()
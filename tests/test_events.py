@@ -0,0 +1,55 @@
+# Tests for the SSE change broadcaster against an in-memory change log.
+#
+#   python -m pytest tests/test_events.py
+import asyncio
+import unittest
+
+import events
+
+
+class ChangeLog:
+    """Stand-in for the company_changes table"""
+
+    def __init__(self, count):
+        self.changes = [{"version": version} for version in range(1, count + 1)]
+
+    def commit(self):
+        self.changes.append({"version": len(self.changes) + 1})
+
+    async def fetch_changes(self, since, limit):
+        return self.changes[since:since + limit]
+
+    async def fetch_version(self):
+        return len(self.changes)
+
+
+class BroadcasterTest(unittest.IsolatedAsyncioTestCase):
+    async def test_poller_starts_from_replayed_version(self):
+        log = ChangeLog(3)
+        broadcaster = events.ChangeBroadcaster(log.fetch_changes, log.fetch_version)
+        queue = broadcaster.subscribe()
+        self.assertEqual(await broadcaster.replay(1), [{"version": 2}, {"version": 3}])
+        # Committed after the replay, before the poller first reads the log
+        log.commit()
+
+        self.assertEqual(await asyncio.wait_for(queue.get(), timeout=5), {"version": 4})
+        broadcaster.unsubscribe(queue)
+
+    async def test_resume_moves_poller_back(self):
+        log = ChangeLog(5)
+        broadcaster = events.ChangeBroadcaster(log.fetch_changes, log.fetch_version)
+        first = broadcaster.subscribe()
+        await broadcaster.replay(5)
+        # A stream reset at version 3 (e.g. a stale reload) still gets 4 and 5
+        second = broadcaster.subscribe()
+        broadcaster.resume_from(3)
+
+        received = [await asyncio.wait_for(second.get(), timeout=5) for _ in range(2)]
+        self.assertEqual(received, [{"version": 4}, {"version": 5}])
+        self.assertEqual(broadcaster.last_version, 5)
+        for queue in (first, second):
+            broadcaster.unsubscribe(queue)
+
+
+if __name__ == "__main__":
+    unittest.main()